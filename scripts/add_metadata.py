@@ -7,11 +7,42 @@ from sevenbridges import Api
 from sevenbridges.errors import SbgError
 from helper_functions import helper_functions as hf
 
+try:
+    import pyarrow
+except ImportError:
+    # pyarrow is only needed for faster manifest reading and parquet output
+    pyarrow = None
+
 CONTEXT_SETTINGS = dict(help_option_names=["-h", "--help"])
 
 # regex for extracting baid from file name:
 BAID_RE = re.compile(r"(?<![A-Za-z0-9])(B[AS]_[A-Za-z0-9]{8})(?![A-Za-z0-9])")
 
+# different "sample name" fields
+SAMPLE_FIELDS = [
+    "sample_name",
+    "biospecimen_name",
+    "tumor_name",
+    "sample_id",
+    "input_tumor_name",
+]
+
+# manifest columns related to file name and read info
+UNNEEDED_COLS = [
+    "file_name",
+    "file_format",
+    "file_hash_type",
+    "file_size",
+    "file_hash_value",
+    "read_pair_number",
+    "lane_number",
+    "flow_cell_barcode",
+    "reference_genome",
+    "mean_coverage",
+    "project",
+    "adapter_sequencing",
+]
+
 
 def get_task_files(task) -> list:
     """
@@ -43,6 +74,173 @@ def get_task_files(task) -> list:
     return files
 
 
+def read_manifest(manifest) -> pd.DataFrame:
+    """
+    Read a manifest, without the columns about file names and read info.
+    Every column is read as a string, with the pyarrow engine if it's installed.
+    Inputs:
+    - manifest: tab separated manifest file
+    Returns:
+    - DataFrame with one row per Bioassay_ID, Bioassay_ID is categorical
+    """
+    columns = pd.read_csv(manifest, sep="\t", nrows=0).columns
+    usecols = [col for col in columns if col not in UNNEEDED_COLS]
+    man_df = pd.read_csv(
+        manifest,
+        sep="\t",
+        usecols=usecols,
+        dtype={col: str for col in usecols},
+        keep_default_na=False,
+        engine="c" if pyarrow is None else "pyarrow",
+    ).drop_duplicates()
+
+    # check manifest for Bioassay_IDs with multiple rows
+    duplicate_bioassay_rows = man_df[
+        man_df.duplicated(subset=["Bioassay_ID"], keep=False)
+    ].sort_values("Bioassay_ID")
+    if not duplicate_bioassay_rows.empty:
+        duplicate_bioassay_rows.to_csv(
+            "Bioassay_ID_multiple_rows.tsv", sep="\t", index=False
+        )
+        duplicate_ids = ", ".join(duplicate_bioassay_rows["Bioassay_ID"].unique())
+        raise ValueError(
+            "Manifest contains multiple metadata rows for Bioassay_ID(s): "
+            f"{duplicate_ids}. See Bioassay_ID_multiple_rows.tsv"
+        )
+
+    man_df["Bioassay_ID"] = man_df["Bioassay_ID"].astype("category")
+    return man_df
+
+
+def get_task_sample_name(task):
+    """
+    Get the sample name from a task's inputs.
+    Returns:
+    - sample name, None if the task has no sample name input
+    """
+    matches = [task.inputs[key] for key in SAMPLE_FIELDS if key in task.inputs]
+    if len(matches) > 1:
+        print(matches)
+        raise ValueError(f"Expected exactly one match, got {len(matches)}")
+    elif len(matches) == 1:
+        return matches[0]
+    return None
+
+
+def add_sample_ids(file_df) -> pd.DataFrame:
+    """
+    Add a Bioassay_ID column to a DataFrame of files.
+    The task's sample name is used if it has one, otherwise the id is parsed
+    from the file name.
+    Inputs:
+    - file_df: DataFrame with name and task_sample_name columns
+    Returns:
+    - DataFrame with a Bioassay_ID column, files without a sample id are dropped
+    """
+    parsed = file_df["name"].str.extract(BAID_RE.pattern, expand=False)
+    file_df["Bioassay_ID"] = file_df["task_sample_name"].where(
+        file_df["task_sample_name"].notna() & (file_df["task_sample_name"] != ""),
+        parsed,
+    )
+    missing = file_df["Bioassay_ID"].isna()
+    for file_id, name in file_df.loc[missing, ["id", "name"]].itertuples(index=False):
+        print(f"Could not determine sample_name for {file_id}, {name} skipping")
+    return file_df[~missing].drop(columns="task_sample_name")
+
+
+def join_manifest(file_df, man_df) -> pd.DataFrame:
+    """
+    Join the manifest metadata onto files by Bioassay_ID.
+    Both keys use the manifest's categories, so the join compares category codes
+    instead of strings. Files with ids that aren't in the manifest are dropped.
+    Inputs:
+    - file_df: DataFrame of files with a Bioassay_ID column
+    - man_df: DataFrame from read_manifest
+    Returns:
+    - DataFrame with a row for each file and its metadata
+    """
+    categories = man_df["Bioassay_ID"].cat.categories
+    # ids that aren't categories become NaN first, passing them to Categorical
+    # is deprecated
+    ids = file_df["Bioassay_ID"].where(file_df["Bioassay_ID"].isin(categories))
+    file_df = file_df.assign(Bioassay_ID=pd.Categorical(ids, categories=categories))
+    file_df = file_df[file_df["Bioassay_ID"].notna()]
+    return pd.merge(file_df, man_df, on="Bioassay_ID")
+
+
+def metadata_changes(current, new) -> dict:
+    """
+    Find the metadata keys that would change.
+    Values are compared as strings since the manifest is read as strings,
+    and empty manifest values never replace existing ones.
+    Inputs:
+    - current: the file's current metadata
+    - new: metadata from the manifest
+    Returns:
+    - dict of the keys and new values that differ from the current metadata
+    """
+    changes = {}
+    for key, value in new.items():
+        if value is None or value == "":
+            continue
+        old = current.get(key)
+        if old is None or str(old) != str(value):
+            changes[key] = value
+    return changes
+
+
+def apply_metadata(api, out_df, current_metadata, report_file):
+    """
+    Add the merged metadata to the files on Cavatica.
+    Only files with changed metadata are edited, and only their changed keys are sent.
+    Inputs:
+    - api: api object
+    - out_df: merged DataFrame from join_manifest
+    - current_metadata: dict of file id to the file's current metadata
+    - report_file: tsv with the result for every file
+    """
+    meta_cols = [col for col in out_df.columns if col not in ["id", "name", "project"]]
+    edits = []
+    with open(report_file, "w") as report:
+        report.write("file_id\tfile_name\tresult\tchanged_keys\n")
+        rows = out_df[["id", "name"] + meta_cols].astype(str)
+        for row in rows.itertuples(index=False, name=None):
+            file_id, file_name, values = row[0], row[1], row[2:]
+            changes = metadata_changes(
+                current_metadata.get(file_id, {}), dict(zip(meta_cols, values))
+            )
+            if changes:
+                edits.append(({"id": file_id, "metadata": changes}, file_name))
+            else:
+                report.write(f"{file_id}\t{file_name}\tUNCHANGED\t\n")
+
+        print(f"Updating metadata of {len(edits)} of {len(out_df)} files")
+        names = {item["id"]: file_name for item, file_name in edits}
+        failed = 0
+        items = [item for item, _ in edits]
+        for item, file_obj, error in hf.bulk_edit_files(api, items):
+            keys = ",".join(item["metadata"])
+            if error is None:
+                result = "UPDATED"
+            else:
+                failed += 1
+                result = f"FAILED: {error}"
+            report.write(f"{item['id']}\t{names[item['id']]}\t{result}\t{keys}\n")
+
+    print(f"{len(edits) - failed} files updated, {failed} failed, see {report_file}")
+
+
+def write_output(out_df, output_file):
+    """
+    Write the metadata manifest as parquet if the name ends with .parquet,
+    otherwise as a tsv.
+    """
+    if output_file.endswith(".parquet"):
+        out_df.to_parquet(output_file, index=False)
+    else:
+        out_df.to_csv(output_file, sep="\t", index=False)
+
+
 @click.command(context_settings=CONTEXT_SETTINGS, no_args_is_help=True)
 @click.option(
     "--profile",
@@ -61,145 +259,107 @@ def get_task_files(task) -> list:
 @click.option(
     "--output_file",
     "-o",
-    help="Output filename",
+    help="Output filename, written as parquet if it ends with .parquet",
     required=True,
 )
+@click.option(
+    "--apply",
+    help="Also add the metadata to the files on Cavatica, only changed keys are sent",
+    is_flag=True,
+    default=False,
+)
+@click.option(
+    "--report",
+    help="Result of every file when using --apply",
+    default="metadata_apply_report.tsv",
+    show_default=True,
+)
 @click.option("--debug", help="Print some debug messages", is_flag=True, default=False)
-def add_metadata(profile, project, task_file, manifest, output_file, debug):
+def add_metadata(
+    profile, project, task_file, manifest, output_file, apply, report, debug
+):
     """Add metadata to files on Cavatica"""
 
-    project = hf.parse_project(project)
+    if output_file.endswith(".parquet") and pyarrow is None:
+        print("pyarrow is needed to write parquet files: pip install pyarrow")
+        exit(1)
 
-    # different "sample name" fields
-    sample_fields = [
-        "sample_name",
-        "biospecimen_name",
-        "tumor_name",
-        "sample_id",
-        "input_tumor_name",
-    ]
+    project = hf.parse_project(project)
 
     # read config file
     api = hf.parse_config(profile)
 
     # read manifest file
-    man_df = pd.read_csv(manifest, sep="\t", keep_default_na=False)
-
-    # strip some columns related to file name and read info
-    unneeded_cols = [
-        "file_name",
-        "file_format",
-        "file_hash_type",
-        "file_size",
-        "file_hash_value",
-        "read_pair_number",
-        "lane_number",
-        "flow_cell_barcode",
-        "reference_genome",
-        "mean_coverage",
-        "project",
-        "adapter_sequencing",
-    ]
-    man_df = man_df.drop(unneeded_cols, errors="ignore", axis=1).drop_duplicates()
-
-    # check manifest for Bioassay_IDs with multiple rows
-    duplicate_bioassay_rows = man_df[
-        man_df.duplicated(subset=["Bioassay_ID"], keep=False)
-    ].sort_values("Bioassay_ID")
-    if not duplicate_bioassay_rows.empty:
-        duplicate_bioassay_rows.to_csv(
-            "Bioassay_ID_multiple_rows.tsv", sep="\t", index=False
-        )
-        duplicate_ids = ", ".join(duplicate_bioassay_rows["Bioassay_ID"].unique())
-        raise ValueError(
-            "Manifest contains multiple metadata rows for Bioassay_ID(s): "
-            f"{duplicate_ids}. See Bioassay_ID_multiple_rows.tsv"
-        )
+    man_df = read_manifest(manifest)
 
     if debug:
         print(man_df.columns)
         print(man_df.shape)
 
-    # get all tasks or a list of tasks in a project
+    # get all completed tasks or a list of tasks in a project
     tasks = []
     if project and task_file:
         raise ValueError("Either 'project' or 'task_file' must be set. Not Both.")
     elif project:
-        tasks = hf.get_all_tasks(api, project)
+        tasks = hf.find_tasks(api, statuses=["COMPLETED"], project=project)
     elif task_file:
         with open(task_file, "r") as f:
-            for line in f:
-                task_id = line.strip()
-                task = api.tasks.get(id=task_id)
+            task_ids = [line.strip() for line in f if line.strip()]
+        for task_id, task in hf.bulk_get_tasks(api, task_ids):
+            if task is None:
+                print(f"Could not find task {task_id}, skipping")
+                continue
+            if task.status == "COMPLETED":
                 tasks.append(task)
     else:
         raise ValueError("Either 'project' or 'task_file' must be set.")
 
-    out_df = pd.DataFrame()
-
-    file_rows = []
+    # find the project and task sample name for each output file
+    file_samples = {}
     for task in tasks:
 
         if debug:
             print(task.name)
 
-        if task.status == "COMPLETED":
-            # get the sample name from the task
-            task_sample_name = None
-            matches = [task.inputs[key] for key in sample_fields if key in task.inputs]
-            if len(matches) > 1:
-                print(matches)
-                raise ValueError(f"Expected exactly one match, got {len(matches)}")
-            elif len(matches) == 1:
-                task_sample_name = matches[0]
-
-            # get output files from task
-            task_files = get_task_files(task)
-
-            for file in task_files:
-
-                # make sure file actually exists
-                try:
-                    file_obj = api.files.get(id=file)
-                except Exception as e:
-                    print(f"Problem retrieving {file.id},{file.name}: {e}")
-                    continue
-
-                sample_name = None
-                if not task_sample_name:
-                    # try to parse sample name from file name
-                    match = BAID_RE.search(file.name)
-                    sample_name = match.group(1) if match else None
-                
-                if not sample_name and not task_sample_name:
-                    print(f"Could not determine sample_name for {file_obj.id}, {file_obj.name} skipping")
-                    continue
-
-                file_rows.append(
-                    {
-                        "id": file_obj.id,
-                        "name": file_obj.name,
-                        "project": task.project,
-                        "Bioassay_ID": sample_name if sample_name else task_sample_name,
-                    }
-                )
-
-
-    # make df out of file rows
-    file_df = pd.DataFrame(file_rows)
+        task_sample_name = get_task_sample_name(task)
+        for file in get_task_files(task):
+            file_samples[file.id] = (task.project, task_sample_name)
+
+    # make sure files actually exist, getting them in bulk
+    columns = {"id": [], "name": [], "project": [], "task_sample_name": []}
+    current_metadata = {}
+    for file_id, file_obj in hf.bulk_get_files(api, file_samples):
+        if file_obj is None:
+            print(f"Problem retrieving {file_id}: file not found")
+            continue
+
+        file_project, task_sample_name = file_samples[file_id]
+        columns["id"].append(file_obj.id)
+        columns["name"].append(file_obj.name)
+        columns["project"].append(file_project)
+        columns["task_sample_name"].append(task_sample_name)
+        if apply:
+            current_metadata[file_obj.id] = dict(file_obj.metadata or {})
+
+    # make df out of file columns
+    file_df = pd.DataFrame(columns)
+    file_df["project"] = file_df["project"].astype("category")
+    file_df = add_sample_ids(file_df)
 
     if debug:
-        print(len(file_rows))
         print(file_df.columns)
         print(file_df.shape)
 
     # Merge metadata to create output manifest
-    file_df = pd.merge(file_df, man_df, on="Bioassay_ID")
+    out_df = join_manifest(file_df, man_df)
 
     if debug:
-        print(file_df.columns)
-        print(file_df.shape)
-    file_df.to_csv(output_file, sep="\t", index=False)
+        print(out_df.columns)
+        print(out_df.shape)
+    write_output(out_df, output_file)
+
+    if apply:
+        apply_metadata(api, out_df, current_metadata, report)
 
 
 if __name__ == "__main__":
@@ -24,10 +24,16 @@ CONTEXT_SETTINGS = dict(help_option_names=["-h", "--help"])
 @click.option(
     "--admin", help="Flag to grant user admin permissions", is_flag=True, default=False
 )
-def project_report(profile, user, project_creator, admin):
+@click.option(
+    "--cache",
+    help="Answer repeated api lookups from a response cache",
+    is_flag=True,
+    default=False,
+)
+def project_report(profile, user, project_creator, admin, cache):
     """Find a file in a project"""
     # read config file
-    api = hf.parse_config(profile)
+    api = hf.parse_config(profile, cache=cache)
 
     projs = hf.get_all_projects(api)
 
@@ -1,24 +1,62 @@
-"""Simple script to find a billing group"""
+"""Export the storage, analysis, and egress breakdowns of a billing group"""
 
 import click
 import datetime
+import pandas as pd
 from sevenbridges import Api
 from helper_functions import helper_functions as hf
+from helper_functions import billing_export
+
+try:
+    import pyarrow
+except ImportError:
+    # pyarrow is only needed for parquet output
+    pyarrow = None
 
 CONTEXT_SETTINGS = dict(help_option_names=["-h", "--help"])
 
+
 @click.command(context_settings=CONTEXT_SETTINGS, no_args_is_help=True)
-@click.option("--group_name", help="File name", default = "AWS-BTI-Core")
+@click.option("--group_name", help="Billing group name", default="AWS-BTI-Core")
 @click.option("--start_date", help="Start date in mm-dd-yyyy format")
 @click.option("--end_date", help="End date in mm-dd-yyyy format")
+@click.option(
+    "--window_days",
+    help="Number of days to fetch per request, long date ranges are split "
+    "into windows that are fetched in parallel",
+    type=int,
+    default=30,
+    show_default=True,
+)
+@click.option(
+    "--breakdown",
+    help="Breakdown to export, can be given more than once, defaults to all",
+    type=click.Choice(billing_export.BREAKDOWNS),
+    multiple=True,
+)
+@click.option(
+    "--output_file",
+    "-o",
+    help="Write every breakdown record to this csv, or parquet if it ends "
+    "with .parquet",
+)
 @click.option(
     "--profile",
     help="Profile to use from credentials file",
     default="cavatica",
     show_default=True,
 )
-def find_billing_group(group_name, profile, start_date, end_date):
-    """Find a billing group"""
+def find_billing_group(
+    group_name, profile, start_date, end_date, window_days, breakdown, output_file
+):
+    """
+    Export the breakdowns of a billing group and print the cost of each project.
+    Defaults to the last week.
+    """
+
+    if output_file and output_file.endswith(".parquet") and pyarrow is None:
+        print("pyarrow is needed to write parquet files: pip install pyarrow")
+        exit(1)
 
     if not end_date:
         end_date = datetime.datetime.now().strftime("%m-%d-%Y")
@@ -31,29 +69,40 @@ def find_billing_group(group_name, profile, start_date, end_date):
     api = hf.parse_config(profile)
 
     # get all billing groups the user has access to
-    # might need to add pagination???
-    billing_groups = hf.get_all_billing(api)
-
     billing = None
-
-    for billing_group in billing_groups:
-        #print(f"{billing_group.name}\t{billing_group.id}")
+    for billing_group in hf.iter_billing_groups(api):
         if billing_group.name == group_name:
             billing = billing_group
+            break
+
+    if billing is None:
+        print(f"Billing group {group_name} not found")
+        exit(1)
 
     print(f"{billing.name}\t{billing.id}")
-    #print(dir(my_billing))
-    #print(dir(my_billing.breakdown()))
-    #print(my_billing.storage_breakdown())
 
-    # get all storage breakdowns
-    # will also need to handle limists here
+    # get all breakdowns
+    records = billing_export.fetch_breakdowns(
+        billing, start_date, end_date, window_days, breakdown or None
+    )
+    breakdown_df = pd.DataFrame(records, columns=billing_export.RECORD_COLUMNS)
 
-    for sb in billing.storage_breakdown(date_from=start_date, date_to=end_date):
-        print(f"{sb.project_name}\t{sb.active.cost.amount}")
-    
+    if output_file:
+        if output_file.endswith(".parquet"):
+            breakdown_df.to_parquet(output_file, index=False)
+        else:
+            breakdown_df.to_csv(output_file, index=False)
+        print(f"Wrote {len(breakdown_df)} records to {output_file}")
 
-    # get all analysis breakdowns
+    # cost of each project by breakdown
+    costs = breakdown_df.pivot_table(
+        index="project_name",
+        columns="breakdown",
+        values="cost",
+        aggfunc="sum",
+        fill_value=0,
+    )
+    print(costs.to_csv(sep="\t"), end="")
 
 
 if __name__ == "__main__":
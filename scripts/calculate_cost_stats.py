@@ -1,124 +1,140 @@
-"""Script to calculate cost average, stdev, cheapest, and most expensive tasks in a project"""
+"""Script to calculate cost average, stdev, cheapest, and most expensive tasks in projects"""
 
 import click
-import time
-import statistics
-from matplotlib import pyplot as plt
+import sys
+from concurrent.futures import ThreadPoolExecutor
 from sevenbridges import Api
 from helper_functions import helper_functions as hf
+from helper_functions import cost_stats, task_warehouse
+
+try:
+    import pyarrow
+except ImportError:
+    # pyarrow is only needed for parquet output
+    pyarrow = None
 
 CONTEXT_SETTINGS = dict(help_option_names=["-h", "--help"])
 
 
 @click.command(context_settings=CONTEXT_SETTINGS, no_args_is_help=True)
-@click.option("--project", help="Project ID")
+@click.option(
+    "--project", help="Project ID, can be given more than once", multiple=True
+)
+@click.option("--project_file", help="File with project ids")
 @click.option(
     "--status",
     help="comma-separated list of task statuses to find",
     default="COMPLETED",
 )
+@click.option(
+    "--group_by",
+    help="Task column to calculate stats for",
+    type=click.Choice(
+        ["app", "revision", "app_id", "project", "instance_type", "status"]
+    ),
+    default="app",
+    show_default=True,
+)
+@click.option(
+    "--output_file", "-o", help="Write the stats to this tsv instead of printing"
+)
+@click.option(
+    "--tasks_output",
+    help="Write the task table to this file, as parquet if it ends with .parquet",
+)
+@click.option("--outliers", help="Write tasks with outlier costs to this tsv")
+@click.option(
+    "--hist_dir", help="Save a cost histogram for each group to this directory"
+)
+@click.option(
+    "--warehouse",
+    help="Read tasks from the local task warehouse made by sync_task_warehouse.py "
+    "instead of the platform, every synced project is used if none are given",
+    is_flag=True,
+    default=False,
+)
+@click.option("--warehouse_file", help="Warehouse file to use instead of the default")
 @click.option(
     "--profile",
     help="Profile to use from credentials file",
     default="cavatica",
     show_default=True,
 )
-def find_tasks(project, profile, status):
-    """Find a file in a project"""
-    # read config file
-    api = hf.parse_config(profile)
-
-    project = hf.parse_project(project)
-
-    # get all tasks in project
-    all_tasks = hf.get_all_tasks(api, project)
-
-    stati = status.split(",")
-
-    costs = {}
-
-    for task in all_tasks:
-        if task.status in stati:
-            my_id = task.id
-            my_app = task.app
-            my_price = task.price.amount
-
-            # fill all lists
-            if "all" in costs.keys():
-                costs["all"]["prices"].append(my_price)
-                if my_price <= costs["all"]["lowest"]:
-                    costs["all"]["lowest"] = my_price
-                    costs["all"]["lowest_id"] = my_id
-                if my_price >= costs["all"]["highest"]:
-                    costs["all"]["highest"] = my_price
-                    costs["all"]["highest_id"] = my_id
-            else:
-                costs["all"] = {}
-                costs["all"]["highest"] = my_price
-                costs["all"]["lowest"] = my_price
-                costs["all"]["highest_id"] = my_id
-                costs["all"]["lowest_id"] = my_id
-                costs["all"]["prices"] = [my_price]
-
-            # fill app specifics
-            if my_app in costs.keys():
-                costs[my_app]["prices"].append(my_price)
-                if my_price <= costs["all"]["lowest"]:
-                    costs[my_app]["lowest"] = my_price
-                    costs[my_app]["lowest_id"] = my_id
-                if my_price >= costs["all"]["highest"]:
-                    costs[my_app]["highest"] = my_price
-                    costs[my_app]["highest_id"] = my_id
-            else:
-                costs[my_app] = {}
-                costs[my_app]["highest"] = my_price
-                costs[my_app]["lowest"] = my_price
-                costs[my_app]["highest_id"] = my_id
-                costs[my_app]["lowest_id"] = my_id
-                costs[my_app]["prices"] = [my_price]
+def find_tasks(
+    project,
+    project_file,
+    status,
+    group_by,
+    output_file,
+    tasks_output,
+    outliers,
+    hist_dir,
+    warehouse,
+    warehouse_file,
+    profile,
+):
+    """Calculate task cost stats for one or more projects"""
+    if tasks_output and tasks_output.endswith(".parquet") and pyarrow is None:
+        print("pyarrow is needed to write parquet files: pip install pyarrow")
+        exit(1)
+
+    if hist_dir and cost_stats.plt is None:
+        print("matplotlib is needed for histograms: pip install matplotlib")
+        exit(1)
+
+    projects = list(project)
+    if project_file:
+        with open(project_file, "r") as f:
+            projects.extend(line.strip() for line in f if line.strip())
+    if not projects and not warehouse:
+        print("Either 'project' or 'project_file' must be set.")
+        exit(1)
+    projects = [hf.parse_project(p) for p in projects]
+
+    stati = [s.strip().upper() for s in status.split(",")]
+
+    if warehouse:
+        conn = task_warehouse.connect(warehouse_file)
+        tasks_df = task_warehouse.read_tasks(conn, projects, stati)
+        conn.close()
+    else:
+        # read config file
+        api = hf.parse_config(profile)
+
+        # only tasks with the requested statuses are fetched,
+        # and projects are queried in parallel
+        def project_tasks(project):
+            tasks = hf.find_tasks(api, statuses=stati, project=project)
+            return cost_stats.tasks_to_frame(tasks)
+
+        with ThreadPoolExecutor(max_workers=hf.MAX_WORKERS) as executor:
+            tasks_df = cost_stats.concat_frames(executor.map(project_tasks, projects))
+
+    if tasks_df.empty:
+        print("No tasks found")
+        exit(1)
+
+    if tasks_output:
+        if tasks_output.endswith(".parquet"):
+            tasks_df.to_parquet(tasks_output, index=False)
+        else:
+            tasks_df.to_csv(tasks_output, sep="\t", index=False)
 
     # format final output and do stats
-    print(
-        "\t".join(
-            [
-                "app_name",
-                "task count",
-                "total cost",
-                "average cost",
-                " cost stdev",
-                "highest task id",
-                "highest cost",
-                "lowest task id",
-                "lowest cost",
-            ]
-        )
-    )
-    for app in costs:
-        app_name = app
-        if len(app.split('/')) > 1:
-            app_name = app.split('/')[-2]
-        total = sum(costs[app]["prices"])
-        count = len(costs[app]["prices"])
-        average = total / count
-        stdev = None
-        if total > 1:
-            stdev = statistics.stdev(costs[app]["prices"])
-        highest_cost = costs[app]["highest"]
-        highest_id = costs[app]["highest_id"]
-        lowest_cost = costs[app]["lowest"]
-        lowest_id = costs[app]["lowest_id"]
-        print(
-            f"{app_name}\t{count}\t{total}\t{average}\t{stdev}\t{highest_id}\t{highest_cost}\t{lowest_id}\t{lowest_cost}"
-        )
-        plt.hist(costs[app]["prices"])
-
-        # Adding labels and a title for clarity
-        plt.xlabel("Value")
-        plt.ylabel("Frequency")
-        plt.title(f"Histogram of {app_name} Prices")
-
-        # Displaying the plot
-        plt.show()
+    summary = cost_stats.summarize(tasks_df, by=group_by)
+    if output_file:
+        summary.to_csv(output_file, sep="\t")
+    else:
+        summary.to_csv(sys.stdout, sep="\t")
+
+    if outliers:
+        outlier_df = cost_stats.find_outliers(tasks_df, by=group_by)
+        outlier_df.to_csv(outliers, sep="\t", index=False)
+        print(f"{len(outlier_df)} outlier tasks written to {outliers}", file=sys.stderr)
+
+    if hist_dir:
+        saved = cost_stats.save_histograms(tasks_df, hist_dir, by=group_by)
+        print(f"{len(saved)} histograms saved to {hist_dir}", file=sys.stderr)
 
 
 if __name__ == "__main__":
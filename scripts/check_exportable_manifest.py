@@ -1,5 +1,6 @@
 """Script to find exportable files in a manifest"""
 
+import sys
 import click
 from sevenbridges import Api
 from helper_functions import helper_functions as hf
@@ -20,6 +21,7 @@ def check_manifest_exportable(manifest, profile):
     api = hf.parse_config(profile)
 
     # read manifest
+    file_ids = []
     with open(manifest, "r") as f:
         line_num = 0
         for line in f:
@@ -31,17 +33,21 @@ def check_manifest_exportable(manifest, profile):
                 # read data lines and get file name
                 #line_split = line.strip().split("\t")
                 line_split = line.strip().split(",")
-                file_id = line_split[header_cols.index("id")]
-                file = api.files.get(id=file_id)
-                if file.storage.type == "PLATFORM":
-                    # make output line
-                    out_line = f"{file.name}\t{file.id}\t{file.created_on}"
-
-                    # output to screen
-                    print(out_line)
+                file_ids.append(line_split[header_cols.index("id")])
 
             line_num += 1
 
+    # get the files in bulk
+    for file_id, file in hf.bulk_get_files(api, file_ids):
+        if file is None:
+            print(f"Could not find file {file_id}", file=sys.stderr)
+        elif file.storage.type == "PLATFORM":
+            # make output line
+            out_line = f"{file.name}\t{file.id}\t{file.created_on}"
+
+            # output to screen
+            print(out_line)
+
 
 if __name__ == "__main__":
     check_manifest_exportable()
@@ -31,7 +31,7 @@ def copy_files(project, profile, manifest, run):
 
     with open(manifest, "r") as f:
         line_num = 0
-        files_to_copy = []
+        manifest_names = {}
         for line in f:
             if line_num == 0:
                 # parse header
@@ -45,25 +45,33 @@ def copy_files(project, profile, manifest, run):
                 if "/" in file_name:
                     file_name = file_name.split("/")[1]
 
-                # get the file
-                file_obj = api.files.get(id=file_id)
-
-                # check that the file names match
-                # this is just in case the ids in the manifest aren't cavatica ids
-                if file_name != file_obj.name:
-                    raise ValueError(f"file name in manifest: {file_name} does not match file name in Cavatica {file_obj.name}")
-                else:
-                    # check if the file is already loaded to the project
-                    try:
-                        new_obj = hf.get_file_obj(api, project, file_name)
-                    except FileNotFoundError as e:
-                        files_to_copy.append(file_id)
+                manifest_names[file_id] = file_name
             
             if line_num % 100 == 0:
                 print(f"Processed {line_num} lines")
 
             line_num += 1
 
+    # get the files in bulk
+    manifest_files = {}
+    for file_id, file_obj in hf.bulk_get_files(api, manifest_names):
+        file_name = manifest_names[file_id]
+        if file_obj is None:
+            raise ValueError(f"file id in manifest: {file_id} not found in Cavatica")
+
+        # check that the file names match
+        # this is just in case the ids in the manifest aren't cavatica ids
+        if file_name != file_obj.name:
+            raise ValueError(f"file name in manifest: {file_name} does not match file name in Cavatica {file_obj.name}")
+        else:
+            manifest_files[file_name] = file_id
+
+    # check if the files are already loaded to the project
+    found, missing, ambiguous = hf.resolve_file_names(
+        api, project, list(manifest_files)
+    )
+    files_to_copy = [manifest_files[file_name] for file_name in missing]
+
     if run and len(files_to_copy) > 0:
         print(f"Copying files to project: {project}")
         copy_results = api.actions.bulk_copy_files(
@@ -35,7 +35,13 @@ def parse_users(value):
 @click.command(context_settings=CONTEXT_SETTINGS, no_args_is_help=True)
 @click.option("--token", help="Cavatica token value")
 @click.option("--run", help="Flag to create project", is_flag=True, default=False)
-def create_project(token, run):
+@click.option(
+    "--cache",
+    help="Answer repeated api lookups from a response cache",
+    is_flag=True,
+    default=False,
+)
+def create_project(token, run, cache):
     """Create a project in Cavatica"""
 
     # create api
@@ -44,6 +50,8 @@ def create_project(token, run):
         token=token,
         error_handlers=[rate_limit_sleeper, maintenance_sleeper],
     )
+    if cache:
+        hf.install_cache(api)
 
     billing_groups = hf.get_all_billing(api)
 
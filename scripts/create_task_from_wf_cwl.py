@@ -107,6 +107,45 @@ def parse_workflow_file(workflow_file):
     return workflow_inputs, array_inputs
 
 
+def get_input_files(api, project, options_file, workflow_inputs, array_inputs):
+    """
+    Look up the file objects for every file input in the options file
+
+    Inputs:
+    - api: api object
+    - project: project name
+    - options_file: tsv file with task options
+    - workflow_inputs: dict of workflow input name to input type
+    - array_inputs: list of workflow inputs that are arrays
+
+    Returns:
+    - dict of file name to file object
+    """
+    file_names = []
+    with open(options_file, "r") as f:
+        task_options = f.readline().strip().split("\t")
+        for line in f:
+            line_split = line.strip().split("\t")
+            for option in task_options:
+                if workflow_inputs.get(option) != "file":
+                    continue
+                cur_input = line_split[task_options.index(option)]
+                if option in array_inputs:
+                    file_names.extend(cur_input.split(","))
+                else:
+                    file_names.append(cur_input)
+
+    found, missing, ambiguous = hf.resolve_file_names(api, project, file_names)
+    if missing or ambiguous:
+        for name in missing:
+            print(f"ERROR: File {name} not found in project {project}")
+        for name in ambiguous:
+            print(f"ERROR: Multiple files found with name {name} in project {project}")
+        exit(1)
+
+    return found
+
+
 @click.command(context_settings=CONTEXT_SETTINGS, no_args_is_help=True)
 @click.option(
     "--profile",
@@ -157,9 +196,13 @@ def create_task_script(profile, app, workflow_file, out, skip_name_check, option
     # parse workflow file
     workflow_inputs, array_inputs = parse_workflow_file(workflow_file)
 
+    # look up all of the input files at once
+    file_ids = get_input_files(
+        api, project, options_file, workflow_inputs, array_inputs
+    )
+
     # parse options file and create tasks
     task_ids = []
-    file_ids = {}
     out_lines = []
     new_cols = ["app", "task_id", "created_by"]
     base_names = {}
@@ -190,12 +233,7 @@ def create_task_script(profile, app, workflow_file, out, skip_name_check, option
                         if option not in array_inputs:
                             cur_input = line_split[task_options.index(option)]
                             if workflow_inputs[option] == "file":
-                                if cur_input in file_ids:
-                                    task_inputs[option] = file_ids[cur_input]
-                                else:
-                                    my_id = hf.get_file_obj(api, project, cur_input)
-                                    task_inputs[option] = my_id
-                                    file_ids[cur_input] = my_id
+                                task_inputs[option] = file_ids[cur_input]
                             elif workflow_inputs[option] == "bool":
                                 task_inputs[option] = (
                                     cur_input.strip().lower() == "true"
@@ -212,14 +250,7 @@ def create_task_script(profile, app, workflow_file, out, skip_name_check, option
                             ].split(",")
                             for i in range(len(task_inputs[option])):
                                 if workflow_inputs[option] == "file":
-                                    if task_inputs[option][i] in file_ids:
-                                        task_inputs[option][i] = file_ids[task_inputs[option][i]]
-                                    else:
-                                        my_id = hf.get_file_obj(
-                                            api, project, task_inputs[option][i]
-                                        )
-                                        file_ids[task_inputs[option][i]] = my_id
-                                        task_inputs[option][i] = my_id
+                                    task_inputs[option][i] = file_ids[task_inputs[option][i]]
                                 elif workflow_inputs[option] == "bool":
                                     task_inputs[option][i] = (
                                         task_inputs[option][i].strip().lower() == "true"
@@ -36,16 +36,11 @@ def delete_failed_output_files(profile, project, abort, run):
     project = hf.parse_project(project)
 
     # get failed tasks in project
-    all_tasks = hf.get_all_tasks(api, project)
-
     my_stati = ["FAILED"]
     if abort:
         my_stati.append("ABORTED")
 
-    failed_tasks = []
-    for task in all_tasks:
-        if task.status in my_stati:
-            failed_tasks.append(task)
+    failed_tasks = list(hf.find_tasks(api, statuses=my_stati, project=project))
 
     for task in failed_tasks:
         print(f"{task.id}, {task.name}, {task.status}")
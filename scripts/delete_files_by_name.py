@@ -31,12 +31,21 @@ def delete_failed_output_files(profile, project, files, run):
     project = hf.parse_project(project)
 
     with open(files, "r") as f:
-        for line in f:
-            file_name = line.strip()
-            file_obj = hf.get_file_obj(api, project, file_name)
-            print(f"Deleting file {file_obj.name}: {file_obj.id}")
-            if run:
-                file_obj.delete()
+        file_names = [line.strip() for line in f]
+
+    # look up all of the files before deleting any of them
+    found, missing, ambiguous = hf.resolve_file_names(api, project, file_names)
+    if missing or ambiguous:
+        for file_name in missing:
+            print(f"ERROR: File {file_name} not found in project {project}")
+        for file_name in ambiguous:
+            print(f"ERROR: Multiple files found with name {file_name} in project {project}")
+        exit(1)
+
+    for file_obj in found.values():
+        print(f"Deleting file {file_obj.name}: {file_obj.id}")
+        if run:
+            file_obj.delete()
 
     print("Done!")
 
@@ -30,12 +30,12 @@ def delete_tasks(profile, project, run):
 
     project = hf.parse_project(project)
 
-    # Discover tasks
-    all_tasks = hf.get_all_tasks(api, project)
-
+    # Discover tasks, only keeping the ones to delete or abort
     draft_tasks = []
     active_tasks = []
-    for task in all_tasks:
+    for task in hf.find_tasks(
+        api, statuses=sorted(DRAFT_STATI | ACTIVE_STATI), project=project
+    ):
         status = (task.status or "").upper()
         if status in DRAFT_STATI:
             draft_tasks.append(task)
@@ -6,6 +6,7 @@ import re
 from pathlib import Path
 from sevenbridges import Api
 from helper_functions import helper_functions as hf
+from helper_functions import export_journal
 
 CONTEXT_SETTINGS = dict(help_option_names=["-h", "--help"])
 
@@ -55,19 +56,34 @@ def check_exportable(file):
     required=True,
 )
 @click.option("--run", help="Run the export job", is_flag=True, default=False)
-def export_file_ids(file_ids, profile, volume, location, run):
+@click.option(
+    "--journal",
+    help="Export journal file, defaults to the file_ids file with a .export.jsonl suffix",
+)
+@click.option(
+    "--resume",
+    help="Skip files the journal has as exported, re-check running exports, and retry the rest",
+    is_flag=True,
+    default=False,
+)
+def export_file_ids(file_ids, profile, volume, location, run, journal, resume):
     """
     Take a task or a list of tasks and export the output data
     to an AWS bucket.
     All files will go to the same bucket/location.
+    Every submitted and finished export is recorded in the journal so an
+    interrupted export can be picked up again with --resume.
     """
     # read config file
     api = hf.parse_config(profile)
+    journal = journal or str(Path(file_ids).with_suffix(".export.jsonl"))
+    records = export_journal.load(journal) if resume else {}
     files_to_export = 0
     print(f"Getting file ids from file: {file_ids}")
     file_id_index = None
     file_name_index = None
     file_location_dict = {}
+    file_paths = {}
     line_count = 0
     with open(file_ids, "r") as f:
         for line in f:
@@ -89,13 +105,30 @@ def export_file_ids(file_ids, profile, volume, location, run):
                     file_path = location
                 else:
                     file_path = f"{location}/{file_path}"
-                try:
-                    if file_path not in file_location_dict:
-                        file_location_dict[file_path] = []
-                    file_location_dict[file_path].append(api.files.get(file_id))
-                    files_to_export += 1
-                except Exception as e:
-                    print(f"Could not find file {file_id}: {e}")
+                file_paths.setdefault(file_id, []).append(file_path)
+
+    # don't fetch files that were already exported to all of their locations
+    if resume:
+        file_paths = {
+            file_id: paths
+            for file_id, paths in file_paths.items()
+            if any(
+                records.get((file_id, path), {}).get("state") != "COMPLETED"
+                for path in paths
+            )
+        }
+
+    # get the files in bulk
+    print(f"Getting {len(file_paths)} files")
+    for file_id, file in hf.bulk_get_files(api, file_paths):
+        if file is None:
+            print(f"Could not find file {file_id}")
+            continue
+        for file_path in file_paths[file_id]:
+            if file_path not in file_location_dict:
+                file_location_dict[file_path] = []
+            file_location_dict[file_path].append(file)
+            files_to_export += 1
 
     # loop through files and add any secondary files
     print("Finding exportable files")
@@ -122,24 +155,43 @@ def export_file_ids(file_ids, profile, volume, location, run):
     if files_to_export > 0:
         #print(f"Exporting {len(exportable_files)} files to {volume}")
         # export files to each location
+        exports = []
         for loc in file_location_dict:
             print(f"Exporting {len(file_location_dict[loc])} files to {volume}/{loc}")
-            if run:
-                print("Running export")
-                responses = hf.bulk_export_files(
-                    api=api,
-                    files=file_location_dict[loc],
-                    volume=volume,
-                    location=loc,
-                    copy_only=False,
-                )
-                for response in responses:
-                    print(response)
-                print(f"Successfully exported {len(file_location_dict[loc])} files to {volume}/{loc}")
-            else:
+            exports.extend((file, loc) for file in file_location_dict[loc])
+            if not run:
                 print("Dry run, not exporting")
                 print(f"Would export {len(file_location_dict[loc])} files to {volume}/{loc}")
                 print(f"Files: {[f.name for f in file_location_dict[loc]]}")
+
+        completed, running, exports = export_journal.split_exports(records, exports)
+        if resume:
+            print(
+                f"Resuming export: {len(completed)} files already exported, "
+                f"{len(running)} exports running, {len(exports)} files to export"
+            )
+
+        if run:
+            print(f"Running export, recording progress in {journal}")
+            exported = 0
+            failed = 0
+            with open(journal, "a") as journal_file:
+                for file, state, result in hf.export_files(
+                    api=api,
+                    exports=exports,
+                    volume=volume,
+                    copy_only=False,
+                    running=running,
+                    journal=journal_file,
+                ):
+                    if state == "COMPLETED":
+                        exported += 1
+                        if exported % 1000 == 0:
+                            print(f"Exported: {exported} files")
+                    else:
+                        failed += 1
+                        print(f"Export of {file.name}: {file.id} {state}: {result}")
+            print(f"Successfully exported {exported} files to {volume}, {failed} failed")
     else:
         print("No files to export")
     print("Done!")
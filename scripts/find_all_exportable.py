@@ -22,23 +22,18 @@ def find_file(project, profile):
 
     project = hf.parse_project(project)
 
-    # get all of the files in the project
-    all_files = hf.get_all_files(api, project)
-    print(f"Found {len(all_files)} files in project {project}")
+    # files are checked as their folders are listed
+    file_count = 0
+    for file in hf.find_exportable_files(api, project):
+        file_count += 1
 
-    # check each file's storage.type
-    for file in all_files:
+        # make output line
+        out_line = f"{file.name}\t{file.id}\t{file.created_on}"
 
-        # check if it's a folder
-        if file.is_folder() == True:
-            continue
+        # output to screen
+        print(out_line)
 
-        if file.storage.type == "PLATFORM":
-            # make output line
-            out_line = f"{file.name}\t{file.id}\t{file.created_on}"
-
-            # output to screen
-            print(out_line)
+    print(f"Found {file_count} exportable files in project {project}")
 
 
 if __name__ == "__main__":
@@ -17,24 +17,21 @@ CONTEXT_SETTINGS = dict(help_option_names=["-h", "--help"])
     show_default=True,
 )
 @click.option("--in_file", help="Input tsv file with metadata values to look up")
-def find_file(metadata, project, profile, in_file):
+@click.option(
+    "--no_index",
+    help="Check every file in the project instead of using the local file index",
+    is_flag=True,
+    default=False,
+)
+def find_file(metadata, project, profile, in_file, no_index):
     """Find a file in a project"""
     # read config file
     api = hf.parse_config(profile)
 
     project = hf.parse_project(project)
 
-    # get all of the files in the project
-    all_files = hf.get_all_files(api, project)
-
-    # reformat all files by metadata to be more easily searched
-    meta_dict = {}
-    for file in all_files:
-        if file.metadata[metadata] in meta_dict:
-            meta_dict[file.metadata[metadata]].append(file.name)
-        else:
-            meta_dict[file.metadata[metadata]] = [file.name]
-
+    # read the metadata values to look up
+    my_values = []
     with open(in_file, "r") as f:
         line_num = 0
         my_cols = []
@@ -48,14 +45,18 @@ def find_file(metadata, project, profile, in_file):
                     exit(1)
             else:
                 line_split = line.strip().split("\t")
-                my_meta = line_split[my_cols.index(metadata)]
-                if my_meta in meta_dict:
-                    my_files = meta_dict[my_meta]
-                    for fil in my_files:
-                        print(f"{my_meta}\t{fil}")
-            
+                my_values.append(line_split[my_cols.index(metadata)])
+
             line_num += 1
 
+    # only files with the metadata values are fetched
+    meta_dict = hf.find_files_by_metadata(
+        api, project, metadata, my_values, use_index=not no_index
+    )
+    for my_meta in my_values:
+        for fil in meta_dict.get(my_meta, []):
+            print(f"{my_meta}\t{fil.name}")
+
 
 if __name__ == "__main__":
     find_file()
@@ -1,9 +1,20 @@
 """Find and log files in a project"""
 
+import gzip
+import os
+import re
+import sys
 import click
+import requests
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from fnmatch import fnmatch
+from functools import partial
+from requests.adapters import HTTPAdapter
 from sevenbridges import Api
 from sevenbridges.errors import SbgError
+from urllib3.util.retry import Retry
 from helper_functions import helper_functions as hf
+from helper_functions import log_search
 
 CONTEXT_SETTINGS = dict(help_option_names=["-h", "--help"])
 
@@ -21,66 +32,234 @@ CONTEXT_SETTINGS = dict(help_option_names=["-h", "--help"])
 @click.option(
     "--output_file",
     "-o",
-    help="Output filename",
+    help="Output filename, compressed with gzip if it ends with .gz",
 )
-def find_logs(profile, project, task_file, debug, output_file):
-    """Find log files in a project"""
+@click.option(
+    "--checkpoint",
+    help="File listing tasks already processed, these are skipped and new rows "
+    "are added to the output file",
+)
+@click.option("--job_filter", help="Only keep jobs with names matching this glob pattern")
+@click.option("--log_filter", help="Only keep logs with names matching this glob pattern")
+@click.option(
+    "--grep",
+    help="Search log contents for this regex and print the matching lines, "
+    "can be given more than once",
+    multiple=True,
+)
+@click.option(
+    "--tail_bytes",
+    help="Only search about this many bytes at the end of each log",
+    type=int,
+)
+@click.option(
+    "--log_cache",
+    help="Directory to cache searched logs in, so searching them again "
+    "doesn't download them",
+)
+@click.option(
+    "--max_workers",
+    help="Number of tasks to get execution details for at once",
+    type=int,
+    default=hf.MAX_WORKERS,
+    show_default=True,
+)
+def find_logs(
+    profile,
+    project,
+    task_file,
+    debug,
+    output_file,
+    checkpoint,
+    job_filter,
+    log_filter,
+    grep,
+    tail_bytes,
+    log_cache,
+    max_workers,
+):
+    """Find log files in a project, or search their contents with --grep"""
+
+    # check the patterns before any logs are downloaded
+    try:
+        patterns = [re.compile(pattern) for pattern in grep]
+    except re.error as e:
+        raise click.BadParameter(f"invalid regex: {e}", param_hint="--grep")
 
     # read config file
-    api = hf.parse_config(profile)
+    api = hf.parse_config(profile, pool_size=max_workers)
 
     project = hf.parse_project(project)
 
-    # get all tasks or a list of tasks in a project
+    # get all completed tasks or a list of tasks in a project
     tasks = []
     if project and task_file:
         raise ValueError("Either 'project' or 'task_file' must be set. Not Both.")
     elif project:
-        tasks = hf.get_all_tasks(api, project)
+        tasks = list(hf.find_tasks(api, statuses=["COMPLETED"], project=project))
     elif task_file:
         with open(task_file, "r") as f:
-            for line in f:
-                task_id = line.strip()
-                task = api.tasks.get(id=task_id)
+            task_ids = [line.strip() for line in f if line.strip()]
+        for task_id, task in hf.bulk_get_tasks(api, task_ids):
+            if task is None:
+                print(f"Could not find task {task_id}, skipping")
+                continue
+            if task.status == "COMPLETED":
                 tasks.append(task)
     else:
         raise ValueError("Either 'project' or 'task_file' must be set.")
 
-    out_strings = []
-
-    for task in tasks:
-
+    # skip tasks finished in an earlier run
+    done = set()
+    if checkpoint and os.path.exists(checkpoint):
+        with open(checkpoint, "r") as f:
+            done = set(line.strip() for line in f)
+        tasks = [task for task in tasks if task.id not in done]
         if debug:
-            print(task.name)
-
-        if task.status == "COMPLETED":
-            # get task details
-            exec_dets = task.get_execution_details()
-            task_jobs = exec_dets.jobs
-            for job in task_jobs:
-                for log in job.logs:
-                    #if job.logs[log] is not None:
-                    try:
-                        log_name = job.logs[log].name
-                        log_id = job.logs[log].id
-                        out_strings.append(
-                            f"{task.name}\t{job.name}\t{log_name}\t{log_id}"
-                        )
-                    except Exception as e:
-                        continue
-
-
-    # write out_strings to output file
+            print(f"Skipping {len(done)} tasks in {checkpoint}", file=sys.stderr)
+
+    if patterns:
+        # download urls are signed, so this session has no api headers
+        session = requests.Session()
+        retries = Retry(
+            total=hf.RETRIES,
+            backoff_factor=hf.BACKOFF,
+            status_forcelist=[500, 502, 503, 504],
+        )
+        session.mount(
+            "https://", HTTPAdapter(pool_maxsize=max_workers, max_retries=retries)
+        )
+        get_rows = partial(
+            search_log_rows,
+            session=session,
+            patterns=patterns,
+            cache_dir=log_cache,
+            tail=tail_bytes,
+        )
+        header = "Task_Name\tJob_Name\tLog_Name\tLine\tText"
+    else:
+        get_rows = get_log_rows
+        header = "Task_Name\tJob_Name\tLog_Name\tLog_ID"
+    resuming = bool(done) and output_file and os.path.exists(output_file)
     if output_file:
-        with open(output_file, "w") as out_f:
-            if debug:
-                out_f.write("Task_Name\tJob_Name\tLog_Name\tLog_ID\n")
-            for out_str in out_strings:
-                out_f.write(f"{out_str}\n")
+        out_f = open_output(output_file, "a" if resuming else "w")
+        if debug and not resuming:
+            out_f.write(f"{header}\n")
     else:
-        print("Task_Name\tJob_Name\tLog_Name\tLog_ID")
-        for out_str in out_strings:
-            print(out_str)
+        out_f = sys.stdout
+        print(header)
+
+    check_f = open(checkpoint, "a") if checkpoint else None
+    try:
+        # rows are written as each task's details arrive, in no particular order
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = {
+                executor.submit(get_rows, task, job_filter, log_filter): task
+                for task in tasks
+            }
+            for future in as_completed(futures):
+                task = futures[future]
+                if debug:
+                    print(task.name, file=sys.stderr)
+                try:
+                    rows = future.result()
+                except (SbgError, requests.RequestException) as e:
+                    # not added to the checkpoint so it's tried again next run
+                    print(f"Could not get details of {task.id}: {e}", file=sys.stderr)
+                    continue
+                for row in rows:
+                    out_f.write(f"{row}\n")
+                out_f.flush()
+                if check_f:
+                    check_f.write(f"{task.id}\n")
+                    check_f.flush()
+    finally:
+        if check_f:
+            check_f.close()
+        if output_file:
+            out_f.close()
+
+
+def open_output(output_file, mode):
+    """
+    Open the output file as text, with gzip if the name ends with .gz.
+    Appending to a gzip file adds a new gzip member, which readers handle.
+    """
+    if output_file.endswith(".gz"):
+        return gzip.open(output_file, mode + "t")
+    return open(output_file, mode)
+
+
+def get_task_logs(task, job_filter=None, log_filter=None):
+    """
+    Get the log files of a task's jobs.
+    Inputs:
+    - task object
+    - job_filter: glob pattern job names have to match
+    - log_filter: glob pattern log names have to match
+    Returns:
+    - list of (job name, log name, log file object) tuples
+    """
+    logs = []
+    exec_dets = task.get_execution_details()
+    for job in exec_dets.jobs:
+        if job_filter and not fnmatch(job.name, job_filter):
+            continue
+        for log in job.logs:
+            # jobs can have empty logs
+            log_file = job.logs[log]
+            if log_file is None:
+                continue
+            if log_filter and not fnmatch(log, log_filter):
+                continue
+            logs.append((job.name, log, log_file))
+    return logs
+
+
+def get_log_rows(task, job_filter=None, log_filter=None):
+    """
+    Get the log files of a task's jobs as output rows.
+    Returns:
+    - list of tab separated task name, job name, log name, and log id
+    """
+    rows = []
+    for job_name, log, log_file in get_task_logs(task, job_filter, log_filter):
+        try:
+            log_name = log_file.name
+        except Exception:
+            continue
+        rows.append(f"{task.name}\t{job_name}\t{log_name}\t{log_file.id}")
+    return rows
+
+
+def search_log_rows(
+    task,
+    job_filter=None,
+    log_filter=None,
+    session=None,
+    patterns=None,
+    cache_dir=None,
+    tail=None,
+):
+    """
+    Search the contents of a task's logs, without saving them unless cache_dir is set.
+    Inputs:
+    - task object
+    - job_filter: glob pattern job names have to match
+    - log_filter: glob pattern log names have to match
+    - session: requests session for the log download urls
+    - patterns: list of compiled regex patterns to search for
+    - cache_dir: directory to cache logs in by file id
+    - tail: only search about the last tail bytes of each log
+    Returns:
+    - list of tab separated task name, job name, log name, line number, and line
+    """
+    rows = []
+    for job_name, log, log_file in get_task_logs(task, job_filter, log_filter):
+        lines = log_search.read_log(session, log_file, cache_dir, tail=tail)
+        for line_no, line in log_search.search_lines(lines, patterns):
+            rows.append(f"{task.name}\t{job_name}\t{log}\t{line_no}\t{line}")
+    return rows
 
 
 if __name__ == "__main__":
@@ -28,18 +28,15 @@ def find_tasks(project, profile, status):
 
     project = hf.parse_project(project)
 
-    # get all tasks in project
-    all_tasks = hf.get_all_tasks(api, project)
-
     stati = [s.strip().upper() for s in status.split(",")]
 
 
     print("Task Name\tTask Id\tStart Time\tEnd Time\tTask Status\t App Id")
 
 
-    for task in all_tasks:
-       if task.status.upper() in stati:
-          print(f"{task.name}\t{task.id}\t{task.start_time}\t{task.end_time}\t{task.status}\t{task.app}")
+    # only tasks with the requested statuses are fetched
+    for task in hf.find_tasks(api, statuses=stati, project=project):
+       print(f"{task.name}\t{task.id}\t{task.start_time}\t{task.end_time}\t{task.status}\t{task.app}")
 
             #print(dir(task))
 
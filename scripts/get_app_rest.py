@@ -1,27 +1,13 @@
 """Get app info from REST api"""
 
 import click
-import requests
 import gzip
 import json
-import configparser
-from pathlib import Path
+from helper_functions import helper_functions as hf
 
 CONTEXT_SETTINGS = dict(help_option_names=["-h", "--help"])
 
 
-def parse_config(profile):
-    """
-    Parse the config file and return the api object.
-    """
-    home = Path.home()
-    config = configparser.ConfigParser()
-    config.read(home / ".sevenbridges/credentials")
-    url = config[profile]["api_endpoint"]
-    token = config[profile]["auth_token"]
-    return [url, token]
-
-
 def get_pattern(source, steps):
     """
     Get the glob pattern for an output source.
@@ -84,8 +70,8 @@ def get_pattern(source, steps):
 def get_app(profile, app, file, dump_file):
     """Get app information from Seven Bridges."""
 
-    # get token and url from credentials file
-    url, token = parse_config(profile)
+    # get url from credentials file and a session reused for every app
+    url, session = hf.rest_session(profile)
 
     apps = []
 
@@ -99,11 +85,6 @@ def get_app(profile, app, file, dump_file):
         print("Please provide either an app ID or a file with a list of app IDs.")
         return
 
-    header = {
-        "X-SBG-Auth-Token": f"{token}",
-        "accept": "application/json",
-    }
-
     #print(
     #    "app\tproject\trevisionNotes\trepo\thash\tfile\tcopy_pulled\tinputs (name:type:default)\toutputs (name:type:source:pattern)"
     #)
@@ -115,7 +96,7 @@ def get_app(profile, app, file, dump_file):
     for app in apps:
         app_url = f"{url}/apps/{app}"
 
-        response = requests.get(app_url, headers=header)
+        response = session.get(app_url)
 
         if response.status_code == 200:
             res = response.json()
@@ -2,6 +2,7 @@
 
 import sys
 import click
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from sevenbridges import Api
 from sevenbridges.errors import NotFound
@@ -12,57 +13,82 @@ CONTEXT_SETTINGS = dict(help_option_names=["-h", "--help"])
 
 def get_regular_files(api, all_tasks, debug=False):
     """
-    Get the file ids of output files from a list of tasks.
+    Get the output files of a list of tasks.
+    Output files and their secondary files are fetched in bulk, and output
+    folders are crawled in parallel.
     Inputs:
     - api object
     - list of task objects
-    Returns:
-    - list of file objects
+    Yields:
+    - file objects as they are found, files in output folders are named
+      with their path below the output folder
     """
-    files_to_display = []
+    output_ids = []
     for task in all_tasks:
-        initial_files = []
-        initial_files = check_and_get_files(task)
-
         if debug:
-            print(f"Current task id: {task.id}  {task.name}")
+            print(f"Current task id: {task.id}  {task.name}", file=sys.stderr)
+        output_ids.extend(getattr(f, "id", f) for f in check_and_get_files(task))
+
+    seen = set()
+    folders = []
+    secondary_ids = []
+    for file_id, file_obj in hf.bulk_get_files(api, dict.fromkeys(output_ids)):
+        if file_obj is None:
+            print(f"Can't find {file_id}, file doesn't exist", file=sys.stderr)
+        elif file_obj.is_folder():
+            folders.append(file_obj)
+        else:
+            if file_obj.id not in seen:
+                seen.add(file_obj.id)
+                yield file_obj
+            for secondary in file_obj.secondary_files or []:
+                secondary_ids.append(secondary.id)
+
+    # check that the secondary files exist
+    secondary_ids = [i for i in dict.fromkeys(secondary_ids) if i not in seen]
+    for file_id, file_obj in hf.bulk_get_files(api, secondary_ids):
+        if file_obj is None:
+            print(f"Can't find {file_id}, file doesn't exist", file=sys.stderr)
+            continue
+        seen.add(file_obj.id)
+        yield file_obj
 
-        # loop through files and add any secondary files, and check that both files exist
-        for file in initial_files:
-            try:
-                file_obj = api.files.get(id=file)
-            except NotFound as e:
-                print(f"Can't find {file}, file doesn't exist", file=sys.stderr)
-
-            if file_obj.is_folder():
-                sub_files = hf.get_all_files_folder(api, file_obj)
-                for f in sub_files:
-                    if f.parent:
-                        parent = api.files.get(id=f.parent)
-                        f.name = f"{parent.name}/{f.name}"
-                        while parent.parent:
-                            parent = api.files.get(id=parent.parent)
-                            if parent.parent is not None:
-                                f.name = f"{parent.name}/{f.name}"
-                    if not f.is_folder():
-                        files_to_display.append(f)
+    # path of each folder from the project root, the root itself is ""
+    folder_paths = {}
+
+    def folder_path(folder_id):
+        if folder_id not in folder_paths:
+            folder = api.files.get(id=folder_id)
+            if folder.parent is None:
+                folder_paths[folder_id] = ""
             else:
-                files_to_display.append(file)
+                parent_path = folder_path(folder.parent)
+                folder_paths[folder_id] = "/".join(
+                    p for p in [parent_path, folder.name] if p
+                )
+        return folder_paths[folder_id]
+
+    # output folders share parents, so each ancestor is only fetched once
+    prefixes = {}
+    for folder in folders:
+        parent_path = folder_path(folder.parent) if folder.parent else ""
+        prefixes[folder.id] = "/".join(p for p in [parent_path, folder.name] if p)
 
-            if file_obj.secondary_files is not None:
-                for secondary in file.secondary_files:
-                    try:
-                        file_obj = api.files.get(id=secondary)
-                    except NotFound as e:
-                        print(
-                            f"Can't find {file_obj.name}, file doesn't exist",
-                            file=sys.stderr,
-                        )
-                    # check if secondary already in list
-                    if secondary not in files_to_display:
-                        files_to_display.append(secondary)
+    # the crawler tracks each file's path below the output folder
+    def crawl(folder):
+        return [
+            (path, f)
+            for path, f in hf.crawl_folders(api, folder=folder)
+            if not f.is_folder()
+        ]
 
-    return files_to_display
+    with ThreadPoolExecutor(max_workers=hf.MAX_WORKERS) as executor:
+        for folder, files in zip(folders, executor.map(crawl, folders)):
+            for path, f in files:
+                if f.id not in seen:
+                    seen.add(f.id)
+                    f.name = f"{prefixes[folder.id]}/{path}"
+                    yield f
 
 
 def get_scrna_files(api, all_tasks, debug=False):
@@ -182,12 +208,18 @@ def check_and_get_files(task):
     is_flag=True,
     default=False,
 )
-def get_task_files(task_file, task_id, profile, debug, scrna):
+@click.option(
+    "--cache",
+    help="Answer repeated api lookups from a response cache",
+    is_flag=True,
+    default=False,
+)
+def get_task_files(task_file, task_id, profile, debug, scrna, cache):
     """
     Take a task or a list of tasks and find all output files.
     """
     # read config file
-    api = hf.parse_config(profile)
+    api = hf.parse_config(profile, cache=cache)
 
     # get all of the tasks either from --task_id or reading the --task_file file
     all_tasks = []
@@ -198,9 +230,12 @@ def get_task_files(task_file, task_id, profile, debug, scrna):
         all_tasks.append(api.tasks.get(id=task_id))
     elif task_file:
         with open(task_file, "r") as f:
-            for line in f:
-                task_id = line.strip()
-                all_tasks.append(api.tasks.get(id=task_id))
+            task_ids = [line.strip() for line in f if line.strip()]
+        for task_id, task in hf.bulk_get_tasks(api, task_ids):
+            if task is None:
+                print(f"Can't find task {task_id}, skipping", file=sys.stderr)
+                continue
+            all_tasks.append(task)
 
     files_to_display = []
     if scrna:
@@ -208,12 +243,13 @@ def get_task_files(task_file, task_id, profile, debug, scrna):
     else:
         files_to_display = get_regular_files(api, all_tasks, debug)
 
+    # print files as they are found
     print(f"file_name\tfile_id")
-    if len(files_to_display) > 0:
-        # format output
-        for file in files_to_display:
-            print(f"{file.name}\t{file.id}")
-    else:
+    file_count = 0
+    for file in files_to_display:
+        file_count += 1
+        print(f"{file.name}\t{file.id}", flush=True)
+    if file_count == 0:
         print("No files found in input task(s)")
 
 
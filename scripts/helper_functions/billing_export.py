@@ -0,0 +1,205 @@
+"""Export billing group storage, analysis, and egress breakdowns as flat records
+
+Long date ranges are split into windows and every breakdown of every window is
+fetched at once, following all pages. Each breakdown item becomes a record with
+the same RECORD_COLUMNS, so all of them fit in one table.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+try:
+    from .helper_functions import MAX_WORKERS, iter_pages
+except ImportError:
+    # imported on its own, for example by the unit tests
+    from helper_functions import MAX_WORKERS, iter_pages
+
+# date format of the billing api
+DATE_FORMAT = "%m-%d-%Y"
+
+BREAKDOWNS = ["storage", "analysis", "egress"]
+
+RECORD_COLUMNS = [
+    "breakdown",
+    "date_from",
+    "date_to",
+    "project_name",
+    "category",
+    "cost",
+    "currency",
+    "size",
+    "unit",
+    "analysis_id",
+    "analysis_name",
+    "analysis_app_name",
+    "analysis_type",
+    "analysis_status",
+    "ran_by",
+    "time_started",
+    "time_finished",
+    "computation_cost",
+    "storage_cost",
+    "refunded_amount",
+    "location",
+    "downloaded_by",
+    "project_locked",
+]
+
+
+def date_windows(date_from, date_to, days=30) -> list:
+    """
+    Split a date range into windows of at most days days.
+    The windows don't overlap and together cover the whole range.
+    Inputs:
+    - date_from: first date, in mm-dd-yyyy format
+    - date_to: last date, in mm-dd-yyyy format
+    - days: number of days in each window
+    Returns:
+    - list of (date_from, date_to) tuples in mm-dd-yyyy format
+    """
+    start = datetime.strptime(date_from, DATE_FORMAT)
+    end = datetime.strptime(date_to, DATE_FORMAT)
+    if end < start:
+        raise ValueError(f"End date {date_to} is before start date {date_from}")
+    windows = []
+    while start <= end:
+        window_end = min(start + timedelta(days=days - 1), end)
+        windows.append(
+            (start.strftime(DATE_FORMAT), window_end.strftime(DATE_FORMAT))
+        )
+        start = window_end + timedelta(days=1)
+    return windows
+
+
+def to_float(value):
+    # the api sends some amounts as strings
+    return None if value is None else float(value)
+
+
+def storage_records(item, date_from, date_to) -> list:
+    """
+    Convert a storage breakdown item to records, one for active
+    and one for archived storage.
+    """
+    records = []
+    for category in ["active", "archived"]:
+        measurement = getattr(item, category, None)
+        if measurement is None:
+            continue
+        cost = measurement.cost
+        records.append(
+            {
+                "breakdown": "storage",
+                "date_from": date_from,
+                "date_to": date_to,
+                "project_name": item.project_name,
+                "category": category,
+                "cost": to_float(cost.amount) if cost else None,
+                "currency": cost.currency if cost else None,
+                "size": to_float(measurement.size),
+                "unit": measurement.unit,
+                "location": item.location,
+                "project_locked": item.project_locked,
+            }
+        )
+    return records
+
+
+def analysis_records(item, date_from, date_to) -> list:
+    """
+    Convert an analysis breakdown item to a record.
+    """
+    cost = item.analysis_cost
+    breakdown = cost.breakdown if cost else None
+    return [
+        {
+            "breakdown": "analysis",
+            "date_from": date_from,
+            "date_to": date_to,
+            "project_name": item.project_name,
+            "category": item.analysis_type,
+            "cost": to_float(cost.amount) if cost else None,
+            "currency": cost.currency if cost else None,
+            "analysis_id": item.analysis_id,
+            "analysis_name": item.analysis_name,
+            "analysis_app_name": item.analysis_app_name,
+            "analysis_type": item.analysis_type,
+            "analysis_status": item.analysis_status,
+            "ran_by": item.ran_by,
+            "time_started": item.time_started,
+            "time_finished": item.time_finished,
+            "computation_cost": to_float(breakdown.computation) if breakdown else None,
+            "storage_cost": to_float(breakdown.storage) if breakdown else None,
+            "refunded_amount": to_float(item.refunded_amount),
+            "project_locked": item.project_locked,
+        }
+    ]
+
+
+def egress_records(item, date_from, date_to) -> list:
+    """
+    Convert an egress breakdown item to a record.
+    """
+    cost = item.egress_cost
+    downloaded = item.downloaded
+    return [
+        {
+            "breakdown": "egress",
+            "date_from": date_from,
+            "date_to": date_to,
+            "project_name": item.project_name,
+            "category": "downloaded",
+            "cost": to_float(cost.amount) if cost else None,
+            "currency": cost.currency if cost else None,
+            "size": to_float(downloaded.size) if downloaded else None,
+            "unit": downloaded.unit if downloaded else None,
+            "downloaded_by": item.downloaded_by,
+            "project_locked": item.project_locked,
+        }
+    ]
+
+
+RECORD_MAKERS = {
+    "storage": storage_records,
+    "analysis": analysis_records,
+    "egress": egress_records,
+}
+
+
+def fetch_breakdowns(
+    billing, date_from, date_to, window_days=30, breakdowns=None, max_workers=None
+):
+    """
+    Fetch the breakdowns of a billing group for a date range.
+    Every breakdown of every window is fetched in parallel, following all pages.
+    Inputs:
+    - billing: billing group object
+    - date_from: first date, in mm-dd-yyyy format
+    - date_to: last date, in mm-dd-yyyy format
+    - window_days: number of days per request
+    - breakdowns: list of storage, analysis, and/or egress, defaults to all
+    - max_workers: maximum number of breakdown windows to fetch at once,
+      defaults to MAX_WORKERS
+    Yields:
+    - record dicts with RECORD_COLUMNS, in window order
+    """
+    jobs = [
+        (breakdown, window)
+        for window in date_windows(date_from, date_to, window_days)
+        for breakdown in breakdowns or BREAKDOWNS
+    ]
+
+    def fetch(job):
+        breakdown, (start, end) = job
+        query = getattr(billing, f"{breakdown}_breakdown")
+        items = iter_pages(lambda **page: query(date_from=start, date_to=end, **page))
+        make_records = RECORD_MAKERS[breakdown]
+        return [
+            {column: None for column in RECORD_COLUMNS} | record
+            for item in items
+            for record in make_records(item, start, end)
+        ]
+
+    with ThreadPoolExecutor(max_workers=max_workers or MAX_WORKERS) as executor:
+        for records in executor.map(fetch, jobs):
+            yield from records
@@ -0,0 +1,205 @@
+"""Task cost statistics from a table of tasks
+
+Tasks are streamed into columns, one value per task, and turned into a pandas
+DataFrame so totals, percentiles, and outliers are computed for every group at once.
+"""
+
+import numpy as np
+import pandas as pd
+from pathlib import Path
+
+try:
+    import matplotlib
+
+    # save figures to files instead of opening a window
+    matplotlib.use("Agg")
+    from matplotlib import pyplot as plt
+except ImportError:
+    # matplotlib is only needed for histograms
+    plt = None
+
+# columns of the task table
+TASK_COLUMNS = [
+    "project",
+    "id",
+    "app",
+    "revision",
+    "app_id",
+    "status",
+    "price",
+    "duration",
+    "instance_type",
+]
+
+# columns with few distinct values, stored as categories
+CATEGORY_COLUMNS = ["project", "app", "revision", "app_id", "status", "instance_type"]
+
+# percentiles in the summary
+PERCENTILES = [0.5, 0.9, 0.99]
+
+
+def split_app(app):
+    """
+    Split an app id like user/project/app_name/3
+    Returns:
+    - app name, revision, and app id without the revision
+    """
+    parts = (app or "").split("/")
+    if len(parts) > 3:
+        return parts[-2], parts[-1], "/".join(parts[:-1])
+    return parts[-1], None, app
+
+
+def task_row(task) -> list:
+    """
+    Get the values of a task for the task table, in the order of TASK_COLUMNS.
+    Price and duration are NaN for tasks that haven't finished.
+    """
+    app_name, revision, app_id = split_app(task.app)
+    price = task.price.amount if task.price else np.nan
+    if task.start_time and task.end_time:
+        duration = (task.end_time - task.start_time).total_seconds()
+    else:
+        duration = np.nan
+    instance_type = (task.execution_settings or {}).get("instance_type")
+    return [
+        task.project,
+        task.id,
+        app_name,
+        revision,
+        app_id,
+        task.status,
+        price,
+        duration,
+        instance_type,
+    ]
+
+
+def tasks_to_frame(tasks) -> pd.DataFrame:
+    """
+    Stream tasks into a task table.
+    Only one value per column is kept for each task, not the task objects.
+    Inputs:
+    - tasks: iterable of task objects
+    Returns:
+    - DataFrame with TASK_COLUMNS, price in dollars and duration in seconds
+    """
+    columns = [[] for _ in TASK_COLUMNS]
+    for task in tasks:
+        for column, value in zip(columns, task_row(task)):
+            column.append(value)
+    return make_frame(dict(zip(TASK_COLUMNS, columns)))
+
+
+def make_frame(columns) -> pd.DataFrame:
+    """
+    Make a task table from a dict of column lists with the right dtypes.
+    """
+    df = pd.DataFrame(columns, columns=TASK_COLUMNS)
+    df["price"] = df["price"].astype("float64")
+    df["duration"] = df["duration"].astype("float64")
+    for column in CATEGORY_COLUMNS:
+        df[column] = df[column].astype("category")
+    return df
+
+
+def concat_frames(frames) -> pd.DataFrame:
+    """
+    Combine task tables, for example from several projects, keeping categories.
+    """
+    frames = list(frames)
+    if not frames:
+        return make_frame({})
+    df = pd.concat(frames, ignore_index=True)
+    for column in CATEGORY_COLUMNS:
+        df[column] = df[column].astype("category")
+    return df
+
+
+def summarize(df, by="app") -> pd.DataFrame:
+    """
+    Cost statistics per group, with an "all" row for every task.
+    Inputs:
+    - df: task table
+    - by: column to group by, for example app, project, or instance_type
+    Returns:
+    - DataFrame indexed by group with task count, total, mean, stdev, percentile,
+      and highest and lowest cost columns
+    """
+    df = df[df["price"].notna()]
+    groups = {
+        "all": df.assign(**{by: "all"}),
+        by: df,
+    }
+    summaries = []
+    for frame in groups.values():
+        grouped = frame.groupby(by, observed=True)["price"]
+        summary = grouped.agg(["count", "sum", "mean", "std"])
+        summary.columns = ["task_count", "total_cost", "average_cost", "cost_stdev"]
+        percentiles = grouped.quantile(PERCENTILES).unstack()
+        percentiles.columns = [f"p{int(p * 100)}_cost" for p in percentiles.columns]
+        summary = summary.join(percentiles)
+        # idxmax and idxmin give the row of each group's most and least expensive task
+        summary["highest_task_id"] = frame.loc[grouped.idxmax(), "id"].values
+        summary["highest_cost"] = grouped.max()
+        summary["lowest_task_id"] = frame.loc[grouped.idxmin(), "id"].values
+        summary["lowest_cost"] = grouped.min()
+        summaries.append(summary)
+    summary = pd.concat(summaries)
+    summary.index = summary.index.astype(str)
+    summary.index.name = by
+    return summary
+
+
+def find_outliers(df, by="app", iqr_factor=1.5) -> pd.DataFrame:
+    """
+    Find tasks that cost much more or less than other tasks in their group.
+    A task is an outlier if its price is more than iqr_factor interquartile
+    ranges outside its group's middle 50%.
+    Inputs:
+    - df: task table
+    - by: column to group by
+    - iqr_factor: number of interquartile ranges from the quartiles
+    Returns:
+    - rows of the outlier tasks, most expensive first
+    """
+    df = df[df["price"].notna()]
+    grouped = df.groupby(by, observed=True)["price"]
+    q1 = grouped.transform("quantile", 0.25)
+    q3 = grouped.transform("quantile", 0.75)
+    iqr = q3 - q1
+    outlier = (df["price"] > q3 + iqr_factor * iqr) | (
+        df["price"] < q1 - iqr_factor * iqr
+    )
+    return df[outlier].sort_values("price", ascending=False)
+
+
+def save_histograms(df, out_dir, by="app", bins=20) -> list:
+    """
+    Save a histogram of task costs for each group as a png.
+    Inputs:
+    - df: task table
+    - out_dir: directory to save the histograms to
+    - by: column to group by
+    - bins: number of bars in each histogram
+    Returns:
+    - list of saved files
+    """
+    if plt is None:
+        raise ImportError("matplotlib is needed for histograms: pip install matplotlib")
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    saved = []
+    df = df[df["price"].notna()]
+    for group, prices in df.groupby(by, observed=True)["price"]:
+        fig, ax = plt.subplots()
+        ax.hist(prices.to_numpy(), bins=bins)
+        # Adding labels and a title for clarity
+        ax.set_xlabel("Cost")
+        ax.set_ylabel("Frequency")
+        ax.set_title(f"Histogram of {group} Prices")
+        path = out_dir / f"{str(group).replace('/', '_')}_cost_hist.png"
+        fig.savefig(path)
+        plt.close(fig)
+        saved.append(path)
+    return saved
@@ -0,0 +1,79 @@
+"""Append-only journal of bulk export jobs, used to resume an interrupted export"""
+
+import json
+from datetime import datetime
+
+
+def load(path) -> dict:
+    """
+    Read an export journal.
+    Later lines replace earlier ones, so each export ends up with its last state.
+    A partly written last line, left by a crash, is ignored.
+    Inputs:
+    - path: journal file, a missing file is an empty journal
+    Returns:
+    - dict of (file id, location) to the last record for that export
+    """
+    records = {}
+    try:
+        with open(path, "r") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                records[(record["file"], record["location"])] = record
+    except FileNotFoundError:
+        pass
+    return records
+
+
+def write(journal, file, location, state, export_id=None, error=None):
+    """
+    Append a record to an open journal and flush it to disk.
+    Inputs:
+    - journal: journal file opened for appending
+    - file: api file object
+    - location: location the file is exported to, without the file name
+    - state: SUBMITTED, NOT_SUBMITTED, NOT_FOUND, COMPLETED, FAILED, or ABORTED
+    - export_id: id of the export job
+    - error: error message if the export didn't complete
+    """
+    record = {
+        "file": file.id,
+        "name": file.name,
+        "location": location,
+        "state": state,
+        "export": export_id,
+        "error": None if error is None else str(error),
+        "time": datetime.now().isoformat(),
+    }
+    journal.write(json.dumps(record) + "\n")
+    journal.flush()
+
+
+def split_exports(records, exports):
+    """
+    Split exports into the ones to skip, re-poll, and submit based on a journal.
+    Inputs:
+    - records: journal records from load
+    - exports: list of (file, location) tuples
+    Returns:
+    - completed: list of (file, location) tuples that were already exported
+    - running: dict of export id to (file, location) for jobs still in flight
+    - pending: list of (file, location) tuples that need to be (re)submitted
+    """
+    completed = []
+    running = {}
+    pending = []
+    for f, loc in exports:
+        record = records.get((f.id, loc))
+        if record is None:
+            pending.append((f, loc))
+        elif record["state"] == "COMPLETED":
+            completed.append((f, loc))
+        elif record["state"] == "SUBMITTED":
+            running[record["export"]] = (f, loc)
+        else:
+            pending.append((f, loc))
+    return completed, running, pending
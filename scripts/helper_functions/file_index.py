@@ -0,0 +1,254 @@
+"""Local SQLite index of the files in a project"""
+
+import json
+import sqlite3
+from pathlib import Path
+
+# default location of the index, next to the sbg credentials file
+INDEX_PATH = Path.home() / ".sevenbridges/cache/file_index.sqlite"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    project TEXT NOT NULL,
+    id TEXT NOT NULL,
+    name TEXT NOT NULL,
+    parent TEXT,
+    path TEXT NOT NULL,
+    is_folder INTEGER NOT NULL,
+    size INTEGER,
+    storage_type TEXT,
+    modified_on TEXT,
+    metadata TEXT,
+    PRIMARY KEY (project, id)
+);
+CREATE INDEX IF NOT EXISTS files_name ON files (project, name);
+CREATE INDEX IF NOT EXISTS files_path ON files (project, path);
+CREATE INDEX IF NOT EXISTS files_parent ON files (project, parent);
+CREATE TABLE IF NOT EXISTS file_metadata (
+    project TEXT NOT NULL,
+    id TEXT NOT NULL,
+    key TEXT NOT NULL,
+    value TEXT,
+    PRIMARY KEY (project, id, key)
+);
+CREATE INDEX IF NOT EXISTS file_metadata_value ON file_metadata (project, key, value);
+CREATE TABLE IF NOT EXISTS projects (
+    project TEXT PRIMARY KEY,
+    indexed_on TEXT NOT NULL
+);
+"""
+
+COLUMNS = [
+    "project",
+    "id",
+    "name",
+    "parent",
+    "path",
+    "is_folder",
+    "size",
+    "storage_type",
+    "modified_on",
+    "metadata",
+]
+
+
+def connect(path=None):
+    """
+    Open the file index, creating it if it doesn't exist.
+    Inputs:
+    - path: sqlite file to use, defaults to INDEX_PATH
+    Returns:
+    - sqlite3 connection
+    """
+    path = path or INDEX_PATH
+    if str(path) != ":memory:":
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(path)
+    conn.row_factory = sqlite3.Row
+    conn.executescript(SCHEMA)
+    return conn
+
+
+def file_row(project, path, file) -> dict:
+    """
+    Convert an sbg file object to an index row.
+    Inputs:
+    - project: project name
+    - path: path of the file in the project, for example: results/out.vcf
+    - file: api file object
+    Returns:
+    - dict with one value per index column
+    """
+    is_folder = file.is_folder()
+    storage = getattr(file, "storage", None)
+    metadata = {} if is_folder or not file.metadata else dict(file.metadata.items())
+    return {
+        "project": project,
+        "id": file.id,
+        "name": file.name,
+        "parent": file.parent,
+        "path": path,
+        "is_folder": int(is_folder),
+        "size": file.size,
+        "storage_type": storage.type if storage is not None else None,
+        "modified_on": str(file.modified_on) if file.modified_on else None,
+        "metadata": json.dumps(metadata, default=str),
+    }
+
+
+def is_indexed(conn, project) -> bool:
+    """
+    Check if a project has been indexed.
+    """
+    row = conn.execute(
+        "SELECT 1 FROM projects WHERE project = ?", (project,)
+    ).fetchone()
+    return row is not None
+
+
+def get_folders(conn, project) -> dict:
+    """
+    Get the indexed folders of a project.
+    Returns:
+    - dict of folder id to (path, modified_on)
+    """
+    rows = conn.execute(
+        "SELECT id, path, modified_on FROM files WHERE project = ? AND is_folder = 1",
+        (project,),
+    )
+    return {row["id"]: (row["path"], row["modified_on"]) for row in rows}
+
+
+def get_sub_folders(conn, project, parent_ids) -> dict:
+    """
+    Get the indexed folders directly inside some folders of a project.
+    Inputs:
+    - conn: sqlite3 connection
+    - project: project name
+    - parent_ids: ids of the folders to look in
+    Returns:
+    - dict of folder id to parent folder id
+    """
+    parent_ids = list(parent_ids)
+    folders = {}
+    # stay under sqlite's limit on query parameters
+    for i in range(0, len(parent_ids), 500):
+        chunk = parent_ids[i : i + 500]
+        rows = conn.execute(
+            "SELECT id, parent FROM files WHERE project = ? AND is_folder = 1 "
+            f"AND parent IN ({', '.join('?' * len(chunk))})",
+            [project, *chunk],
+        )
+        folders.update({row["id"]: row["parent"] for row in rows})
+    return folders
+
+
+def save_files(conn, rows):
+    """
+    Add or replace files in the index.
+    Inputs:
+    - conn: sqlite3 connection
+    - rows: list of dicts made by file_row
+    """
+    conn.executemany(
+        f"INSERT OR REPLACE INTO files ({', '.join(COLUMNS)}) "
+        f"VALUES ({', '.join('?' * len(COLUMNS))})",
+        [[row[col] for col in COLUMNS] for row in rows],
+    )
+    conn.executemany(
+        "DELETE FROM file_metadata WHERE project = ? AND id = ?",
+        [(row["project"], row["id"]) for row in rows],
+    )
+    conn.executemany(
+        "INSERT INTO file_metadata (project, id, key, value) VALUES (?, ?, ?, ?)",
+        [
+            (row["project"], row["id"], key, None if value is None else str(value))
+            for row in rows
+            for key, value in json.loads(row["metadata"]).items()
+        ],
+    )
+
+
+def start_listing(conn):
+    """
+    Start recording the files seen by a listing, in a temp table so a listing
+    of any size isn't held in memory.
+    """
+    conn.execute("CREATE TEMP TABLE IF NOT EXISTS listed_ids (id TEXT PRIMARY KEY)")
+    conn.execute("DELETE FROM listed_ids")
+
+
+def mark_listed(conn, file_ids):
+    """
+    Record files that were seen by the current listing.
+    Inputs:
+    - conn: sqlite3 connection
+    - file_ids: ids of files that were listed
+    """
+    conn.executemany(
+        "INSERT OR IGNORE INTO listed_ids (id) VALUES (?)", [(i,) for i in file_ids]
+    )
+
+
+def prune(conn, project, keep_parents=()):
+    """
+    Remove files from a project's index that weren't seen in the current listing.
+    Inputs:
+    - conn: sqlite3 connection
+    - project: project name
+    - keep_parents: ids of folders that were not re-listed,
+      the files directly inside them are kept
+    """
+    for parent_id in keep_parents:
+        conn.execute(
+            "INSERT OR IGNORE INTO listed_ids (id) SELECT id FROM files "
+            "WHERE project = ? AND parent = ?",
+            (project, parent_id),
+        )
+    for table in ["files", "file_metadata"]:
+        conn.execute(
+            f"DELETE FROM {table} WHERE project = ? "
+            "AND id NOT IN (SELECT id FROM listed_ids)",
+            (project,),
+        )
+
+
+def mark_indexed(conn, project, indexed_on):
+    """
+    Record when a project was last indexed.
+    """
+    conn.execute(
+        "INSERT OR REPLACE INTO projects (project, indexed_on) VALUES (?, ?)",
+        (project, indexed_on),
+    )
+
+
+def find_by_name(conn, project, name) -> list:
+    """
+    Find indexed files in a project by name.
+    """
+    return conn.execute(
+        "SELECT * FROM files WHERE project = ? AND name = ?", (project, name)
+    ).fetchall()
+
+
+def find_by_path(conn, project, path) -> list:
+    """
+    Find indexed files in a project by path, for example: results/out.vcf
+    """
+    return conn.execute(
+        "SELECT * FROM files WHERE project = ? AND path = ?", (project, path)
+    ).fetchall()
+
+
+def find_by_metadata(conn, project, key, value) -> list:
+    """
+    Find indexed files in a project with a metadata key set to value.
+    """
+    return conn.execute(
+        "SELECT files.* FROM file_metadata JOIN files "
+        "ON files.project = file_metadata.project AND files.id = file_metadata.id "
+        "WHERE file_metadata.project = ? AND key = ? AND value = ?",
+        (project, key, str(value)),
+    ).fetchall()
+
@@ -1,13 +1,299 @@
 """Helper functions for sbg python api"""
 
 import configparser
+import queue
+import requests
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from datetime import datetime
+from itertools import islice
 from pathlib import Path
+from requests.adapters import HTTPAdapter
 from sevenbridges import Api
+from sevenbridges.errors import SbgError
 from sevenbridges.http.error_handlers import rate_limit_sleeper, maintenance_sleeper
+from sevenbridges.models.file import FileBulkRecord
+from urllib3 import Retry
+
+try:
+    from . import export_journal, file_index, response_cache, task_journal
+    from . import rate_limiter, task_warehouse
+except ImportError:
+    # helper_functions.py was imported on its own, for example by the unit tests
+    import export_journal
+    import file_index
+    import response_cache
+    import task_journal
+    import rate_limiter
+    import task_warehouse
 
 # set api limit for pagination
 LIMIT = 100
 
+# number of file names to look up in one query, keeps query urls under the length limit
+NAME_CHUNK = 50
+
+# export job states that won't change anymore
+EXPORT_DONE = ["COMPLETED", "FAILED", "ABORTED"]
+
+# task states that won't change anymore
+TASK_DONE = ["COMPLETED", "FAILED", "ABORTED"]
+
+# tasks fetched by bulk_get_tasks, kept for the rest of the command
+TASK_CACHE = {}
+
+# maximum number of api requests to have in flight at once,
+# requests close to the rate limit are paced by rate_limiter
+MAX_WORKERS = 8
+
+# http settings for api objects and REST sessions
+RETRIES = 6
+BACKOFF = 1
+TIMEOUT = 120
+
+
+def iter_pages(query, prefetch=1):
+    """
+    Yield the items of a paginated api query as their pages arrive.
+    The next pages are fetched in the background while the current page is
+    being processed, so only about prefetch pages are held in memory.
+    Inputs:
+    - query: function that takes limit and offset and returns a page,
+      for example: lambda **page: api.tasks.query(project=project, **page)
+    - prefetch: number of pages to fetch ahead of the current page, at least 1
+    Yields:
+    - items from all pages, in the same order as the api returns them
+    """
+    first_page = query(limit=LIMIT, offset=0)
+    yield from first_page
+    if len(first_page) < LIMIT:
+        return
+
+    pending = deque()
+    next_offset = LIMIT
+    with ThreadPoolExecutor(max_workers=max(prefetch, 1)) as executor:
+
+        def fill(always=False):
+            # fetch ahead up to the total, or one more page if the total is out of date
+            nonlocal next_offset
+            while len(pending) < max(prefetch, 1) and (
+                next_offset < first_page.total or always
+            ):
+                pending.append(executor.submit(query, limit=LIMIT, offset=next_offset))
+                next_offset += LIMIT
+                always = False
+
+        fill(always=True)
+        while pending:
+            page = pending.popleft().result()
+            fill()
+            yield from page
+            # the total isn't always up to date, keep going while pages come back full
+            if len(page) == LIMIT and not pending:
+                fill(always=True)
+
+
+def fetch_all_pages(query, max_workers=None) -> list:
+    """
+    Fetch every page of a paginated api query.
+    The first page is fetched to get the total number of items, then the
+    remaining pages are fetched in parallel.
+    Inputs:
+    - query: function that takes limit and offset and returns a page,
+      for example: lambda **page: api.tasks.query(project=project, **page)
+    - max_workers: maximum number of pages to fetch at once, defaults to MAX_WORKERS
+    Returns:
+    - list of items from all pages, in the same order as the api returns them
+    """
+    return list(iter_pages(query, prefetch=max_workers or MAX_WORKERS))
+
+
+def fetch_in_bulk(bulk_get, ids, max_workers=None):
+    """
+    Fetch resources by id with a bulk get endpoint.
+    Ids are sent in chunks of LIMIT (the max bulk size) and up to max_workers
+    chunks are fetched at once. Chunks are only read from ids as there's room
+    for them, so ids can be a generator of any length.
+    Inputs:
+    - bulk_get: bulk get function, for example: api.files.bulk_get
+    - ids: iterable of resource ids
+    - max_workers: maximum number of chunks to fetch at once, defaults to MAX_WORKERS
+    Yields:
+    - (id, resource) tuples in the same order as ids, resource is None
+      if the id wasn't found
+    """
+    window = max_workers or MAX_WORKERS
+    ids = iter(ids)
+    chunks = iter(lambda: list(islice(ids, LIMIT)), [])
+
+    def results(chunk, future):
+        for resource_id, record in zip(chunk, future.result()):
+            yield resource_id, record.resource if record.valid else None
+
+    with ThreadPoolExecutor(max_workers=window) as executor:
+        # futures are kept in submit order so the chunks come back in order
+        pending = deque()
+        for chunk in chunks:
+            pending.append((chunk, executor.submit(bulk_get, chunk)))
+            if len(pending) >= window:
+                yield from results(*pending.popleft())
+        while pending:
+            yield from results(*pending.popleft())
+
+
+def bulk_get_files(api, file_ids, max_workers=None):
+    """
+    Get file objects for a list of file ids using /bulk/files/get.
+    Inputs:
+    - api: api obejct
+    - file_ids: iterable of file ids
+    - max_workers: maximum number of chunks to fetch at once, defaults to MAX_WORKERS
+    Yields:
+    - (file_id, file) tuples in the same order as file_ids, file is None
+      if the file doesn't exist
+    """
+    return fetch_in_bulk(api.files.bulk_get, file_ids, max_workers)
+
+
+def bulk_get_tasks(api, task_ids, refresh=False, max_workers=None):
+    """
+    Get task objects for a list of task ids using /bulk/tasks/get.
+    Tasks are kept in TASK_CACHE so each task is only fetched once per command.
+    Inputs:
+    - api: api obejct
+    - task_ids: iterable of task ids
+    - refresh: fetch the tasks again even if they're cached,
+      for example to check the status of running tasks
+    - max_workers: maximum number of chunks to fetch at once, defaults to MAX_WORKERS
+    Yields:
+    - (task_id, task) tuples in the same order as task_ids, task is None
+      if the task doesn't exist
+    """
+    task_ids = list(task_ids)
+    to_fetch = [
+        task_id
+        for task_id in dict.fromkeys(task_ids)
+        if refresh or task_id not in TASK_CACHE
+    ]
+    for task_id in to_fetch:
+        TASK_CACHE.pop(task_id, None)
+
+    fetched = fetch_in_bulk(api.tasks.bulk_get, to_fetch, max_workers)
+    for task_id in task_ids:
+        # tasks are fetched in order, so only wait for the ones we need
+        while task_id not in TASK_CACHE:
+            fetched_id, task = next(fetched)
+            TASK_CACHE[fetched_id] = task
+        yield task_id, TASK_CACHE[task_id]
+
+
+def bulk_edit_files(api, items, max_workers=None, retries=RETRIES, backoff=BACKOFF):
+    """
+    Change some fields of files using /bulk/files/edit.
+    Only the fields and metadata keys in each item are sent, everything else
+    is kept. Items are sent in chunks of LIMIT and the chunks are sent in parallel.
+    A chunk that fails with a server error is sent again, editing is idempotent.
+    Inputs:
+    - api: api obejct
+    - items: list of dicts with the file id and the fields to change,
+      for example: {"id": file_id, "metadata": {"sample_id": "S1"}}
+    - max_workers: maximum number of chunks to send at once, defaults to MAX_WORKERS
+    - retries: number of times to resend a failed chunk
+    - backoff: seconds to wait before the first resend, doubled every time
+    Yields:
+    - (item, file, error) tuples in the same order as items, file is None
+      and error is the error message if the edit failed
+    """
+    items = list(items)
+    chunks = [items[i : i + LIMIT] for i in range(0, len(items), LIMIT)]
+
+    def edit(chunk):
+        for attempt in range(retries + 1):
+            try:
+                response = api.post(url="/bulk/files/edit", data={"items": chunk})
+                return [
+                    (record.resource, None)
+                    if record.valid
+                    else (None, record.error.message)
+                    for record in FileBulkRecord.parse_records(response, api=api)
+                ]
+            except (SbgError, requests.RequestException) as e:
+                # client errors will fail the same way again
+                status = getattr(e, "status", None)
+                if attempt == retries or (status and status < 500 and status != 429):
+                    return [(None, str(e))] * len(chunk)
+                time.sleep(backoff * 2**attempt)
+
+    with ThreadPoolExecutor(max_workers=max_workers or MAX_WORKERS) as executor:
+        # map keeps the chunks in order
+        for chunk, results in zip(chunks, executor.map(edit, chunks)):
+            for item, (file, error) in zip(chunk, results):
+                yield item, file, error
+
+
+def crawl_folders(api, project=None, folder=None, max_workers=None, descend=None):
+    """
+    Walk all files in a project or folder including in sub folders.
+    Folders are listed breadth first from a shared work queue so sibling
+    folders are listed in parallel and files are yielded as soon as their
+    page arrives.
+    Inputs:
+    - api: api obejct
+    - project: project name, to walk the whole project
+    - folder: file object with is_folder() == True, to walk a single folder
+    - max_workers: maximum number of pages to fetch at once, defaults to MAX_WORKERS
+    - descend: optional function taking (path, folder) that returns False for
+      folders that shouldn't be listed, all folders are listed by default
+    Yields:
+    - (path, file) tuples where path is the file name prefixed by the names
+      of the folders below the starting point, for example: results/sample/out.vcf
+    """
+    if (project is None) == (folder is None):
+        raise ValueError("ERROR: Either project or folder must be set. Not Both.")
+
+    if folder is not None and folder.is_folder() == False:
+        raise ValueError(f"ERROR: File {folder.name} is not a folder")
+
+    def list_page(parent, prefix, offset):
+        if parent is None:
+            page = api.files.query(project=project, limit=LIMIT, offset=offset)
+        else:
+            page = parent.list_files(limit=LIMIT, offset=offset)
+        return parent, prefix, offset, page
+
+    executor = ThreadPoolExecutor(max_workers=max_workers or MAX_WORKERS)
+    try:
+        pending = {executor.submit(list_page, folder, "", 0)}
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                parent, prefix, offset, page = future.result()
+
+                # queue the rest of the folder once the first page gives the total
+                if offset == 0:
+                    for next_offset in range(LIMIT, page.total, LIMIT):
+                        pending.add(
+                            executor.submit(list_page, parent, prefix, next_offset)
+                        )
+                # the total isn't always up to date, keep going while pages are full
+                if len(page) == LIMIT and offset + LIMIT >= page.total:
+                    pending.add(
+                        executor.submit(list_page, parent, prefix, offset + LIMIT)
+                    )
+
+                for file in page:
+                    path = f"{prefix}{file.name}"
+                    if file.is_folder() == True and (
+                        descend is None or descend(path, file)
+                    ):
+                        pending.add(executor.submit(list_page, file, f"{path}/", 0))
+                    yield path, file
+    finally:
+        # stop listing if the caller stops early
+        executor.shutdown(wait=False, cancel_futures=True)
+
 
 def get_all_files_folder(api, folder) -> list:
     """
@@ -18,32 +304,21 @@ def get_all_files_folder(api, folder) -> list:
     Returns:
     - list of file objects in the folder and subfolders
     """
+    return [file for path, file in crawl_folders(api, folder=folder)]
 
-    all_files = []
 
-    if folder.is_folder() == False:
-        raise ValueError(f"ERROR: File {folder.name} is not a folder")
-    
-    # get all of the files in a folder
-    all_files.extend(folder.list_files(limit=LIMIT))
-    keep_going = True
-    while keep_going:
-        folder_files = folder.list_files(limit=LIMIT, offset=len(all_files))
-        all_files.extend(folder_files)
-        if len(all_files) >= folder_files.total:
-            keep_going = False
-
-    # check if any of the files are a folder
-    for file in all_files:
-        if file.is_folder() == True:
-            received = LIMIT
-            folder_files = file.list_files(limit=LIMIT)
-            all_files.extend(folder_files)
-            while received < folder_files.total:
-                folder_files = file.list_files(limit=LIMIT, offset=received)
-                received += LIMIT
-
-    return all_files
+def iter_files(api, project, max_workers=None):
+    """
+    Yield all files in a project including in folders, as they are listed.
+    Inputs:
+    - api: api obejct
+    - project: project name
+    - max_workers: maximum number of folders to list at once, defaults to MAX_WORKERS
+    Yields:
+    - file objects in the project and its folders, folders included
+    """
+    for path, file in crawl_folders(api, project=project, max_workers=max_workers):
+        yield file
 
 
 def get_all_files(api, project) -> list:
@@ -53,81 +328,130 @@ def get_all_files(api, project) -> list:
     - api: api obejct
     - project: project name
     Returns:
-    -
-    """
-    all_files = []
-
-    # get all files in the project
-    project_obj = api.projects.get(id=project)
-
-    # query project for all files using pagination
-    received = LIMIT
-    project_files = project_obj.get_files(limit=LIMIT)
-    all_files.extend(project_files)
-    keep_going = True
-    last_id = all_files[-1].id
-    # while received < project_files.total:
-    while keep_going:
-        project_files = project_obj.get_files(limit=LIMIT, offset=received)
-        all_files.extend(project_files)
-        if all_files[-1].id == last_id:
-            keep_going = False
-        else:
-            last_id = all_files[-1].id
-        received += LIMIT
+    - list of file objects in the project and its folders
+    """
+    return list(iter_files(api, project))
+
+
+def update_file_index(api, project, refresh=True, index_path=None) -> int:
+    """
+    List the files in a project and save them to the local file index.
+    A folder's modified time only changes when its own files change, so when
+    refreshing, a folder that hasn't changed isn't listed again but its
+    sub folders are still fetched to check if they changed.
+    Inputs:
+    - api: api obejct
+    - project: project name
+    - refresh: only list folders that were modified since the project was last
+      indexed, otherwise list the whole project
+    - index_path: sqlite file to use, defaults to file_index.INDEX_PATH
+    Returns:
+    - number of files that were listed or checked
+    """
+    conn = file_index.connect(index_path)
+    indexed_folders = {}
+    if refresh and file_index.is_indexed(conn, project):
+        indexed_folders = file_index.get_folders(conn, project)
+    unchanged_folders = []
+    # unchanged folders still to look inside, by id to their current path
+    new_unchanged = {}
+
+    def folder_changed(path, folder):
+        if indexed_folders.get(folder.id) == (path, str(folder.modified_on)):
+            new_unchanged[folder.id] = path
+            return False
+        return True
 
-    # check if any of the files are a folder
-    for file in all_files:
-        if file.is_folder() == True:
-            received = LIMIT
-            folder_files = file.list_files(limit=LIMIT)
-            all_files.extend(folder_files)
-            while received < folder_files.total:
-                folder_files = file.list_files(limit=LIMIT, offset=received)
-                received += LIMIT
+    indexed_on = datetime.now().isoformat(timespec="seconds")
+    listed = 0
+    rows = []
+
+    def save():
+        file_index.save_files(conn, rows)
+        file_index.mark_listed(conn, [row["id"] for row in rows])
+        rows.clear()
+
+    def add(path, file):
+        nonlocal listed
+        listed += 1
+        rows.append(file_index.file_row(project, path, file))
+        if len(rows) >= 1000:
+            save()
+
+    with conn:
+        file_index.start_listing(conn)
+        # start from the root dir, then from every changed folder found below
+        # an unchanged one, until no unchanged folders are left to check
+        starts = [(None, "")]
+        while starts:
+            for start, prefix in starts:
+                walk = crawl_folders(
+                    api,
+                    project=project if start is None else None,
+                    folder=start,
+                    descend=lambda path, folder: folder_changed(prefix + path, folder),
+                )
+                for path, file in walk:
+                    add(prefix + path, file)
 
-    return all_files
+            parent_paths = dict(new_unchanged)
+            sub_folders = file_index.get_sub_folders(conn, project, parent_paths)
+            unchanged_folders.extend(parent_paths)
+            new_unchanged.clear()
+            starts = []
+            for folder_id, folder in bulk_get_files(api, sub_folders):
+                if folder is None:
+                    continue
+                # build the path from the parent, the indexed path is stale
+                # if the folder was renamed
+                path = f"{parent_paths[sub_folders[folder_id]]}/{folder.name}"
+                add(path, folder)
+                if folder_changed(path, folder):
+                    starts.append((folder, f"{path}/"))
 
+        save()
+        file_index.prune(conn, project, unchanged_folders)
+        file_index.mark_indexed(conn, project, indexed_on)
+    conn.close()
 
-def find_file_in_folder(folder, search_name, result_list=None):
+    return listed
+
+
+def find_indexed_files(api, project, file_name, index_path=None) -> list:
     """
-    Search for a file within a folder in a project.
+    Look up files by name in the local file index.
+    The files are fetched in bulk, so files that were deleted or renamed since
+    the project was indexed are left out.
     Inputs:
-    - folder: folder object
-    - search_name: file name to search for
+    - api: api obejct
+    - project: project name
+    - file_name: file name to lookup
+    - index_path: sqlite file to use, defaults to file_index.INDEX_PATH
     Returns:
-    - result_list: list of all results from recursive query
-    """
-
-    if result_list is None:
-        result_list = []
-
-    for file in folder:
-        if file.name == search_name:
-            result_list.append(file)
-        elif file.is_folder() == True:
-            # get all files in the folder using pagination
-            received = LIMIT
-            new_folder = file.list_files(limit=LIMIT)
-            find_file_in_folder(new_folder, search_name, result_list)
-            while received < new_folder.total:
-                find_file_in_folder(
-                    file.list_files(limit=LIMIT, offset=received),
-                    search_name,
-                    result_list,
-                )
-                received += LIMIT
+    - list of api file objects, empty if the project isn't indexed
+    """
+    conn = file_index.connect(index_path)
+    rows = []
+    if file_index.is_indexed(conn, project):
+        rows = file_index.find_by_name(conn, project, file_name)
+    conn.close()
 
-    return result_list
+    return [
+        file
+        for file_id, file in bulk_get_files(api, [row["id"] for row in rows])
+        if file is not None and file.name == file_name
+    ]
 
 
-def get_file_obj(api, project, file_name) -> str:
+def get_file_obj(api, project, file_name, use_index=True) -> str:
     """
     Lookup the file id for a file in a project.
     Inputs:
     - api: api obejct
     - project: project name
     - file_name: file name to lookup
+    - use_index: when the file isn't in the root dir, refresh the local file index
+      and look the file up there instead of searching every folder
     Returns:
     - file_obj: api file object
     """
@@ -137,23 +461,25 @@ def get_file_obj(api, project, file_name) -> str:
     # first search for the file directly
     files = api.files.query(project=project, names=[file_name])
     if len(files) == 0:
-        found_files = []
         print(
             f"File {file_name} not found in root dir of {project}, searching within folders"
         )
-        # search for the file in the project
-
-        # get all files in the project
-        project_obj = api.projects.get(id=project)
-
-        # query project for all files using pagination
-        received = LIMIT
-        project_files = project_obj.get_files(limit=LIMIT)
-        found_files = find_file_in_folder(project_files, file_name)
-        while received < project_files.total:
-            project_files = project_obj.get_files(limit=LIMIT, offset=received)
-            found_files.extend(find_file_in_folder(project_files, file_name))
-            received += LIMIT
+        # search for the file in all of the project's folders
+        if use_index:
+            # only folders that changed since the last lookup are listed
+            update_file_index(api, project)
+            found_files = find_indexed_files(api, project, file_name)
+            if len(found_files) == 0:
+                # files edited in place don't change their folder's modified
+                # time, so list every folder again before giving up
+                update_file_index(api, project, refresh=False)
+                found_files = find_indexed_files(api, project, file_name)
+        else:
+            found_files = [
+                file
+                for path, file in crawl_folders(api, project=project)
+                if file.name == file_name
+            ]
 
         if len(found_files) == 0:
             raise FileNotFoundError(
@@ -176,20 +502,287 @@ def get_file_obj(api, project, file_name) -> str:
     return file_obj
 
 
+def query_files(api, names=None, metadata=None, max_workers=None, **scope):
+    """
+    Query files with server side name and metadata filters.
+    Lists of names or metadata values are sent in chunks of NAME_CHUNK to keep
+    the query urls short, and the chunks are queried in parallel.
+    Only the folder given by scope is searched, not its sub folders.
+    Inputs:
+    - api: api obejct
+    - names: list of file names to find
+    - metadata: dict of metadata key to a value or a list of values to find,
+      for example: {"sample_id": ["S1", "S2"]}
+    - max_workers: maximum number of chunks to query at once, defaults to MAX_WORKERS
+    - scope: project or parent, for example: project="user/project" for the root dir
+    Yields:
+    - matching file objects
+    """
+    metadata = dict(metadata or {})
+    base_filters = {"metadata": metadata} if metadata else {}
+
+    # split the names, or the first list of metadata values, into chunks
+    list_key = next((k for k, v in metadata.items() if isinstance(v, list)), None)
+    if names is not None:
+        values = names
+
+        def chunk_filters(chunk):
+            return {**base_filters, "names": chunk}
+
+    elif list_key is not None:
+        values = metadata[list_key]
+
+        def chunk_filters(chunk):
+            return {"metadata": {**metadata, list_key: chunk}}
+
+    else:
+        values = [None]
+
+        def chunk_filters(chunk):
+            return base_filters
+
+    values = list(dict.fromkeys(values))
+    chunks = [values[i : i + NAME_CHUNK] for i in range(0, len(values), NAME_CHUNK)]
+
+    def query_chunk(chunk):
+        filters = chunk_filters(chunk)
+        return fetch_all_pages(
+            lambda **page: api.files.query(**scope, **filters, **page)
+        )
+
+    with ThreadPoolExecutor(max_workers=max_workers or MAX_WORKERS) as executor:
+        for files in executor.map(query_chunk, chunks):
+            yield from files
+
+
+def find_files_by_metadata(api, project, key, values, use_index=True) -> dict:
+    """
+    Find the files in a project with a metadata key set to one of values.
+    Metadata is filtered on the server, so the results are always up to date.
+    The root dir and every folder in the local file index are queried in parallel.
+    Inputs:
+    - api: api obejct
+    - project: project name
+    - key: metadata key, for example: sample_id
+    - values: list of metadata values to find
+    - use_index: get the project's folders from the local file index,
+      otherwise every file in the project is listed and checked
+    Returns:
+    - dict of metadata value to list of file objects, values without files are left out
+    """
+    values = [str(value) for value in dict.fromkeys(values)]
+    wanted = set(values)
+    matches = {}
+
+    def add(file):
+        value = file.metadata.get(key) if file.metadata else None
+        if value is not None and str(value) in wanted:
+            files = matches.setdefault(str(value), [])
+            if file.id not in [f.id for f in files]:
+                files.append(file)
+
+    if not use_index:
+        for file in iter_files(api, project):
+            if not file.is_folder():
+                add(file)
+        return matches
+
+    # editing metadata doesn't change a folder's modified time, so the index
+    # is only used for the folders and their files are queried on the server
+    update_file_index(api, project)
+    conn = file_index.connect()
+    folder_ids = list(file_index.get_folders(conn, project))
+    conn.close()
+    scopes = [{"project": project}] + [{"parent": f} for f in folder_ids]
+
+    def query_scope(scope):
+        return list(query_files(api, metadata={key: values}, max_workers=1, **scope))
+
+    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+        for files in executor.map(query_scope, scopes):
+            for file in files:
+                add(file)
+    return matches
+
+
+def find_exportable_files(api, project):
+    """
+    Find the files in a project that are stored on the platform.
+    Storage can't be filtered on the server and exporting a file doesn't change
+    its folder's modified time, so every file in the project is listed and checked.
+    Inputs:
+    - api: api obejct
+    - project: project name
+    Yields:
+    - file objects that haven't been exported
+    """
+    for file in iter_files(api, project):
+        if not file.is_folder() and file.storage.type == "PLATFORM":
+            yield file
+
+
+def resolve_file_names(api, project, names, use_index=True):
+    """
+    Lookup the file objects for a list of file names in a project.
+    Names are looked up in the root dir in chunks, then any names that
+    weren't found are searched for in one pass over the project's folders.
+    Inputs:
+    - api: api obejct
+    - project: project name
+    - names: list of file names to lookup
+    - use_index: search the project's folders through the local file index
+    Returns:
+    - found: dict of file name to api file object
+    - missing: list of names that weren't found in the project
+    - ambiguous: list of names with more than one file in the project
+    """
+    names = list(dict.fromkeys(names))
+    matches = {name: [] for name in names}
+
+    # first search for the files directly
+    for file in query_files(api, names=names, project=project):
+        if file.name in matches:
+            matches[file.name].append(file)
+
+    # then search within folders for anything not in the root dir
+    leftover = [name for name in names if not matches[name]]
+    if leftover:
+        print(
+            f"{len(leftover)} files not found in root dir of {project}, searching within folders"
+        )
+        if use_index:
+            # list only changed folders first, then every folder again for
+            # anything still missing, files edited in place don't change
+            # their folder's modified time
+            for refresh in [True, False]:
+                update_file_index(api, project, refresh=refresh)
+                conn = file_index.connect()
+                file_ids = [
+                    row["id"]
+                    for name in leftover
+                    for row in file_index.find_by_name(conn, project, name)
+                ]
+                conn.close()
+                for file_id, file in bulk_get_files(api, file_ids):
+                    # skip files deleted or renamed since they were indexed
+                    if file is not None and file.name in leftover:
+                        matches[file.name].append(file)
+                leftover = [name for name in leftover if not matches[name]]
+                if not leftover:
+                    break
+        else:
+            leftover = set(leftover)
+            for path, file in crawl_folders(api, project=project):
+                if file.name in leftover:
+                    matches[file.name].append(file)
+
+    found = {name: files[0] for name, files in matches.items() if len(files) == 1}
+    missing = [name for name, files in matches.items() if len(files) == 0]
+    ambiguous = [name for name, files in matches.items() if len(files) > 1]
+
+    return found, missing, ambiguous
+
+
+def iter_tasks(api, prefetch=1, **kwargs):
+    """
+    Yield tasks available to user as their pages arrive, with kwargs as
+    query parameters for example: project, status, created_from, etc.
+    Inputs:
+    - api: api obejct
+    - prefetch: number of pages to fetch ahead, see iter_pages
+    """
+    return iter_pages(lambda **page: api.tasks.query(**page, **kwargs), prefetch)
+
+
+def task_app_matches(task_app, app) -> bool:
+    """
+    Check if a task's app is app. app can leave out the revision,
+    for example: user/project/app-name matches user/project/app-name/3
+    """
+    if app.count("/") >= 3:
+        return task_app == app
+    return task_app.rsplit("/", 1)[0] == app
+
+
+def find_tasks(api, statuses=None, app=None, max_workers=None, **filters):
+    """
+    Find tasks using server side filters.
+    One query is sent per status and the queries run in parallel, so only
+    matching tasks are downloaded. Tasks are yielded as their pages arrive,
+    and each query only fetches ahead while there's room in its queue.
+    Inputs:
+    - api: api obejct
+    - statuses: list of task statuses to find, for example: ["FAILED", "ABORTED"],
+      all statuses if None
+    - app: only keep tasks of this app, with or without the revision.
+      The api can't filter on app, so this is checked on the matching tasks
+    - max_workers: maximum number of queries to run at once, defaults to MAX_WORKERS
+    - filters: other api.tasks.query parameters, for example: project, parent,
+      created_from, created_to, started_from, started_to, ended_from, ended_to
+    Yields:
+    - matching tasks, grouped by status in the order of statuses
+    """
+    statuses = [s.strip().upper() for s in statuses] if statuses else [None]
+    done = object()
+    stop = threading.Event()
+
+    def put(results, item):
+        # give up if the caller stopped reading
+        while not stop.is_set():
+            try:
+                results.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def query_status(status, results):
+        status_filter = {"status": status} if status else {}
+        try:
+            for task in iter_tasks(api, **status_filter, **filters):
+                if not put(results, task):
+                    return
+        except Exception as e:
+            put(results, e)
+            return
+        put(results, done)
+
+    # a queue per status keeps the statuses in order while later ones fetch ahead
+    queues = [queue.Queue(maxsize=LIMIT) for _ in statuses]
+    executor = ThreadPoolExecutor(max_workers=max_workers or MAX_WORKERS)
+    try:
+        for status, results in zip(statuses, queues):
+            executor.submit(query_status, status, results)
+        for results in queues:
+            while (task := results.get()) is not done:
+                if isinstance(task, Exception):
+                    raise task
+                if app is None or task_app_matches(task.app, app):
+                    yield task
+    finally:
+        stop.set()
+        executor.shutdown(wait=True, cancel_futures=True)
+
+
+def iter_projects(api, prefetch=1):
+    """
+    Yield projects the user has access to as their pages arrive.
+    """
+    return iter_pages(api.projects.query, prefetch)
+
+
+def iter_billing_groups(api, prefetch=1):
+    """
+    Yield billing groups the user has access to as their pages arrive.
+    """
+    return iter_pages(api.billing_groups.query, prefetch)
+
+
 def get_all_tasks(api, project):
     """
     Get all tasks in a project.
     """
-    tasks = []
-    received = LIMIT
-    project_tasks = api.tasks.query(project=project, limit=LIMIT)
-    tasks.extend(project_tasks)
-    while received < project_tasks.total:
-        project_tasks = api.tasks.query(project=project, limit=LIMIT, offset=received)
-        tasks.extend(project_tasks)
-        received += LIMIT
-
-    return tasks
+    return list(iter_tasks(api, prefetch=MAX_WORKERS, project=project))
 
 
 def query_tasks(api, **kwargs):
@@ -197,34 +790,73 @@ def query_tasks(api, **kwargs):
     Query tasks available to user with kwargs as query parameters
     for example: project, status, created_from, etc.
     """
-    tasks = []
-    received = LIMIT
-    project_tasks = api.tasks.query(limit=LIMIT, **kwargs)
-    tasks.extend(project_tasks)
-    while received < project_tasks.total:
-        project_tasks = api.tasks.query(limit=LIMIT, offset=received, **kwargs)
-        tasks.extend(project_tasks)
-        received += LIMIT
-
-    return tasks
+    return list(iter_tasks(api, prefetch=MAX_WORKERS, **kwargs))
 
 
 def get_all_projects(api):
     """
     Get all projects the user has access to.
     """
-    # print("Finding projects")
-    projects = []
-    received = LIMIT
-    project_page = api.projects.query(limit=LIMIT)
-    projects.extend(project_page)
-    while received < project_page.total:
-        # print(f"Looking for more projects, found {received}")
-        project_page = api.projects.query(limit=LIMIT, offset=received)
-        projects.extend(project_page)
-        received += LIMIT
+    return list(iter_projects(api, prefetch=MAX_WORKERS))
 
-    return projects
+
+def sync_task_warehouse(api, projects=None, warehouse_path=None, max_workers=None):
+    """
+    Save the tasks of projects to the local task warehouse.
+    Only tasks created since a project's last sync, and saved tasks that
+    hadn't finished, are fetched. Projects are synced in parallel.
+    Inputs:
+    - api: api obejct
+    - projects: list of project names, defaults to every project the user has access to
+    - warehouse_path: sqlite file to use, defaults to task_warehouse.WAREHOUSE_PATH
+    - max_workers: maximum number of projects to sync at once, defaults to MAX_WORKERS
+    Returns:
+    - dict of project name to the number of tasks added or updated
+    """
+    if projects is None:
+        projects = [project.id for project in get_all_projects(api)]
+    conn = task_warehouse.connect(warehouse_path)
+    starts = {
+        project: (
+            task_warehouse.get_watermark(conn, project),
+            task_warehouse.unfinished_task_ids(conn, project, TASK_DONE),
+        )
+        for project in projects
+    }
+
+    def fetch(project):
+        watermark, unfinished = starts[project]
+        created = {"created_from": watermark} if watermark else {}
+        rows = [
+            task_warehouse.task_row(task)
+            for task in iter_tasks(api, project=project, **created)
+        ]
+        # tasks that were running last time may have finished or been deleted
+        fetched = {row["id"] for row in rows}
+        unfinished = [task_id for task_id in unfinished if task_id not in fetched]
+        deleted = []
+        for task_id, task in fetch_in_bulk(api.tasks.bulk_get, unfinished):
+            if task is None:
+                deleted.append(task_id)
+            else:
+                rows.append(task_warehouse.task_row(task))
+        return project, rows, deleted
+
+    synced_on = datetime.now().isoformat(timespec="seconds")
+    counts = {}
+    with ThreadPoolExecutor(max_workers=max_workers or MAX_WORKERS) as executor:
+        # results are saved from this thread since sqlite connections can't be shared
+        for project, rows, deleted in executor.map(fetch, projects):
+            created_times = [row["created_time"] for row in rows if row["created_time"]]
+            watermark = max([starts[project][0] or ""] + created_times) or None
+            with conn:
+                task_warehouse.save_tasks(conn, rows)
+                task_warehouse.delete_tasks(conn, deleted)
+                task_warehouse.mark_synced(conn, project, watermark, synced_on)
+            counts[project] = len(rows)
+    conn.close()
+
+    return counts
 
 
 def get_all_billing(api):
@@ -232,109 +864,366 @@ def get_all_billing(api):
     Get all billing groups the user has access to.
     """
     print("Finding billing groups")
-    billings = []
-    received = LIMIT
-    billing_page = api.billing_groups.query(limit=LIMIT)
-    billings.extend(billing_page)
-    while received < billing_page.total:
-        print(f"Looking for more projects, found {received}")
-        billing_page = api.billing_groups.query(limit=LIMIT, offset=received)
-        billings.extend(billing_page)
-        received += LIMIT
+    return list(iter_billing_groups(api, prefetch=MAX_WORKERS))
 
-    return billings
 
-
-def parse_config(profile):
+def read_credentials(profile):
     """
-    Parse the config file and return the api object.
+    Read the api endpoint and token of a profile from the credentials file.
+    Returns:
+    - (url, token) tuple
     """
     home = Path.home()
     config = configparser.ConfigParser()
     config.read(home / ".sevenbridges/credentials")
+    return config[profile]["api_endpoint"], config[profile]["auth_token"]
+
+
+def parse_config(
+    profile,
+    pool_size=None,
+    retries=RETRIES,
+    backoff=BACKOFF,
+    timeout=TIMEOUT,
+    cache=False,
+    disk_cache=False,
+):
+    """
+    Parse the config file and return the api object.
+    Requests are paced by rate_limiter so the rate limit isn't reached,
+    rate_limit_sleeper still waits out a 429 if it is.
+    Inputs:
+    - profile: profile to use from credentials file
+    - pool_size: number of connections to keep open and maximum number of requests
+      in flight at once, defaults to MAX_WORKERS
+    - retries: number of times to retry requests that fail to connect
+    - backoff: backoff factor in seconds between retries
+    - timeout: seconds to wait for a response
+    - cache: answer repeated GET requests from a cache, see install_cache,
+      off by default since other clients' changes aren't seen until a response expires
+    - disk_cache: also keep cached responses on disk between runs
+    """
+    url, token = read_credentials(profile)
+    pool_size = pool_size or MAX_WORKERS
     api = Api(
-        url=config[profile]["api_endpoint"],
-        token=config[profile]["auth_token"],
+        url=url,
+        token=token,
         error_handlers=[rate_limit_sleeper, maintenance_sleeper],
+        timeout=timeout,
+        pool_connections=1,
+        pool_maxsize=pool_size,
+        max_parallel_requests=pool_size,
+        retry_count=retries,
+        backoff_factor=backoff,
     )
+    # the cache goes above the rate limiter, so cache hits aren't paced
+    rate_limiter.install(api.session)
+    if cache:
+        install_cache(api, disk_cache)
 
     return api
 
 
-def bulk_export_files(api, files, volume, location, overwrite=True, copy_only=False):
+def install_cache(api, disk_cache=False):
     """
-    Exports list of files to volume in bulk
+    Answer repeated GET requests for projects, apps, billing groups, users,
+    and files from a cache, writes to a resource type clear its cached responses.
+    Inputs:
+    - api: api obejct
+    - disk_cache: also keep cached responses in response_cache.CACHE_PATH between runs
+    Returns:
+    - the ResponseCache
     """
+    disk_path = response_cache.CACHE_PATH if disk_cache else None
+    return response_cache.install(
+        api.session, response_cache.ResponseCache(disk_path=disk_path)
+    )
 
-    chunk_size = 100  # Max legal bulk size for export is 100 items.
-    final_responses = []
 
-    def is_finished(response):
-        return response in ["COMPLETED", "FAILED", "ABORTED"]
+class TimeoutSession(requests.Session):
+    """
+    requests session with a default timeout for every request.
+    """
 
-    def error_handling_after_completion(responses):
-        errors = [
-            s.resource.error.message for s in responses if s.resource.state == "FAILED"
-        ]
-        if errors:
-            data = [
-                s.resource.error if s.resource.state == "FAILED" else s.resource.result
-                for s in responses
-            ]
-            raise Exception(
-                "There were errors with bulk exporting.\n"
-                + "\n".join([str(d) for d in data])
-            )
+    def __init__(self, timeout):
+        super().__init__()
+        self.timeout = timeout
 
-    def error_handling_after_submission(responses):
-        errors = [s.error.message for s in responses if not s.valid]
-        if errors:
-            data = [s for s in responses if not s.valid]
-
-            raise Exception(
-                "There were errors with bulk submission.\n"
-                + "\n".join(
-                    [
-                        f"<Error: status={s.error.status}, code={s.error.code}>; "
-                        f"{s.error.message}"
-                        for s in data
-                    ]
-                )
+    def request(self, method, url, **kwargs):
+        kwargs.setdefault("timeout", self.timeout)
+        return super().request(method, url, **kwargs)
+
+
+def rest_session(
+    profile, pool_size=None, retries=RETRIES, backoff=BACKOFF, timeout=TIMEOUT
+):
+    """
+    Make a requests session for calling the REST api by hand.
+    Connections are kept alive and reused between calls, requests that fail
+    to connect or get a 502, 503, or 504 are retried, including POSTs since
+    the bulk get endpoints are POSTs, and every response goes through the
+    shared rate limiter.
+    Inputs:
+    - profile: profile to use from credentials file
+    - pool_size: number of connections to keep open, defaults to MAX_WORKERS
+    - retries: number of times to retry failed requests
+    - backoff: backoff factor in seconds between retries
+    - timeout: seconds to wait for a response
+    Returns:
+    - (url, session) tuple, url is the api endpoint
+    """
+    url, token = read_credentials(profile)
+    pool_size = pool_size or MAX_WORKERS
+    session = TimeoutSession(timeout)
+    session.headers.update(
+        {
+            "X-SBG-Auth-Token": token,
+            "accept": "application/json",
+            "Content-Type": "application/json",
+        }
+    )
+    adapter = HTTPAdapter(
+        pool_connections=1,
+        pool_maxsize=pool_size,
+        pool_block=True,
+        max_retries=Retry(
+            total=retries,
+            backoff_factor=backoff,
+            status_forcelist=[502, 503, 504],
+            allowed_methods=None,
+        ),
+    )
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    rate_limiter.install(session)
+    return url.rstrip("/"), session
+
+
+def export_files(
+    api,
+    exports,
+    volume,
+    overwrite=True,
+    copy_only=False,
+    max_batches=4,
+    min_wait=5,
+    max_wait=120,
+    running=None,
+    journal=None,
+):
+    """
+    Export files to a volume keeping several bulk export batches in flight.
+    A new batch of LIMIT files is submitted as soon as there is room for it,
+    and every running export job is checked together with bulk_get, waiting
+    longer between checks while nothing finishes.
+    Inputs:
+    - api: api obejct
+    - exports: list of (file, location) tuples, each file is exported to location/file.name
+    - volume: volume to export to
+    - overwrite: overwrite files that already exist in the volume
+    - copy_only: keep a copy of the files on the platform
+    - max_batches: maximum number of batches to have running at once
+    - min_wait, max_wait: shortest and longest time in seconds between status checks
+    - running: dict of export id to (file, location) for jobs that were already
+      submitted, for example by an interrupted run, these are checked but not resubmitted
+    - journal: export journal opened for appending, every submission and
+      finished export is recorded in it
+    Yields:
+    - (file, state, result) tuples as each file finishes, state is COMPLETED,
+      FAILED, ABORTED, NOT_SUBMITTED, or NOT_FOUND if the export job doesn't
+      exist, and result is the export job or the error
+    """
+    batches = [exports[i : i + LIMIT] for i in range(0, len(exports), LIMIT)]
+    running = dict(running or {})
+    wait_time = min_wait
+
+    while batches or running:
+        # submit batches while there's room for them
+        while batches and len(running) <= (max_batches - 1) * LIMIT:
+            batch = batches.pop(0)
+            responses = api.exports.bulk_submit(
+                [
+                    {
+                        "file": f,
+                        "volume": volume,
+                        "location": f"{loc}/{f.name}",
+                        "overwrite": overwrite,
+                    }
+                    for f, loc in batch
+                ],
+                copy_only=copy_only,
             )
+            for (f, loc), response in zip(batch, responses):
+                if response.valid:
+                    running[response.resource.id] = (f, loc)
+                    if journal is not None:
+                        export_journal.write(
+                            journal, f, loc, "SUBMITTED", response.resource.id
+                        )
+                else:
+                    if journal is not None:
+                        export_journal.write(
+                            journal, f, loc, "NOT_SUBMITTED", error=response.error
+                        )
+                    yield f, "NOT_SUBMITTED", response.error
 
-    # export files in batches of chunck_size files each
-    for i in range(0, len(files), chunk_size):
-
-        # setup list of dictionary with export requests
-        exports = [
-            {
-                "file": f,
-                "volume": volume,
-                "location": location + "/" + f.name,
-                "overwrite": overwrite,
-            }
-            for f in files[i : i + chunk_size]
-        ]
+        if not running:
+            continue
+
+        time.sleep(wait_time)
+
+        # check every running export job at once
+        finished = 0
+        for export_id, export in fetch_in_bulk(api.exports.bulk_get, list(running)):
+            if export is None:
+                # the export job doesn't exist, for example a stale id from a journal,
+                # so it will never finish
+                finished += 1
+                f, loc = running.pop(export_id)
+                error = f"Export job {export_id} not found"
+                if journal is not None:
+                    export_journal.write(
+                        journal, f, loc, "NOT_FOUND", export_id, error
+                    )
+                yield f, "NOT_FOUND", error
+            elif export.state in EXPORT_DONE:
+                finished += 1
+                f, loc = running.pop(export_id)
+                error = export.error if export.state == "FAILED" else None
+                if journal is not None:
+                    export_journal.write(
+                        journal, f, loc, export.state, export_id, error
+                    )
+                yield f, export.state, error or export
+
+        # check again soon if jobs are finishing, otherwise back off
+        wait_time = min_wait if finished else min(wait_time * 2, max_wait)
+
+
+def launch_draft(task):
+    """
+    Run a draft task.
+    Returns:
+    - (task, error) tuple, error is None if the task was launched
+    """
+    try:
+        task.run()
+    except Exception as e:
+        return task, e
+    return task, None
+
+
+def schedule_tasks(
+    api,
+    task_ids,
+    limit,
+    min_wait=60,
+    max_wait=3600,
+    max_checks=None,
+    running=None,
+    journal=None,
+    max_workers=None,
+):
+    """
+    Run draft tasks keeping up to limit tasks running at once.
+    A new draft is launched as soon as a running task finishes, and every
+    running task is checked together with bulk_get, waiting longer between
+    checks while nothing finishes.
+    Inputs:
+    - api: api obejct
+    - task_ids: list of draft task ids to run in order
+    - limit: maximum number of tasks to have running at once, -1 for no limit
+    - min_wait, max_wait: shortest and longest time in seconds between status checks
+    - max_checks: stop once this many status checks in a row find no finished tasks,
+      the tasks that are still running are left running and drafts aren't launched
+    - running: ids of tasks that may already have been launched, for example by an
+      interrupted run, these are checked first and only launched if they're still drafts
+    - journal: task journal opened for appending, every state change is recorded
+      in it and a task is recorded as LAUNCHING before it is run
+    - max_workers: maximum number of tasks to launch at once, defaults to MAX_WORKERS
+    Yields:
+    - (task_id, status, info) tuples as each task changes state. status is
+      RUNNING or QUEUED when the task was launched or found running, COMPLETED,
+      FAILED, or ABORTED when it finished, NOT_FOUND, or NOT_LAUNCHED with
+      the launch error or the status of a task that isn't a draft as info.
+      info is the task object otherwise
+    """
+    queue = list(task_ids)
+    running = list(running or [])
+    wait_time = min_wait
+    idle_checks = 0
+
+    def record(task_id, status, info):
+        # the journal is written after the caller has handled the event, so
+        # a crash in between reports the event again instead of losing it
+        yield task_id, status, info
+        if journal is not None:
+            task_journal.write(
+                journal, task_id, status, info if status == "NOT_LAUNCHED" else None
+            )
 
-        # initiate bulk export of batch and wait until finished
-        responses = api.exports.bulk_submit(exports, copy_only=copy_only)
+    def check_running():
+        # check all running tasks at once
+        finished = 0
+        for task_id, task in bulk_get_tasks(api, running[:], refresh=True):
+            if task is None:
+                running.remove(task_id)
+                yield from record(task_id, "NOT_FOUND", None)
+            elif task.status in TASK_DONE:
+                finished += 1
+                running.remove(task_id)
+                yield from record(task_id, task.status, task)
+            elif task.status == "DRAFT":
+                # never launched, put it back at the front of the queue
+                running.remove(task_id)
+                queue.insert(0, task_id)
+        return finished
 
-        # check for errors in bulk submission
-        error_handling_after_submission(responses)
+    if running:
+        yield from check_running()
 
-        # wait for bulk job to finish
-        while not all(is_finished(s.resource.state) for s in responses):
-            responses = api.exports.bulk_get([s.resource for s in responses])
+    with ThreadPoolExecutor(max_workers=max_workers or MAX_WORKERS) as executor:
+        while queue or running:
+            # launch drafts while there's room for them
+            while queue and (limit == -1 or len(running) < limit):
+                room = len(queue) if limit == -1 else limit - len(running)
+                batch, queue[:] = queue[:room], queue[room:]
+                drafts = []
+                for task_id, task in bulk_get_tasks(api, batch, refresh=True):
+                    if task is None:
+                        yield from record(task_id, "NOT_FOUND", None)
+                    elif task.status == "DRAFT":
+                        drafts.append(task)
+                        if journal is not None:
+                            task_journal.write(journal, task_id, "LAUNCHING")
+                    elif task.status in ["RUNNING", "QUEUED"]:
+                        # already launched, keep track of it
+                        running.append(task_id)
+                        yield from record(task_id, task.status, task)
+                    else:
+                        yield from record(task_id, "NOT_LAUNCHED", task.status)
+                for task, error in executor.map(launch_draft, drafts):
+                    if error is not None:
+                        yield from record(task.id, "NOT_LAUNCHED", error)
+                    elif task.status in TASK_DONE:
+                        yield from record(task.id, task.status, task)
+                    else:
+                        running.append(task.id)
+                        yield from record(task.id, task.status, task)
 
-        # check if each job finished successfully
-        error_handling_after_completion(responses)
+            if not running:
+                continue
 
-        final_responses.extend(responses)
+            time.sleep(wait_time)
+            finished = yield from check_running()
 
-        if len(final_responses) % 1000 == 0:
-            print(f"Exported: {len(final_responses)} files")
+            # tasks may be stalled if nothing finishes for max_checks checks
+            idle_checks = 0 if finished else idle_checks + 1
+            if max_checks is not None and idle_checks >= max_checks:
+                return
 
-    return final_responses
+            # check again soon if tasks are finishing, otherwise back off
+            wait_time = min_wait if finished else min(wait_time * 2, max_wait)
 
 
 def parse_project(project):
@@ -0,0 +1,146 @@
+"""Search the contents of task log files without downloading them to disk
+
+Logs are read from their download urls with http range requests, a range at a
+time, and split into lines as the bytes arrive. Logs don't change once a task
+finishes, so they can be cached by file id.
+"""
+
+import gzip
+import os
+import re
+from pathlib import Path
+
+# bytes requested per range request
+RANGE_SIZE = 8 * 1024 * 1024
+
+# bytes read from the response stream at a time
+CHUNK_SIZE = 64 * 1024
+
+# seconds to wait for the storage server to respond
+TIMEOUT = 120
+
+
+def parse_content_range(header):
+    """
+    Parse a Content-Range header, for example: bytes 0-99/1234
+    Returns:
+    - first byte, last byte, and total size, total is None if unknown
+    """
+    match = re.match(r"bytes (\d+)-(\d+)/(\d+|\*)", header or "")
+    if match is None:
+        raise ValueError(f"Can't parse Content-Range: {header}")
+    first, last, total = match.groups()
+    return int(first), int(last), None if total == "*" else int(total)
+
+
+def iter_lines(session, url, range_size=RANGE_SIZE, tail=None):
+    """
+    Stream the lines of a file with range requests.
+    Inputs:
+    - session: requests session, without api auth headers since download
+      urls are signed
+    - url: download url
+    - range_size: bytes per range request
+    - tail: only read about the last tail bytes, starting at the first full line
+    Yields:
+    - lines without the line ending
+    """
+    buffer = b""
+    # the first line of a tail is usually cut off
+    skip_first = False
+    start = None if tail else 0
+    total = None
+    while total is None or start < total:
+        if start is None:
+            byte_range = f"bytes=-{tail}"
+        else:
+            byte_range = f"bytes={start}-{start + range_size - 1}"
+        response = session.get(
+            url, headers={"Range": byte_range}, stream=True, timeout=TIMEOUT
+        )
+        if response.status_code == 416:
+            # empty file
+            break
+        response.raise_for_status()
+
+        if response.status_code == 206:
+            first, last, total = parse_content_range(
+                response.headers.get("Content-Range")
+            )
+            if start is None:
+                skip_first = first > 0
+            start = last + 1
+        else:
+            # the server ignored the range and is sending the whole file
+            total = start = 0
+
+        for chunk in response.iter_content(CHUNK_SIZE):
+            *lines, buffer = (buffer + chunk).split(b"\n")
+            for line in lines:
+                if skip_first:
+                    skip_first = False
+                    continue
+                yield line.rstrip(b"\r").decode("utf-8", errors="replace")
+        response.close()
+        if total is None:
+            # size unknown, stop once a range comes back short
+            if last - first + 1 < range_size:
+                break
+            total = start + 1
+    if buffer and not skip_first:
+        yield buffer.rstrip(b"\r").decode("utf-8", errors="replace")
+
+
+def read_log(session, log_file, cache_dir=None, range_size=RANGE_SIZE, tail=None):
+    """
+    Stream the lines of a log file, from the cache if it was read before.
+    Inputs:
+    - session: requests session for the download url
+    - log_file: api file object of the log
+    - cache_dir: directory to cache logs in by file id, no cache if None
+    - range_size: bytes per range request
+    - tail: only read about the last tail bytes
+    Yields:
+    - lines of the log
+    """
+    if cache_dir is None:
+        url = log_file.download_info().url
+        yield from iter_lines(session, url, range_size, tail)
+        return
+
+    name = log_file.id if tail is None else f"{log_file.id}.tail{tail}"
+    cache_path = Path(cache_dir) / f"{name}.gz"
+    if cache_path.exists():
+        with gzip.open(cache_path, "rt", encoding="utf-8") as f:
+            for line in f:
+                yield line.rstrip("\n")
+        return
+
+    # only a log read to the end is added to the cache
+    cache_path.parent.mkdir(parents=True, exist_ok=True)
+    partial = cache_path.with_name(f"{name}.{os.getpid()}.part")
+    url = log_file.download_info().url
+    try:
+        with gzip.open(partial, "wt", encoding="utf-8") as f:
+            for line in iter_lines(session, url, range_size, tail):
+                f.write(f"{line}\n")
+                yield line
+        os.replace(partial, cache_path)
+    finally:
+        if partial.exists():
+            partial.unlink()
+
+
+def search_lines(lines, patterns):
+    """
+    Find the lines matching any of a list of regex patterns.
+    Inputs:
+    - lines: iterable of lines
+    - patterns: list of regex patterns, as strings or compiled
+    Yields:
+    - (line number, line) for each matching line, line numbers start at 1
+    """
+    regexes = [re.compile(pattern) for pattern in patterns]
+    for line_no, line in enumerate(lines, 1):
+        if any(regex.search(line) for regex in regexes):
+            yield line_no, line
@@ -0,0 +1,220 @@
+"""Client side rate limiter driven by the X-RateLimit-* response headers
+
+The platform rate limit is counted per user, so the limiter keeps a separate
+state for every auth token. Far from the limit, requests are counted in memory
+only. Once a token's remaining request count is low, its state is shared through
+a small json file next to the sbg credentials, so every thread and every script
+running at the same time with that token paces itself against the same count.
+"""
+
+import hashlib
+import json
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+try:
+    import fcntl
+except ImportError:
+    # no file locks on windows, the limiter is only shared within a process
+    fcntl = None
+
+# default location of the shared limiter state
+STATE_PATH = Path.home() / ".sevenbridges/cache/rate_limit.json"
+
+# requests are sent without waiting while more than this many are remaining
+PACE_BELOW = 200
+
+# requests left for anything else using the same token, like the web ui
+RESERVE = 10
+
+
+def token_key(token) -> str:
+    """
+    Key of a token's limiter state, the token itself is never saved.
+    """
+    return hashlib.sha256((token or "").encode()).hexdigest()[:16]
+
+
+def merge(state, remaining, reset):
+    # responses can arrive out of order, keep the newest window
+    # and the lowest remaining count within it
+    if reset > state.get("reset", 0):
+        state.update(remaining=remaining, reset=reset, next=0)
+    elif reset == state["reset"]:
+        state["remaining"] = min(state["remaining"], remaining)
+
+
+class RateLimiter:
+    """
+    Pace requests so the platform rate limit is never reached.
+    Once fewer than pace_below requests remain, requests are spread evenly
+    over the time left until the limit resets.
+    """
+
+    def __init__(self, path=STATE_PATH, pace_below=PACE_BELOW, reserve=RESERVE):
+        """
+        Inputs:
+        - path: json file with the limiter state shared between processes
+        - pace_below: start pacing requests when fewer than this many remain
+        - reserve: number of requests to never use
+        """
+        self.path = Path(path)
+        self.pace_below = pace_below
+        self.reserve = reserve
+        self.lock = threading.Lock()
+        # this process's view of each token's state
+        self.local = {}
+
+    @contextmanager
+    def state(self, key):
+        """
+        Read and write a token's shared state while holding the thread and file locks.
+        Inputs:
+        - key: token key made by token_key
+        Yields:
+        - state dict, changes to it are saved
+        """
+        with self.lock:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.path, "a+") as f:
+                if fcntl is not None:
+                    fcntl.flock(f, fcntl.LOCK_EX)
+                f.seek(0)
+                try:
+                    states = json.loads(f.read() or "{}")
+                except json.JSONDecodeError:
+                    states = {}
+                # drop the states of tokens whose limit has reset
+                now = time.time()
+                states = {
+                    k: s
+                    for k, s in states.items()
+                    if isinstance(s, dict) and s.get("reset", 0) > now
+                }
+                state = states.setdefault(key, {})
+                yield state
+                if not state:
+                    del states[key]
+                f.seek(0)
+                f.truncate()
+                f.write(json.dumps(states))
+                f.flush()
+
+    def is_low(self, state) -> bool:
+        # True if the limit hasn't reset and pacing has started
+        return (
+            state.get("reset", 0) > time.time()
+            and state["remaining"] - self.reserve <= self.pace_below
+        )
+
+    def update(self, headers, token=None):
+        """
+        Save the rate limit headers of a response.
+        Inputs:
+        - headers: response headers
+        - token: auth token the request was sent with
+        """
+        remaining = headers.get("X-RateLimit-Remaining")
+        reset = headers.get("X-RateLimit-Reset")
+        if remaining is None or reset is None:
+            return
+        remaining = int(remaining)
+        reset = int(reset)
+        key = token_key(token)
+        with self.lock:
+            local = self.local.setdefault(key, {})
+            merge(local, remaining, reset)
+            low = self.is_low(local)
+        if low:
+            with self.state(key) as state:
+                merge(state, remaining, reset)
+
+    def delay(self, token=None) -> float:
+        """
+        Reserve the next request slot.
+        Inputs:
+        - token: auth token the request will be sent with
+        Returns:
+        - seconds to wait before sending the request
+        """
+        key = token_key(token)
+        with self.lock:
+            local = self.local.get(key)
+            if local is not None and not self.is_low(local):
+                if local.get("reset", 0) > time.time():
+                    local["remaining"] -= 1
+                return 0
+
+        # near the limit, or nothing is known yet, so share with other processes
+        with self.state(key) as state:
+            local = self.local.setdefault(key, {})
+            if local:
+                merge(state, local["remaining"], local["reset"])
+            now = time.time()
+            if state.get("reset", 0) <= now:
+                # no headers seen yet or the limit has reset since
+                return 0
+            local.update(remaining=state["remaining"], reset=state["reset"])
+            remaining = state["remaining"] - self.reserve
+            if remaining <= 0:
+                return state["reset"] - now
+            # count this request before its response arrives so other
+            # threads and processes see it
+            state["remaining"] -= 1
+            local["remaining"] -= 1
+            if remaining > self.pace_below:
+                return 0
+            slot = max(now, state.get("next", 0))
+            state["next"] = slot + (state["reset"] - now) / remaining
+            return slot - now
+
+    def wait(self, token=None):
+        """
+        Sleep until the next request can be sent.
+        Inputs:
+        - token: auth token the request will be sent with
+        """
+        delay = self.delay(token)
+        if delay > 0:
+            time.sleep(delay)
+
+
+# limiter shared by every api object in this process
+LIMITER = RateLimiter()
+
+
+def pace(send, limiter):
+    # wrap an adapter's send to wait for a slot and save the response headers
+    def paced_send(request, **kwargs):
+        token = request.headers.get("X-SBG-Auth-Token")
+        limiter.wait(token)
+        response = send(request, **kwargs)
+        limiter.update(response.headers, token)
+        return response
+
+    return paced_send
+
+
+def install(session, limiter=None):
+    """
+    Pace the requests of a requests session before they're sent,
+    and save the rate limit headers of every response.
+    The session's transport adapters are paced, so install this before a
+    response cache and requests answered from the cache aren't counted.
+    Inputs:
+    - session: requests session, for example api.session of a sevenbridges Api
+    - limiter: RateLimiter to use, defaults to LIMITER
+    Returns:
+    - the RateLimiter
+    """
+    limiter = limiter or LIMITER
+    adapters = []
+    for adapter in session.adapters.values():
+        # the same adapter can be mounted for more than one prefix
+        if adapter not in adapters:
+            adapters.append(adapter)
+    for adapter in adapters:
+        adapter.send = pace(adapter.send, limiter)
+    return limiter
@@ -0,0 +1,236 @@
+"""Read-through cache for GET requests to the sbg api
+
+Responses are cached per resource type, for example projects or billing groups,
+for the number of seconds in CACHE_TTLS. Resources that change while scripts are
+watching them, like tasks and exports, aren't cached. Any write to a resource
+type clears the cached responses of that type.
+"""
+
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from urllib.parse import urlsplit
+from requests import Response
+from requests.adapters import BaseAdapter
+from requests.structures import CaseInsensitiveDict
+
+# seconds to keep responses for, by resource type
+CACHE_TTLS = {
+    "apps": 3600,
+    "billing": 3600,
+    "files": 300,
+    "projects": 600,
+    "user": 3600,
+    "users": 3600,
+}
+
+# bytes of response content kept in memory, so long listings can't grow it without end
+MAX_BYTES = 32 * 1024 * 1024
+
+# default location of the on disk tier, next to the sbg credentials file
+CACHE_PATH = Path.home() / ".sevenbridges/cache/responses.sqlite"
+
+# rate limit headers of a cached response are out of date
+SKIP_HEADERS = ["X-RateLimit-Limit", "X-RateLimit-Remaining", "X-RateLimit-Reset"]
+
+
+def resource_type(url) -> str:
+    """
+    Get the resource type of an api url,
+    for example: https://cavatica-api.sbgenomics.com/v2/files/{id} is files
+    and .../v2/bulk/files/edit is also files.
+    """
+    parts = [part for part in urlsplit(url).path.split("/") if part]
+    if parts and parts[0][:1] == "v" and parts[0][1:].isdigit():
+        parts = parts[1:]
+    if parts and parts[0] in ["bulk", "action"]:
+        parts = parts[1:]
+    return parts[0] if parts else ""
+
+
+class ResponseCache:
+    """
+    LRU memory cache of GET responses with an optional sqlite tier on disk.
+    """
+
+    def __init__(self, ttls=None, max_bytes=MAX_BYTES, disk_path=None):
+        """
+        Inputs:
+        - ttls: dict of resource type to seconds, defaults to CACHE_TTLS
+        - max_bytes: bytes of response content kept in memory
+        - disk_path: sqlite file for the disk tier, no disk tier if None
+        """
+        self.ttls = CACHE_TTLS if ttls is None else ttls
+        self.max_bytes = max_bytes
+        self.memory = OrderedDict()
+        self.memory_bytes = 0
+        self.lock = threading.Lock()
+        self.disk_path = disk_path
+        if disk_path is not None:
+            Path(disk_path).parent.mkdir(parents=True, exist_ok=True)
+            with self.connect() as conn:
+                conn.execute(
+                    "CREATE TABLE IF NOT EXISTS responses ("
+                    "key TEXT PRIMARY KEY, type TEXT NOT NULL, "
+                    "expires REAL NOT NULL, entry TEXT NOT NULL)"
+                )
+
+    def connect(self):
+        # a connection per call so threads don't share one
+        return sqlite3.connect(self.disk_path, timeout=30)
+
+    @staticmethod
+    def key(request) -> str:
+        # the token is part of the key so users never see each other's responses
+        token = request.headers.get("X-SBG-Auth-Token", "")
+        return hashlib.sha256(f"{token} {request.url}".encode()).hexdigest()
+
+    def get(self, request):
+        """
+        Get the cached response of a GET request.
+        Returns:
+        - requests Response, or None if it isn't cached or has expired
+        """
+        key = self.key(request)
+        now = time.time()
+        with self.lock:
+            entry = self.memory.get(key)
+            if entry is not None:
+                if entry["expires"] > now:
+                    self.memory.move_to_end(key)
+                    return self.response(entry, request)
+                self.forget(key)
+
+        if self.disk_path is not None:
+            with self.connect() as conn:
+                row = conn.execute(
+                    "SELECT entry FROM responses WHERE key = ? AND expires > ?",
+                    (key, now),
+                ).fetchone()
+            if row is not None:
+                entry = json.loads(row[0])
+                self.remember(key, entry)
+                return self.response(entry, request)
+        return None
+
+    def set(self, request, response):
+        """
+        Cache the response of a GET request if its resource type has a ttl.
+        """
+        ttl = self.ttls.get(resource_type(request.url), 0)
+        if ttl <= 0 or response.status_code != 200:
+            return
+        if "json" not in response.headers.get("Content-Type", ""):
+            return
+        entry = {
+            "type": resource_type(request.url),
+            "expires": time.time() + ttl,
+            "status": response.status_code,
+            "headers": {
+                k: v for k, v in response.headers.items() if k not in SKIP_HEADERS
+            },
+            "content": response.content.decode("utf-8"),
+        }
+        key = self.key(request)
+        self.remember(key, entry)
+        if self.disk_path is not None:
+            with self.connect() as conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO responses (key, type, expires, entry) "
+                    "VALUES (?, ?, ?, ?)",
+                    (key, entry["type"], entry["expires"], json.dumps(entry)),
+                )
+
+    def remember(self, key, entry):
+        # add to the memory tier, dropping the least recently used entries if full
+        size = len(entry["content"])
+        if size > self.max_bytes:
+            return
+        with self.lock:
+            self.forget(key)
+            self.memory[key] = entry
+            self.memory_bytes += size
+            while self.memory_bytes > self.max_bytes:
+                self.forget(next(iter(self.memory)))
+
+    def forget(self, key):
+        # remove an entry from the memory tier, the lock must be held
+        entry = self.memory.pop(key, None)
+        if entry is not None:
+            self.memory_bytes -= len(entry["content"])
+
+    def invalidate(self, url):
+        """
+        Remove every cached response with the same resource type as url.
+        """
+        rtype = resource_type(url)
+        with self.lock:
+            for key in [k for k, e in self.memory.items() if e["type"] == rtype]:
+                self.forget(key)
+        if self.disk_path is not None:
+            with self.connect() as conn:
+                conn.execute("DELETE FROM responses WHERE type = ?", (rtype,))
+
+    @staticmethod
+    def response(entry, request) -> Response:
+        # rebuild a requests Response from a cache entry
+        response = Response()
+        response.status_code = entry["status"]
+        response.headers = CaseInsensitiveDict(entry["headers"])
+        response._content = entry["content"].encode("utf-8")
+        response.encoding = "utf-8"
+        response.url = request.url
+        response.request = request
+        return response
+
+
+class CachingAdapter(BaseAdapter):
+    """
+    requests adapter that answers GET requests from a ResponseCache,
+    and sends everything else through the adapter below it.
+    """
+
+    def __init__(self, cache, adapter):
+        super().__init__()
+        self.cache = cache
+        self.adapter = adapter
+
+    def send(self, request, stream=False, **kwargs):
+        # streamed responses, like downloads, are never cached
+        cacheable = request.method == "GET" and not stream
+        if cacheable:
+            cached = self.cache.get(request)
+            if cached is not None:
+                return cached
+        response = self.adapter.send(request, stream=stream, **kwargs)
+        if cacheable:
+            self.cache.set(request, response)
+        elif request.method != "GET" and response.ok:
+            # bulk gets are POSTs but don't change anything
+            if not urlsplit(request.url).path.endswith("/get"):
+                self.cache.invalidate(request.url)
+        return response
+
+    def close(self):
+        self.adapter.close()
+
+
+def install(session, cache=None):
+    """
+    Answer GET requests of a requests session from a cache.
+    The session's current adapters, with their pool size, retries, and rate
+    limiting, send the requests the cache can't answer.
+    Inputs:
+    - session: requests session, for example api.session of a sevenbridges Api
+    - cache: ResponseCache to use, defaults to a memory only cache
+    Returns:
+    - the ResponseCache
+    """
+    cache = cache or ResponseCache()
+    for prefix in ["https://", "http://"]:
+        session.mount(prefix, CachingAdapter(cache, session.get_adapter(prefix)))
+    return cache
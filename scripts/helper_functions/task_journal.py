@@ -0,0 +1,77 @@
+"""Append-only journal of task launches, used to restart an interrupted run_tasks"""
+
+import json
+from datetime import datetime
+
+# tasks in these states may be running on the platform, they are checked on restart
+# instead of being launched again
+LAUNCHED = ["LAUNCHING", "QUEUED", "RUNNING"]
+
+
+def load(path) -> dict:
+    """
+    Read a task journal.
+    Later lines replace earlier ones, so each task ends up with its last state.
+    A partly written last line, left by a crash, is ignored.
+    Inputs:
+    - path: journal file, a missing file is an empty journal
+    Returns:
+    - dict of task id to the last record for that task
+    """
+    records = {}
+    try:
+        with open(path, "r") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                records[record["task"]] = record
+    except FileNotFoundError:
+        pass
+    return records
+
+
+def write(journal, task_id, state, info=None):
+    """
+    Append a record to an open journal and flush it to disk.
+    Inputs:
+    - journal: journal file opened for appending
+    - task_id: task id
+    - state: PENDING, LAUNCHING, QUEUED, RUNNING, COMPLETED, FAILED, ABORTED,
+      NOT_FOUND, or NOT_LAUNCHED
+    - info: error message or status of a task that couldn't be launched
+    """
+    record = {
+        "task": task_id,
+        "state": state,
+        "info": None if info is None else str(info),
+        "time": datetime.now().isoformat(),
+    }
+    journal.write(json.dumps(record) + "\n")
+    journal.flush()
+
+
+def split_tasks(records, task_ids):
+    """
+    Split tasks into the ones that are done, launched, and still to launch based on a journal.
+    Inputs:
+    - records: journal records from load
+    - task_ids: list of task ids
+    Returns:
+    - done: list of task ids that finished or can't be launched
+    - running: list of task ids that may be running
+    - pending: list of task ids that haven't been launched
+    """
+    done = []
+    running = []
+    pending = []
+    for task_id in task_ids:
+        record = records.get(task_id)
+        if record is None or record["state"] == "PENDING":
+            pending.append(task_id)
+        elif record["state"] in LAUNCHED:
+            running.append(task_id)
+        else:
+            done.append(task_id)
+    return done, running, pending
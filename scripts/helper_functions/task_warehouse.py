@@ -0,0 +1,198 @@
+"""Local SQLite warehouse of the tasks in many projects
+
+Each sync only asks the platform for tasks created since the project's watermark,
+the creation time of the newest task already saved, plus the saved tasks that
+hadn't finished yet. Reports can then read tasks from the warehouse instead of
+querying every project again.
+"""
+
+import json
+import sqlite3
+from datetime import timezone
+from pathlib import Path
+import pandas as pd
+
+try:
+    from . import cost_stats
+except ImportError:
+    # imported on its own, for example by the unit tests
+    import cost_stats
+
+# default location of the warehouse, next to the sbg credentials file
+WAREHOUSE_PATH = Path.home() / ".sevenbridges/cache/task_warehouse.sqlite"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS tasks (
+    project TEXT NOT NULL,
+    id TEXT PRIMARY KEY,
+    name TEXT,
+    app TEXT,
+    revision TEXT,
+    app_id TEXT,
+    status TEXT,
+    price REAL,
+    duration REAL,
+    instance_type TEXT,
+    created_by TEXT,
+    created_time TEXT,
+    start_time TEXT,
+    end_time TEXT,
+    parent TEXT,
+    inputs TEXT
+);
+CREATE INDEX IF NOT EXISTS tasks_project ON tasks (project, status);
+CREATE INDEX IF NOT EXISTS tasks_app ON tasks (app, status);
+CREATE TABLE IF NOT EXISTS projects (
+    project TEXT PRIMARY KEY,
+    watermark TEXT,
+    synced_on TEXT NOT NULL
+);
+"""
+
+COLUMNS = cost_stats.TASK_COLUMNS + [
+    "name",
+    "created_by",
+    "created_time",
+    "start_time",
+    "end_time",
+    "parent",
+    "inputs",
+]
+
+
+def connect(path=None):
+    """
+    Open the warehouse, creating it if it doesn't exist.
+    Inputs:
+    - path: sqlite file to use, defaults to WAREHOUSE_PATH
+    Returns:
+    - sqlite3 connection
+    """
+    path = path or WAREHOUSE_PATH
+    if str(path) != ":memory:":
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(path)
+    conn.row_factory = sqlite3.Row
+    conn.executescript(SCHEMA)
+    return conn
+
+
+def to_iso(time) -> str:
+    """
+    Format a datetime as a UTC iso string, which sorts the same as the times,
+    for example: 2025-01-31T12:00:00
+    """
+    if time is None:
+        return None
+    if time.tzinfo is not None:
+        time = time.astimezone(timezone.utc).replace(tzinfo=None)
+    return time.isoformat(timespec="seconds")
+
+
+def input_value(value):
+    # files and folders in task inputs are saved as their ids
+    return getattr(value, "id", str(value))
+
+
+def task_row(task) -> dict:
+    """
+    Convert an sbg task object to a warehouse row.
+    Returns:
+    - dict with one value per warehouse column
+    """
+    row = dict(zip(cost_stats.TASK_COLUMNS, cost_stats.task_row(task)))
+    inputs = dict(task.inputs.items()) if task.inputs else {}
+    row.update(
+        name=task.name,
+        created_by=task.created_by,
+        created_time=to_iso(task.created_time),
+        start_time=to_iso(task.start_time),
+        end_time=to_iso(task.end_time),
+        parent=task.parent,
+        inputs=json.dumps(inputs, default=input_value),
+    )
+    return row
+
+
+def save_tasks(conn, rows):
+    """
+    Add or replace tasks in the warehouse.
+    Inputs:
+    - conn: sqlite3 connection
+    - rows: list of dicts made by task_row
+    """
+    conn.executemany(
+        f"INSERT OR REPLACE INTO tasks ({', '.join(COLUMNS)}) "
+        f"VALUES ({', '.join('?' * len(COLUMNS))})",
+        [[row[col] for col in COLUMNS] for row in rows],
+    )
+
+
+def delete_tasks(conn, task_ids):
+    """
+    Remove tasks that no longer exist from the warehouse.
+    """
+    conn.executemany("DELETE FROM tasks WHERE id = ?", [(i,) for i in task_ids])
+
+
+def get_watermark(conn, project) -> str:
+    """
+    Get the creation time of the newest task saved for a project.
+    Returns:
+    - iso time, None if the project hasn't been synced
+    """
+    row = conn.execute(
+        "SELECT watermark FROM projects WHERE project = ?", (project,)
+    ).fetchone()
+    return row["watermark"] if row else None
+
+
+def unfinished_task_ids(conn, project, done_states) -> list:
+    """
+    Get the ids of a project's saved tasks whose status can still change.
+    Inputs:
+    - done_states: task statuses that won't change anymore
+    """
+    rows = conn.execute(
+        f"SELECT id FROM tasks WHERE project = ? "
+        f"AND status NOT IN ({', '.join('?' * len(done_states))})",
+        (project, *done_states),
+    )
+    return [row["id"] for row in rows]
+
+
+def mark_synced(conn, project, watermark, synced_on):
+    """
+    Record the watermark and time of a project's last sync.
+    """
+    conn.execute(
+        "INSERT OR REPLACE INTO projects (project, watermark, synced_on) "
+        "VALUES (?, ?, ?)",
+        (project, watermark, synced_on),
+    )
+
+
+def read_tasks(conn, projects=None, statuses=None) -> pd.DataFrame:
+    """
+    Read tasks from the warehouse into a task table for cost_stats.
+    Inputs:
+    - conn: sqlite3 connection
+    - projects: list of projects to read, all projects if None
+    - statuses: list of task statuses to read, all statuses if None
+    Returns:
+    - DataFrame with the warehouse columns and cost_stats dtypes
+    """
+    query = f"SELECT {', '.join(COLUMNS)} FROM tasks"
+    where = []
+    params = []
+    for column, values in [("project", projects), ("status", statuses)]:
+        if values:
+            where.append(f"{column} IN ({', '.join('?' * len(values))})")
+            params.extend(values)
+    if where:
+        query += " WHERE " + " AND ".join(where)
+    df = pd.read_sql_query(query, conn, params=params)
+    table = cost_stats.make_frame(df[cost_stats.TASK_COLUMNS])
+    for column in COLUMNS[len(cost_stats.TASK_COLUMNS) :]:
+        table[column] = df[column]
+    return table
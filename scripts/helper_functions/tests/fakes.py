@@ -0,0 +1,126 @@
+"""Fake sbg api objects shared by the unit tests"""
+
+from datetime import datetime
+from itertools import count
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+
+try:
+    from .. import task_warehouse
+except ImportError:
+    # the helper tests run with helper_functions as the top level directory
+    import task_warehouse
+
+# ids for test files made without one
+FILE_IDS = count()
+
+
+class MyPage(list):
+    """Test page with a total like an sbg Collection"""
+
+    def __init__(self, items, total):
+        super().__init__(items)
+        self.total = total
+
+
+class MyFile:
+    """Test file object, folders hold a list of files"""
+
+    def __init__(
+        self,
+        name,
+        children=None,
+        id=None,
+        metadata=None,
+        storage="PLATFORM",
+        modified_on=1,
+    ):
+        self.id = f"id{next(FILE_IDS)}" if id is None else id
+        self.name = name
+        self.children = children
+        self.metadata = metadata or {}
+        self.storage = SimpleNamespace(type=storage)
+        self.parent = None
+        self.size = 10
+        self.modified_on = datetime(2025, 1, modified_on)
+        self.listed = 0
+        for child in children or []:
+            child.parent = self.id
+
+    def is_folder(self):
+        return self.children is not None
+
+    def list_files(self, limit, offset):
+        self.listed += 1
+        return MyPage(self.children[offset : offset + limit], len(self.children))
+
+
+def walk(files):
+    """Yield files and everything in their folders"""
+    for file in files:
+        yield file
+        yield from walk(file.children or [])
+
+
+def bulk_records(ids, resources):
+    """Make bulk get records, ids missing from the resources dict aren't valid"""
+    return [
+        SimpleNamespace(valid=i in resources, resource=resources.get(i)) for i in ids
+    ]
+
+
+def make_file_api(root_files):
+    """Make an api whose project root holds root_files, file queries filter
+    on the parent folder, names, and metadata like the platform"""
+
+    def query(
+        limit=50, offset=0, project=None, parent=None, names=None, metadata=None
+    ):
+        if parent is None:
+            in_folder = root_files
+        else:
+            in_folder = next(f for f in walk(root_files) if f.id == parent).children
+        files = [
+            f
+            for f in in_folder
+            if (names is None or f.name in names)
+            and all(
+                f.metadata.get(k) in (v if isinstance(v, list) else [v])
+                for k, v in (metadata or {}).items()
+            )
+        ]
+        return MyPage(files[offset : offset + limit], len(files))
+
+    def bulk_get(file_ids):
+        return bulk_records(file_ids, {f.id: f for f in walk(root_files)})
+
+    api = MagicMock()
+    api.files.query.side_effect = query
+    api.files.bulk_get.side_effect = bulk_get
+    return api
+
+
+def make_task_api(tasks):
+    """Make an api holding a dict of tasks by id, task queries filter
+    on project, status, and created_from like the platform"""
+
+    def query(limit, offset, project=None, status=None, created_from=None):
+        matches = [
+            t
+            for t in tasks.values()
+            if (project is None or t.project == project)
+            and (status is None or t.status == status)
+            and (
+                created_from is None
+                or task_warehouse.to_iso(t.created_time) >= created_from
+            )
+        ]
+        return MyPage(matches[offset : offset + limit], len(matches))
+
+    def bulk_get(task_ids):
+        return bulk_records(task_ids, tasks)
+
+    api = MagicMock()
+    api.tasks.query.side_effect = query
+    api.tasks.bulk_get.side_effect = bulk_get
+    return api
@@ -0,0 +1,111 @@
+import unittest
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+import billing_export
+from helper_functions import LIMIT
+from .fakes import MyPage
+
+
+def paged(items_for_window):
+    """Make a breakdown query that pages the items of each window"""
+
+    def query(date_from, date_to, limit, offset):
+        items = items_for_window(date_from, date_to)
+        return MyPage(items[offset : offset + limit], len(items))
+
+    return MagicMock(side_effect=query)
+
+
+def storage_item(project):
+    cost = SimpleNamespace(amount=1.5, currency="USD")
+    return SimpleNamespace(
+        project_name=project,
+        location="us-east-1",
+        project_locked=False,
+        active=SimpleNamespace(size=10.0, unit="GB", cost=cost),
+        archived=None,
+    )
+
+
+def analysis_item(project, analysis_id):
+    breakdown = SimpleNamespace(computation=2.0, storage=0.5)
+    cost = SimpleNamespace(amount="2.5", currency="USD", breakdown=breakdown)
+    return SimpleNamespace(
+        project_name=project,
+        analysis_cost=cost,
+        analysis_id=analysis_id,
+        analysis_name="run",
+        analysis_app_name="align",
+        analysis_type="TASK",
+        analysis_status="COMPLETED",
+        ran_by="user",
+        time_started=None,
+        time_finished=None,
+        refunded_amount=0.0,
+        project_locked=False,
+    )
+
+
+class TestBillingExport(unittest.TestCase):
+    def test_date_windows(self):
+        """Test that windows cover the range without overlapping"""
+
+        windows = billing_export.date_windows("01-01-2025", "03-05-2025", days=30)
+
+        self.assertEqual(
+            windows,
+            [
+                ("01-01-2025", "01-30-2025"),
+                ("01-31-2025", "03-01-2025"),
+                ("03-02-2025", "03-05-2025"),
+            ],
+        )
+
+    def test_date_windows_backwards(self):
+        """Test that an end date before the start date is an error"""
+
+        with self.assertRaises(ValueError):
+            billing_export.date_windows("02-01-2025", "01-01-2025")
+
+    def test_fetch_breakdowns(self):
+        """Test that every page of every window and breakdown is fetched"""
+
+        billing = MagicMock()
+        billing.storage_breakdown = paged(lambda start, end: [storage_item("u/a")])
+        # more than one page of analyses in each window
+        billing.analysis_breakdown = paged(
+            lambda start, end: [
+                analysis_item("u/b", f"{start}-{i}") for i in range(LIMIT + 5)
+            ]
+        )
+
+        records = list(
+            billing_export.fetch_breakdowns(
+                billing,
+                "01-01-2025",
+                "02-14-2025",
+                window_days=30,
+                breakdowns=["storage", "analysis"],
+            )
+        )
+
+        self.assertEqual(len(records), 2 * (1 + LIMIT + 5))
+        self.assertTrue(
+            all(list(r) == billing_export.RECORD_COLUMNS for r in records)
+        )
+        storage = records[0]
+        self.assertEqual(
+            (storage["breakdown"], storage["category"], storage["cost"]),
+            ("storage", "active", 1.5),
+        )
+        self.assertEqual(storage["date_to"], "01-30-2025")
+        analysis = records[1]
+        self.assertEqual(analysis["cost"], 2.5)
+        self.assertEqual(analysis["computation_cost"], 2.0)
+        self.assertIsNone(analysis["location"])
+        self.assertEqual(records[-1]["date_from"], "01-31-2025")
+        billing.egress_breakdown.assert_not_called()
+
+
+if __name__ == "__main__":
+    unittest.main()
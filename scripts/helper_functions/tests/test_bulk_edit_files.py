@@ -0,0 +1,79 @@
+import unittest
+from unittest.mock import MagicMock, patch
+from sevenbridges.errors import BadRequest, ServiceUnavailable
+import helper_functions
+from helper_functions import bulk_edit_files
+
+
+def make_response(chunk, failed=()):
+    """Make a bulk edit response with an error for each id in failed"""
+
+    response = MagicMock()
+    response.json.return_value = {
+        "items": [
+            {"error": {"status": 404, "message": "File not found"}}
+            if item["id"] in failed
+            else {"resource": {"id": item["id"], "metadata": item["metadata"]}}
+            for item in chunk
+        ]
+    }
+    return response
+
+
+class TestBulkEditFiles(unittest.TestCase):
+    def setUp(self):
+        self.items = [
+            {"id": f"f{i}", "metadata": {"sample_id": f"S{i}"}} for i in range(250)
+        ]
+
+    def test_chunks_and_errors(self):
+        """Test that items are sent in chunks of LIMIT and errors are reported"""
+
+        api = MagicMock()
+        api.post.side_effect = lambda url, data: make_response(data["items"], ["f7"])
+
+        results = list(bulk_edit_files(api, self.items))
+
+        self.assertEqual(api.post.call_count, 3)
+        self.assertEqual(
+            [item["id"] for item, _, _ in results], [f"f{i}" for i in range(250)]
+        )
+        self.assertEqual(results[7][1:], (None, "File not found"))
+        self.assertEqual(results[8][1].id, "f8")
+        self.assertIsNone(results[8][2])
+        # only the changed fields are sent
+        sent = api.post.call_args_list[0].kwargs["data"]["items"]
+        self.assertEqual(sent[0], self.items[0])
+
+    @patch.object(helper_functions.time, "sleep")
+    def test_retry_server_error(self, sleep):
+        """Test that a chunk failing with a server error is sent again"""
+
+        api = MagicMock()
+        api.post.side_effect = [
+            ServiceUnavailable(message="down"),
+            make_response(self.items[:100]),
+        ]
+
+        results = list(bulk_edit_files(api, self.items[:100]))
+
+        self.assertEqual(api.post.call_count, 2)
+        self.assertTrue(all(error is None for _, _, error in results))
+        sleep.assert_called_once_with(helper_functions.BACKOFF)
+
+    @patch.object(helper_functions.time, "sleep")
+    def test_no_retry_client_error(self, sleep):
+        """Test that a chunk failing with a client error isn't sent again"""
+
+        api = MagicMock()
+        api.post.side_effect = BadRequest(message="bad items")
+
+        results = list(bulk_edit_files(api, self.items[:5]))
+
+        self.assertEqual(api.post.call_count, 1)
+        self.assertTrue(all(file is None and error for _, file, error in results))
+        sleep.assert_not_called()
+
+
+if __name__ == "__main__":
+    unittest.main()
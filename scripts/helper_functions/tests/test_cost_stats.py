@@ -0,0 +1,94 @@
+import math
+import unittest
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+import cost_stats
+
+
+def make_task(task_id, app, price, project="u/p", seconds=60, status="COMPLETED"):
+    """Make a task with the fields used by the task table"""
+
+    start = datetime(2025, 1, 1)
+    return SimpleNamespace(
+        id=task_id,
+        project=project,
+        app=app,
+        status=status,
+        price=None if price is None else SimpleNamespace(amount=price),
+        start_time=start,
+        end_time=start + timedelta(seconds=seconds),
+        execution_settings={"instance_type": "c5.2xlarge"},
+    )
+
+
+class TestCostStats(unittest.TestCase):
+    def setUp(self):
+        self.tasks = [
+            make_task("a1", "u/p/align/1", 1.0),
+            make_task("a2", "u/p/align/2", 3.0),
+            make_task("a3", "u/p/align/2", 2.0),
+            # more expensive than every align task
+            make_task("c1", "u/p/call/1", 10.0, project="u/q"),
+            make_task("c2", "u/p/call/1", 0.5, project="u/q"),
+            make_task("r1", "u/p/call/1", None, status="RUNNING"),
+        ]
+
+    def test_tasks_to_frame(self):
+        """Test that tasks become one typed row each"""
+
+        df = cost_stats.tasks_to_frame(self.tasks)
+
+        self.assertEqual(list(df.columns), cost_stats.TASK_COLUMNS)
+        self.assertEqual(len(df), 6)
+        self.assertEqual(df["app"].dtype, "category")
+        self.assertEqual(list(df["revision"][:2]), ["1", "2"])
+        self.assertEqual(df["app_id"][0], "u/p/align")
+        self.assertEqual(df["duration"][0], 60)
+        self.assertTrue(math.isnan(df["price"][5]))
+
+    def test_summarize(self):
+        """Test that each app's highest and lowest come from that app's tasks"""
+
+        df = cost_stats.tasks_to_frame(self.tasks)
+
+        summary = cost_stats.summarize(df)
+
+        self.assertEqual(list(summary.index), ["all", "align", "call"])
+        self.assertEqual(list(summary["task_count"]), [5, 3, 2])
+        self.assertEqual(summary.loc["align", "highest_task_id"], "a2")
+        self.assertEqual(summary.loc["align", "highest_cost"], 3.0)
+        self.assertEqual(summary.loc["align", "lowest_task_id"], "a1")
+        self.assertEqual(summary.loc["call", "lowest_task_id"], "c2")
+        self.assertEqual(summary.loc["all", "highest_task_id"], "c1")
+        self.assertEqual(summary.loc["all", "total_cost"], 16.5)
+        self.assertEqual(summary.loc["align", "p50_cost"], 2.0)
+
+    def test_concat_and_group_by_project(self):
+        """Test that tables from several projects combine"""
+
+        df = cost_stats.concat_frames(
+            [
+                cost_stats.tasks_to_frame(self.tasks[:3]),
+                cost_stats.tasks_to_frame(self.tasks[3:]),
+            ]
+        )
+
+        summary = cost_stats.summarize(df, by="project")
+
+        self.assertEqual(list(summary.index), ["all", "u/p", "u/q"])
+        self.assertEqual(summary.loc["u/q", "total_cost"], 10.5)
+
+    def test_find_outliers(self):
+        """Test that tasks far outside their group's quartiles are outliers"""
+
+        tasks = [make_task(f"t{i}", "u/p/align/1", 1.0 + i / 100) for i in range(20)]
+        tasks.append(make_task("big", "u/p/align/1", 50.0))
+        df = cost_stats.tasks_to_frame(tasks)
+
+        outliers = cost_stats.find_outliers(df)
+
+        self.assertEqual(list(outliers["id"]), ["big"])
+
+
+if __name__ == "__main__":
+    unittest.main()
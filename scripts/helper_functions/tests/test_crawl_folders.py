@@ -0,0 +1,43 @@
+import unittest
+from helper_functions import crawl_folders, LIMIT
+from .fakes import MyFile
+
+
+class TestCrawlFolders(unittest.TestCase):
+    def test_nested_paths(self):
+        """Test that files in nested folders get their full path"""
+
+        inner = MyFile("inner", [MyFile("deep.txt")])
+        outer = MyFile("outer", [MyFile("a.txt"), inner])
+
+        # call the function
+        paths = sorted(path for path, file in crawl_folders(None, folder=outer))
+
+        self.assertEqual(paths, ["a.txt", "inner", "inner/deep.txt"])
+
+    def test_folder_pages(self):
+        """Test that every page of a large folder is listed"""
+
+        big = MyFile("big", [MyFile(f"{i}.txt") for i in range(LIMIT * 2 + 5)])
+        outer = MyFile("outer", [big])
+
+        # call the function
+        files = [file for path, file in crawl_folders(None, folder=outer)]
+
+        self.assertEqual(len(files), LIMIT * 2 + 6)
+
+    def test_not_folder(self):
+        """Test when the starting file is not a folder"""
+
+        with self.assertRaises(ValueError):
+            list(crawl_folders(None, folder=MyFile("a.txt")))
+
+    def test_project_and_folder(self):
+        """Test when both a project and folder are given"""
+
+        with self.assertRaises(ValueError):
+            list(crawl_folders(None, project="user/project", folder=MyFile("f", [])))
+
+
+if __name__ == "__main__":
+    unittest.main()
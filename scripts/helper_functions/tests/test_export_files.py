@@ -0,0 +1,112 @@
+import io
+import unittest
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+from helper_functions import export_files
+
+
+def make_api(states):
+    """Make an api whose export jobs finish with the given state per file name"""
+
+    def bulk_submit(exports, copy_only):
+        return [
+            SimpleNamespace(
+                valid=True, resource=SimpleNamespace(id=e["file"].name), error=None
+            )
+            for e in exports
+        ]
+
+    def bulk_get(ids):
+        # ids without a state are export jobs that don't exist
+        return [
+            SimpleNamespace(
+                valid=i in states,
+                resource=SimpleNamespace(id=i, state=states.get(i), error=f"{i} error"),
+            )
+            for i in ids
+        ]
+
+    api = MagicMock()
+    api.exports.bulk_submit.side_effect = bulk_submit
+    api.exports.bulk_get.side_effect = bulk_get
+    return api
+
+
+class TestExportFiles(unittest.TestCase):
+    def test_batches_and_states(self):
+        """Test that all files are exported in batches and failures are reported"""
+
+        files = [SimpleNamespace(name=f"file{i}") for i in range(250)]
+        states = {f.name: "COMPLETED" for f in files}
+        states["file7"] = "FAILED"
+        api = make_api(states)
+
+        # call the function
+        results = list(
+            export_files(api, [(f, "loc") for f in files], "u/vol", min_wait=0)
+        )
+
+        # check the results
+        self.assertEqual(len(results), 250)
+        self.assertEqual(api.exports.bulk_submit.call_count, 3)
+        failed = [(f.name, result) for f, state, result in results if state != "COMPLETED"]
+        self.assertEqual(failed, [("file7", "file7 error")])
+        first = api.exports.bulk_submit.call_args_list[0][0][0][0]
+        self.assertEqual(first["location"], "loc/file0")
+
+    def test_running_jobs_and_journal(self):
+        """Test that already running jobs are checked without resubmitting them"""
+
+        running = SimpleNamespace(id="id0", name="file0")
+        new = SimpleNamespace(id="id1", name="file1")
+        api = make_api({"job0": "COMPLETED", "file1": "COMPLETED"})
+        journal = io.StringIO()
+
+        # call the function
+        results = list(
+            export_files(
+                api,
+                [(new, "loc")],
+                "u/vol",
+                min_wait=0,
+                running={"job0": (running, "loc")},
+                journal=journal,
+            )
+        )
+
+        # check the results
+        self.assertEqual({f.name for f, state, result in results}, {"file0", "file1"})
+        submitted = api.exports.bulk_submit.call_args[0][0]
+        self.assertEqual([e["file"] for e in submitted], [new])
+        states = journal.getvalue().splitlines()
+        self.assertEqual(len(states), 3)
+        self.assertIn('"state": "SUBMITTED"', states[0])
+
+    def test_missing_running_job(self):
+        """Test that a running job that doesn't exist finishes as NOT_FOUND"""
+
+        stale = SimpleNamespace(id="id0", name="file0")
+        api = make_api({})
+        journal = io.StringIO()
+
+        # call the function
+        results = list(
+            export_files(
+                api,
+                [],
+                "u/vol",
+                min_wait=0,
+                running={"gone": (stale, "loc")},
+                journal=journal,
+            )
+        )
+
+        # check the results
+        self.assertEqual(len(results), 1)
+        self.assertEqual(results[0][:2], (stale, "NOT_FOUND"))
+        self.assertIn('"state": "NOT_FOUND"', journal.getvalue())
+        api.exports.bulk_submit.assert_not_called()
+
+
+if __name__ == "__main__":
+    unittest.main()
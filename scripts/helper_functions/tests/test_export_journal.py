@@ -0,0 +1,43 @@
+import tempfile
+import unittest
+from pathlib import Path
+from types import SimpleNamespace
+import export_journal
+
+
+class TestExportJournal(unittest.TestCase):
+    def test_resume_split(self):
+        """Test that the last state of each export decides what is resubmitted"""
+
+        done, running, failed, new = [
+            SimpleNamespace(id=f"id{i}", name=f"file{i}") for i in range(4)
+        ]
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / "export.jsonl"
+            with open(path, "a") as journal:
+                for f in [done, running, failed]:
+                    export_journal.write(journal, f, "loc", "SUBMITTED", f"e{f.id}")
+                export_journal.write(journal, done, "loc", "COMPLETED", f"e{done.id}")
+                export_journal.write(journal, failed, "loc", "FAILED", f"e{failed.id}", "boom")
+                # line cut off by a crash
+                journal.write('{"file": "id3"')
+            records = export_journal.load(path)
+
+        # call the function
+        completed, in_flight, pending = export_journal.split_exports(
+            records, [(f, "loc") for f in [done, running, failed, new]]
+        )
+
+        # check the results
+        self.assertEqual(completed, [(done, "loc")])
+        self.assertEqual(in_flight, {"eid1": (running, "loc")})
+        self.assertEqual(pending, [(failed, "loc"), (new, "loc")])
+        self.assertEqual(records[("id2", "loc")]["error"], "boom")
+
+    def test_missing_journal(self):
+        """Test that a missing journal is empty"""
+        self.assertEqual(export_journal.load("/nonexistent/export.jsonl"), {})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,99 @@
+import unittest
+from helper_functions import fetch_all_pages, fetch_in_bulk, iter_pages, LIMIT
+from .fakes import MyPage, bulk_records
+
+
+def make_query(items, total=None):
+    """Make a query function that pages through items"""
+    calls = []
+
+    def query(limit, offset):
+        calls.append(offset)
+        return MyPage(items[offset : offset + limit], total or len(items))
+
+    return query, calls
+
+
+class TestFetchAllPages(unittest.TestCase):
+    def test_single_page(self):
+        """Test when everything fits on the first page"""
+
+        query, calls = make_query(list(range(10)))
+
+        out_items = fetch_all_pages(query)
+
+        self.assertEqual(out_items, list(range(10)))
+        self.assertEqual(calls, [0])
+
+    def test_many_pages_in_order(self):
+        """Test that pages fetched in parallel are returned in order"""
+
+        items = list(range(LIMIT * 5 + 7))
+        query, calls = make_query(items)
+
+        out_items = fetch_all_pages(query, max_workers=3)
+
+        self.assertEqual(out_items, items)
+        self.assertEqual(sorted(calls), list(range(0, LIMIT * 6, LIMIT)))
+
+    def test_stale_total(self):
+        """Test when the total is lower than the number of items"""
+
+        items = list(range(LIMIT * 2 + 3))
+        query, calls = make_query(items, total=LIMIT)
+
+        out_items = fetch_all_pages(query)
+
+        self.assertEqual(out_items, items)
+
+    def test_empty(self):
+        """Test when the query has no results"""
+
+        query, calls = make_query([])
+
+        out_items = fetch_all_pages(query)
+
+        self.assertEqual(out_items, [])
+
+    def test_iter_pages_streams(self):
+        """Test that items are yielded before later pages are fetched"""
+
+        items = list(range(LIMIT * 10 + 5))
+        query, calls = make_query(items)
+
+        pages = iter_pages(query, prefetch=2)
+        first_items = [next(pages) for _ in range(LIMIT + 1)]
+
+        # the first two pages plus at most two pages fetched ahead
+        self.assertEqual(first_items, items[: LIMIT + 1])
+        self.assertLessEqual(len(calls), 4)
+        self.assertEqual(list(pages), items[LIMIT + 1 :])
+        self.assertEqual(sorted(calls), list(range(0, LIMIT * 11, LIMIT)))
+
+    def test_fetch_in_bulk_window(self):
+        """Test that ids are read in chunks only as there's room for them"""
+
+        drawn = []
+
+        def ids():
+            for i in range(LIMIT * 20 + 5):
+                drawn.append(i)
+                yield i
+
+        def bulk_get(chunk):
+            return bulk_records(chunk, {i: i * 2 for i in chunk if i % 7})
+
+        records = fetch_in_bulk(bulk_get, ids(), max_workers=2)
+        first = next(records)
+
+        # the first chunk plus at most two chunks submitted ahead
+        self.assertEqual(first, (0, None))
+        self.assertLessEqual(len(drawn), LIMIT * 3)
+        rest = list(records)
+        self.assertEqual(len(rest), LIMIT * 20 + 4)
+        self.assertEqual(rest[:2], [(1, 2), (2, 4)])
+        self.assertEqual([i for i, r in rest], list(range(1, LIMIT * 20 + 5)))
+
+
+if __name__ == "__main__":
+    unittest.main()
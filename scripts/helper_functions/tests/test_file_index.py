@@ -0,0 +1,176 @@
+import unittest
+import tempfile
+import file_index
+from pathlib import Path
+from datetime import datetime
+from unittest.mock import patch
+from helper_functions import update_file_index, find_indexed_files, get_file_obj
+from .fakes import MyFile, make_file_api
+
+
+class TestFileIndex(unittest.TestCase):
+    def setUp(self):
+        self.conn = file_index.connect(":memory:")
+
+    def test_lookups(self):
+        """Test looking up files by name, path, and metadata"""
+
+        file = MyFile("a.vcf", metadata={"sample_id": "BS_1"}, id="1")
+        file_index.save_files(self.conn, [file_index.file_row("u/p", "res/a.vcf", file)])
+
+        self.assertEqual(file_index.find_by_name(self.conn, "u/p", "a.vcf")[0]["id"], "1")
+        self.assertEqual(file_index.find_by_path(self.conn, "u/p", "res/a.vcf")[0]["id"], "1")
+        self.assertEqual(
+            file_index.find_by_metadata(self.conn, "u/p", "sample_id", "BS_1")[0]["id"], "1"
+        )
+        self.assertEqual(file_index.find_by_name(self.conn, "u/other", "a.vcf"), [])
+
+    def test_prune_keeps_unchanged_folders(self):
+        """Test that files in folders that weren't re-listed are kept"""
+
+        kept = MyFile("b.txt", id="2")
+        rows = [
+            file_index.file_row("u/p", "keep", MyFile("keep", [kept], id="1")),
+            file_index.file_row("u/p", "keep/b.txt", kept),
+            file_index.file_row("u/p", "gone.txt", MyFile("gone.txt", id="3")),
+        ]
+        file_index.save_files(self.conn, rows)
+
+        file_index.start_listing(self.conn)
+        file_index.mark_listed(self.conn, ["1"])
+        file_index.prune(self.conn, "u/p", ["1"])
+
+        self.assertEqual(len(file_index.find_by_path(self.conn, "u/p", "keep/b.txt")), 1)
+        self.assertEqual(file_index.find_by_name(self.conn, "u/p", "gone.txt"), [])
+
+
+class TestUpdateFileIndex(unittest.TestCase):
+    def test_refresh_skips_unchanged_folders(self):
+        """Test that a refresh only lists folders with a new modified time"""
+
+        same = MyFile("same", [MyFile("b.txt", id="2")], id="1")
+        changed = MyFile("changed", [MyFile("c.txt", id="4")], id="3")
+        api = make_file_api([same, changed])
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            index_path = Path(tmp_dir) / "index.sqlite"
+
+            # first index lists every folder
+            self.assertEqual(update_file_index(api, "u/p", index_path=index_path), 4)
+
+            changed.children.append(MyFile("d.txt", id="5"))
+            changed.modified_on = datetime(2025, 1, 2)
+            self.assertEqual(update_file_index(api, "u/p", index_path=index_path), 4)
+
+            conn = file_index.connect(index_path)
+            same_rows = file_index.find_by_path(conn, "u/p", "same/b.txt")
+            changed_rows = file_index.find_by_path(conn, "u/p", "changed/d.txt")
+            conn.close()
+
+        self.assertEqual(same.listed, 1)
+        self.assertEqual(changed.listed, 2)
+        self.assertEqual(len(same_rows), 1)
+        self.assertEqual(len(changed_rows), 1)
+
+    def test_refresh_checks_nested_folders(self):
+        """Test that a changed folder inside an unchanged folder is listed again"""
+
+        gone = MyFile("gone.txt", id="4")
+        inner = MyFile("inner", [MyFile("c.txt", id="5"), gone], id="3")
+        outer = MyFile("outer", [MyFile("b.txt", id="2"), inner], id="1")
+        api = make_file_api([outer])
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            index_path = Path(tmp_dir) / "index.sqlite"
+            update_file_index(api, "u/p", index_path=index_path)
+
+            # only the inner folder's modified time changes
+            inner.children.remove(gone)
+            inner.children.append(MyFile("d.txt", id="6"))
+            inner.children[-1].parent = inner.id
+            inner.modified_on = datetime(2025, 1, 2)
+            update_file_index(api, "u/p", index_path=index_path)
+
+            conn = file_index.connect(index_path)
+            paths = {
+                name: [r["path"] for r in file_index.find_by_name(conn, "u/p", name)]
+                for name in ["b.txt", "c.txt", "d.txt", "gone.txt"]
+            }
+            conn.close()
+
+        self.assertEqual(outer.listed, 1)
+        self.assertEqual(inner.listed, 2)
+        self.assertEqual(
+            paths,
+            {
+                "b.txt": ["outer/b.txt"],
+                "c.txt": ["outer/inner/c.txt"],
+                "d.txt": ["outer/inner/d.txt"],
+                "gone.txt": [],
+            },
+        )
+
+    def test_refresh_renamed_nested_folder(self):
+        """Test that a renamed folder inside an unchanged folder gets its new path"""
+
+        inner = MyFile("inner", [MyFile("c.txt", id="3")], id="2")
+        outer = MyFile("outer", [inner], id="1")
+        api = make_file_api([outer])
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            index_path = Path(tmp_dir) / "index.sqlite"
+            update_file_index(api, "u/p", index_path=index_path)
+
+            # renaming doesn't change either folder's modified time
+            inner.name = "renamed"
+            update_file_index(api, "u/p", index_path=index_path)
+
+            conn = file_index.connect(index_path)
+            paths = [r["path"] for r in file_index.find_by_name(conn, "u/p", "c.txt")]
+            conn.close()
+
+        self.assertEqual(paths, ["outer/renamed/c.txt"])
+
+    def test_find_indexed_files_checks_hits(self):
+        """Test that index hits renamed since indexing are left out"""
+
+        kept = MyFile("a.txt", id="2")
+        renamed = MyFile("a.txt", id="3")
+        api = make_file_api([MyFile("folder", [kept, renamed], id="1")])
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            index_path = Path(tmp_dir) / "index.sqlite"
+            update_file_index(api, "u/p", index_path=index_path)
+            renamed.name = "b.txt"
+
+            found = find_indexed_files(api, "u/p", "a.txt", index_path=index_path)
+
+        self.assertEqual([f.id for f in found], ["2"])
+        self.assertEqual(api.files.bulk_get.call_count, 1)
+
+
+    def test_get_file_obj_index_miss(self):
+        """Test that a file missing from the refreshed index is found after
+        listing every folder"""
+
+        folder = MyFile("folder", [MyFile("a.txt")], id="1")
+        api = make_file_api([folder])
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            with patch.object(file_index, "INDEX_PATH", Path(tmp_dir) / "index.sqlite"):
+                update_file_index(api, "u/p")
+
+                # a new file that leaves the folder's modified time as it was
+                new_file = MyFile("b.txt", id="3")
+                new_file.parent = folder.id
+                folder.children.append(new_file)
+                found = get_file_obj(api, "u/p", "b.txt")
+
+                with self.assertRaises(FileNotFoundError):
+                    get_file_obj(api, "u/p", "nope.txt")
+
+        self.assertIs(found, new_file)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,62 @@
+import unittest
+from types import SimpleNamespace
+from helper_functions import find_tasks
+from .fakes import make_task_api
+
+
+class TestFindTasks(unittest.TestCase):
+    def setUp(self):
+        def task(task_id, status, app):
+            return SimpleNamespace(id=task_id, project="u/p", status=status, app=app)
+
+        self.tasks = [task(f"c{i}", "COMPLETED", "u/p/align/1") for i in range(1000)]
+        self.tasks += [
+            task("f1", "FAILED", "u/p/align/1"),
+            task("f2", "FAILED", "u/p/call/2"),
+            task("a1", "ABORTED", "u/p/align/2"),
+        ]
+        self.api = make_task_api({t.id: t for t in self.tasks})
+
+    def test_one_query_per_status(self):
+        """Test that only the requested statuses are fetched"""
+        api = self.api
+
+        # call the function
+        found = list(find_tasks(api, statuses=["failed", "ABORTED"], project="u/p"))
+
+        # check the results
+        self.assertEqual([t.id for t in found], ["f1", "f2", "a1"])
+        self.assertEqual(
+            sorted(c.kwargs["status"] for c in api.tasks.query.call_args_list),
+            ["ABORTED", "FAILED"],
+        )
+
+    def test_app_filter(self):
+        """Test matching apps with and without the revision"""
+        api = self.api
+
+        found = list(find_tasks(api, ["FAILED", "ABORTED"], app="u/p/align", project="u/p"))
+        self.assertEqual([t.id for t in found], ["f1", "a1"])
+
+        found = list(find_tasks(api, ["FAILED", "ABORTED"], app="u/p/align/2", project="u/p"))
+        self.assertEqual([t.id for t in found], ["a1"])
+
+    def test_streams_pages(self):
+        """Test that tasks are yielded before every page has been fetched"""
+
+        tasks = find_tasks(self.api, statuses=["COMPLETED", "FAILED"], project="u/p")
+        first = next(tasks)
+
+        # 10 pages of completed tasks, only a few are fetched ahead
+        self.assertEqual(first.id, "c0")
+        completed_calls = [
+            c
+            for c in self.api.tasks.query.call_args_list
+            if c.kwargs["status"] == "COMPLETED"
+        ]
+        self.assertLess(len(completed_calls), 6)
+        tasks.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
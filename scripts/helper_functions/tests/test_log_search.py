@@ -0,0 +1,102 @@
+import re
+import tempfile
+import unittest
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+import log_search
+
+LOG = b"line one\nerror: bad input\nline three\r\nanother ERROR\nlast line"
+
+
+class RangeSession:
+    """Fake session serving LOG with range requests"""
+
+    def __init__(self, data=LOG):
+        self.data = data
+        self.ranges = []
+
+    def get(self, url, headers=None, stream=False, timeout=None):
+        byte_range = headers["Range"]
+        self.ranges.append(byte_range)
+        size = len(self.data)
+        first, last = re.match(r"bytes=(\d*)-(\d*)", byte_range).groups()
+        if first == "":
+            first, last = max(size - int(last), 0), size - 1
+        else:
+            first, last = int(first), min(int(last), size - 1)
+        if first >= size:
+            return SimpleNamespace(status_code=416)
+        body = self.data[first : last + 1]
+        response = MagicMock(status_code=206)
+        response.headers = {"Content-Range": f"bytes {first}-{last}/{size}"}
+        response.iter_content.side_effect = lambda n: [
+            body[i : i + n] for i in range(0, len(body), n)
+        ]
+        return response
+
+
+def make_log_file(file_id="log1"):
+    log_file = MagicMock(id=file_id)
+    log_file.download_info.return_value = SimpleNamespace(url="https://signed/url")
+    return log_file
+
+
+class TestLogSearch(unittest.TestCase):
+    def test_iter_lines_ranges(self):
+        """Test that lines split across ranges are put back together"""
+
+        session = RangeSession()
+        lines = list(log_search.iter_lines(session, "url", range_size=7))
+
+        self.assertEqual(lines, LOG.decode().replace("\r", "").split("\n"))
+        self.assertEqual(len(session.ranges), -(-len(LOG) // 7))
+
+    def test_iter_lines_tail(self):
+        """Test that a tail starts at the first full line"""
+
+        session = RangeSession()
+        lines = list(log_search.iter_lines(session, "url", tail=24))
+
+        self.assertEqual(lines, ["another ERROR", "last line"])
+        self.assertEqual(session.ranges[0], "bytes=-24")
+
+    def test_search_lines(self):
+        """Test that lines matching any pattern are returned with line numbers"""
+
+        lines = LOG.decode().splitlines()
+        matches = list(log_search.search_lines(lines, ["(?i)error", "^last"]))
+
+        self.assertEqual(
+            matches, [(2, "error: bad input"), (4, "another ERROR"), (5, "last line")]
+        )
+
+    def test_read_log_cache(self):
+        """Test that a log read once is read from the cache afterwards"""
+
+        session = RangeSession()
+        log_file = make_log_file()
+        with tempfile.TemporaryDirectory() as cache_dir:
+            first = list(log_search.read_log(session, log_file, cache_dir))
+            requests = len(session.ranges)
+            second = list(log_search.read_log(session, log_file, cache_dir))
+
+        self.assertEqual(first, second)
+        self.assertEqual(len(session.ranges), requests)
+        log_file.download_info.assert_called_once()
+
+    def test_read_log_partial_not_cached(self):
+        """Test that a log that isn't read to the end isn't cached"""
+
+        session = RangeSession()
+        log_file = make_log_file()
+        with tempfile.TemporaryDirectory() as cache_dir:
+            lines = log_search.read_log(session, log_file, cache_dir)
+            next(lines)
+            lines.close()
+            list(log_search.read_log(session, log_file, cache_dir))
+
+        self.assertEqual(log_file.download_info.call_count, 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,74 @@
+import tempfile
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+import file_index
+from helper_functions import (
+    query_files,
+    find_files_by_metadata,
+    find_exportable_files,
+    NAME_CHUNK,
+)
+from .fakes import MyFile, make_file_api
+
+
+class TestQueryFiles(unittest.TestCase):
+    def test_metadata_values_in_chunks(self):
+        """Test that metadata values are sent to the api in chunks"""
+        root_files = [MyFile(f"f{i}", metadata={"sample_id": f"S{i}", "case": "C1"}) for i in range(200)]
+        api = make_file_api(root_files)
+        wanted = [f"S{i}" for i in range(0, 200, 2)]
+
+        # call the function
+        found = list(
+            query_files(api, metadata={"case": "C1", "sample_id": wanted}, project="u/p")
+        )
+
+        # check the results
+        self.assertEqual(sorted(f.metadata["sample_id"] for f in found), sorted(wanted))
+        self.assertEqual(api.files.query.call_count, len(wanted) // NAME_CHUNK)
+        for call in api.files.query.call_args_list:
+            self.assertEqual(call.kwargs["metadata"]["case"], "C1")
+            self.assertLessEqual(len(call.kwargs["metadata"]["sample_id"]), NAME_CHUNK)
+
+    def test_without_index(self):
+        """Test searching every folder for metadata and exportable files"""
+        nested = MyFile("nested.bam", metadata={"sample_id": "S2"}, storage="VOLUME")
+        root_files = [
+            MyFile("root.bam", metadata={"sample_id": "S1"}),
+            MyFile("no_meta.bam"),
+            MyFile("folder", children=[nested]),
+        ]
+        api = make_file_api(root_files)
+
+        matches = find_files_by_metadata(
+            api, "u/p", "sample_id", ["S1", "S2", "S3"], use_index=False
+        )
+        self.assertEqual(
+            {value: [f.name for f in files] for value, files in matches.items()},
+            {"S1": ["root.bam"], "S2": ["nested.bam"]},
+        )
+
+        exportable = find_exportable_files(api, "u/p")
+        self.assertEqual([f.name for f in exportable], ["root.bam", "no_meta.bam"])
+
+    def test_metadata_edited_in_folder(self):
+        """Test that metadata edited after indexing is found in folders"""
+        nested = MyFile("nested.bam")
+        root_files = [MyFile("root.bam"), MyFile("folder", children=[nested])]
+        api = make_file_api(root_files)
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            index_path = Path(tmp_dir) / "index.sqlite"
+            with patch.object(file_index, "INDEX_PATH", index_path):
+                find_files_by_metadata(api, "u/p", "sample_id", ["S1"])
+                # editing metadata doesn't change the folder's modified time
+                nested.metadata["sample_id"] = "S1"
+                matches = find_files_by_metadata(api, "u/p", "sample_id", ["S1"])
+
+        self.assertEqual(list(matches), ["S1"])
+        self.assertEqual([f.name for f in matches["S1"]], ["nested.bam"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,138 @@
+import tempfile
+import time
+import unittest
+from pathlib import Path
+from unittest.mock import MagicMock
+import requests
+from requests import Response
+from requests.adapters import BaseAdapter
+import response_cache
+from rate_limiter import RateLimiter, install, token_key
+
+URL = "https://api.test/v2"
+
+
+class FakeAdapter(BaseAdapter):
+    """Answer every request with an empty json response and rate limit headers"""
+
+    def __init__(self, calls, headers=None):
+        super().__init__()
+        self.calls = calls
+        self.headers = headers or {}
+
+    def send(self, request, **kwargs):
+        self.calls.append("send")
+        response = Response()
+        response.status_code = 200
+        response.headers["Content-Type"] = "application/json"
+        response.headers.update(self.headers)
+        response._content = b"{}"
+        response.request = request
+        return response
+
+    def close(self):
+        pass
+
+
+class TestRateLimiter(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = Path(self.tmp.name) / "rate_limit.json"
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_no_wait_with_requests_left(self):
+        """Test that requests aren't slowed down far from the limit"""
+        limiter = RateLimiter(self.path, pace_below=100, reserve=0)
+        self.assertEqual(limiter.delay(), 0)
+        limiter.update(
+            {"X-RateLimit-Remaining": "900", "X-RateLimit-Reset": str(int(time.time()) + 100)}
+        )
+        self.assertEqual(limiter.delay(), 0)
+
+    def test_pacing_shared_between_limiters(self):
+        """Test that requests are spread out near the limit across limiters sharing a file"""
+        reset = int(time.time()) + 100
+        first = RateLimiter(self.path, pace_below=100, reserve=0)
+        second = RateLimiter(self.path, pace_below=100, reserve=0)
+        first.update({"X-RateLimit-Remaining": "10", "X-RateLimit-Reset": str(reset)})
+
+        # call the function
+        delays = [first.delay(), second.delay(), first.delay()]
+
+        # check the results, each slot is about (reset - now) / remaining after the last
+        self.assertAlmostEqual(delays[0], 0, delta=0.5)
+        self.assertAlmostEqual(delays[1], 10, delta=1)
+        self.assertAlmostEqual(delays[2], 10 + 100 / 9, delta=1)
+
+    def test_wait_for_reset(self):
+        """Test that nothing is sent until the reset once the reserve is reached"""
+        reset = int(time.time()) + 30
+        limiter = RateLimiter(self.path, reserve=5)
+        limiter.update({"X-RateLimit-Remaining": "5", "X-RateLimit-Reset": str(reset)})
+        self.assertAlmostEqual(limiter.delay(), 30, delta=1)
+        # an older response doesn't raise the remaining count
+        limiter.update({"X-RateLimit-Remaining": "50", "X-RateLimit-Reset": str(reset)})
+        self.assertAlmostEqual(limiter.delay(), 30, delta=1)
+
+    def test_state_per_token(self):
+        """Test that one token near its limit doesn't slow down another token"""
+        reset = str(int(time.time()) + 30)
+        limiter = RateLimiter(self.path, pace_below=100, reserve=5)
+        headers = {"X-RateLimit-Reset": reset}
+        limiter.update({**headers, "X-RateLimit-Remaining": "5"}, "a")
+        limiter.update({**headers, "X-RateLimit-Remaining": "900"}, "b")
+
+        self.assertAlmostEqual(limiter.delay("a"), 30, delta=1)
+        self.assertEqual(limiter.delay("b"), 0)
+        # the token itself isn't saved
+        self.assertNotIn('"a"', self.path.read_text())
+
+    def test_file_only_used_near_limit(self):
+        """Test that the shared file isn't touched while many requests are left"""
+        reset = str(int(time.time()) + 100)
+        limiter = RateLimiter(self.path, pace_below=100, reserve=0)
+        limiter.update({"X-RateLimit-Remaining": "900", "X-RateLimit-Reset": reset})
+        for _ in range(10):
+            self.assertEqual(limiter.delay(), 0)
+        self.assertFalse(self.path.exists())
+
+    def test_install_paces_before_sending(self):
+        """Test that a session waits for its slot before a request is sent"""
+        calls = []
+        limiter = MagicMock()
+        limiter.wait.side_effect = lambda token: calls.append(("wait", token))
+        session = requests.Session()
+        adapter = FakeAdapter(calls)
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        install(session, limiter)
+
+        session.get(f"{URL}/tasks/1", headers={"X-SBG-Auth-Token": "a"})
+
+        self.assertEqual(calls, [("wait", "a"), "send"])
+        limiter.update.assert_called_once()
+
+    def test_cache_hits_not_counted(self):
+        """Test that requests answered from a response cache don't use up a request"""
+        calls = []
+        limiter = RateLimiter(self.path, pace_below=100, reserve=0)
+        headers = {
+            "X-RateLimit-Remaining": "900",
+            "X-RateLimit-Reset": str(int(time.time()) + 100),
+        }
+        session = requests.Session()
+        session.mount("https://", FakeAdapter(calls, headers))
+        install(session, limiter)
+        response_cache.install(session, response_cache.ResponseCache())
+
+        session.get(f"{URL}/projects/u/p", headers={"X-SBG-Auth-Token": "a"})
+        remaining = limiter.local[token_key("a")]["remaining"]
+        session.get(f"{URL}/projects/u/p", headers={"X-SBG-Auth-Token": "a"})
+
+        self.assertEqual(calls, ["send"])
+        self.assertEqual(limiter.local[token_key("a")]["remaining"], remaining)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,72 @@
+import unittest
+import tempfile
+import file_index
+from pathlib import Path
+from unittest.mock import patch
+from helper_functions import resolve_file_names
+from .fakes import MyFile, make_file_api
+
+
+class TestResolveFileNames(unittest.TestCase):
+    def test_root_and_folder_files(self):
+        """Test finding files in the root dir and within folders"""
+
+        root_file = MyFile("root.txt")
+        deep_file = MyFile("deep.txt")
+        api = make_file_api([root_file, MyFile("folder", [deep_file])])
+
+        # call the function
+        found, missing, ambiguous = resolve_file_names(
+            api, "u/p", ["root.txt", "deep.txt"], use_index=False
+        )
+
+        self.assertEqual(found, {"root.txt": root_file, "deep.txt": deep_file})
+        self.assertEqual(missing, [])
+        self.assertEqual(ambiguous, [])
+
+    def test_missing_and_ambiguous(self):
+        """Test names that don't exist or exist more than once"""
+
+        api = make_file_api(
+            [
+                MyFile("a", [MyFile("dup.txt")]),
+                MyFile("b", [MyFile("dup.txt")]),
+            ]
+        )
+
+        # call the function
+        found, missing, ambiguous = resolve_file_names(
+            api, "u/p", ["dup.txt", "nope.txt", "nope.txt"], use_index=False
+        )
+
+        self.assertEqual(found, {})
+        self.assertEqual(missing, ["nope.txt"])
+        self.assertEqual(ambiguous, ["dup.txt"])
+
+
+    def test_index_miss_lists_every_folder(self):
+        """Test that names missing from a refreshed index are looked for again
+        after listing every folder"""
+
+        folder = MyFile("folder", [MyFile("a.txt")])
+        api = make_file_api([MyFile("root.txt"), folder])
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            with patch.object(file_index, "INDEX_PATH", Path(tmp_dir) / "index.sqlite"):
+                resolve_file_names(api, "u/p", ["a.txt"])
+
+                # a new file that leaves the folder's modified time as it was
+                new_file = MyFile("b.txt")
+                new_file.parent = folder.id
+                folder.children.append(new_file)
+                found, missing, ambiguous = resolve_file_names(
+                    api, "u/p", ["a.txt", "b.txt"]
+                )
+
+        self.assertEqual(found, {"a.txt": folder.children[0], "b.txt": new_file})
+        self.assertEqual(missing, [])
+        self.assertEqual(ambiguous, [])
+
+
+if __name__ == "__main__":
+    unittest.main()
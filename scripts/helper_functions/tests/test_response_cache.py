@@ -0,0 +1,76 @@
+import tempfile
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+import requests
+from requests import Response
+from requests.adapters import HTTPAdapter
+import response_cache
+from response_cache import ResponseCache, resource_type
+
+URL = "https://api.test/v2"
+
+
+def fake_send(adapter, request, **kwargs):
+    """Answer every request with a json response naming the request"""
+    response = Response()
+    response.status_code = 200
+    response.headers["Content-Type"] = "application/json"
+    response._content = f'{{"url": "{request.url}"}}'.encode()
+    response.request = request
+    return response
+
+
+@patch.object(HTTPAdapter, "send", autospec=True, side_effect=fake_send)
+class TestResponseCache(unittest.TestCase):
+    def make_session(self, cache):
+        session = requests.Session()
+        response_cache.install(session, cache)
+        return session
+
+    def test_cached_and_uncached_types(self, send):
+        """Test that cached resource types are only fetched once and tasks every time"""
+        session = self.make_session(ResponseCache())
+
+        for _ in range(3):
+            self.assertEqual(
+                session.get(f"{URL}/projects/u/p").json(), {"url": f"{URL}/projects/u/p"}
+            )
+            session.get(f"{URL}/tasks/123")
+
+        self.assertEqual(send.call_count, 4)
+
+    def test_writes_invalidate(self, send):
+        """Test that a write clears its resource type but a bulk get doesn't"""
+        session = self.make_session(ResponseCache())
+
+        session.get(f"{URL}/files/1")
+        session.post(f"{URL}/bulk/files/get", json={"file_ids": ["1"]})
+        session.get(f"{URL}/files/1")
+        self.assertEqual(send.call_count, 2)
+
+        session.patch(f"{URL}/files/1", json={"name": "new.txt"})
+        session.get(f"{URL}/files/1")
+        self.assertEqual(send.call_count, 4)
+
+    def test_disk_tier_and_lru(self, send):
+        """Test that the disk tier outlives the memory tier"""
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / "responses.sqlite"
+            session = self.make_session(ResponseCache(max_bytes=50, disk_path=path))
+            session.get(f"{URL}/apps/a")
+            session.get(f"{URL}/apps/b")
+            self.assertEqual(len(session.get_adapter(URL).cache.memory), 1)
+
+            # a new cache, like a new run of a script, reads the disk tier
+            session = self.make_session(ResponseCache(disk_path=path))
+            session.get(f"{URL}/apps/a")
+            self.assertEqual(send.call_count, 2)
+
+    def test_resource_type(self, send):
+        self.assertEqual(resource_type(f"{URL}/billing/groups"), "billing")
+        self.assertEqual(resource_type(f"{URL}/bulk/tasks/get"), "tasks")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,27 @@
+import unittest
+from unittest.mock import patch
+import helper_functions
+from helper_functions import rest_session
+
+
+class TestRestSession(unittest.TestCase):
+    @patch.object(
+        helper_functions, "read_credentials", return_value=("https://api.test/v2/", "token")
+    )
+    def test_session_settings(self, read_credentials):
+        """Test that the session has the auth headers, pool, retries, and timeout"""
+
+        # call the function
+        url, session = rest_session("profile", pool_size=4, retries=2, timeout=30)
+
+        # check the results
+        self.assertEqual(url, "https://api.test/v2")
+        self.assertEqual(session.headers["X-SBG-Auth-Token"], "token")
+        adapter = session.get_adapter(url)
+        self.assertEqual(adapter._pool_maxsize, 4)
+        self.assertEqual(adapter.max_retries.total, 2)
+        self.assertEqual(session.timeout, 30)
+
+
+if __name__ == "__main__":
+    unittest.main()
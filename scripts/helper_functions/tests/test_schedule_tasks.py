@@ -0,0 +1,129 @@
+import io
+import unittest
+from unittest.mock import MagicMock
+import helper_functions
+from helper_functions import schedule_tasks
+from .fakes import bulk_records
+
+
+class MyTask:
+    """Test task that finishes after a number of status checks"""
+
+    def __init__(self, task_id, checks=1, status="DRAFT"):
+        self.id = task_id
+        self.status = status
+        self.checks = checks
+
+    def run(self):
+        self.status = "RUNNING"
+
+
+def make_api(tasks, log):
+    """Make an api whose running tasks move one check closer to finishing each bulk get"""
+
+    def bulk_get(ids):
+        log.append(list(ids))
+        for i in ids:
+            task = tasks.get(i)
+            if task is not None and task.status == "RUNNING":
+                task.checks -= 1
+                if task.checks == 0:
+                    task.status = "COMPLETED"
+        return bulk_records(ids, tasks)
+
+    api = MagicMock()
+    api.tasks.bulk_get.side_effect = bulk_get
+    return api
+
+
+class TestScheduleTasks(unittest.TestCase):
+    def setUp(self):
+        helper_functions.TASK_CACHE.clear()
+
+    def test_sliding_window(self):
+        """Test that a new task is launched as soon as one finishes"""
+
+        tasks = {
+            "slow": MyTask("slow", checks=5),
+            "a": MyTask("a"),
+            "b": MyTask("b"),
+            "c": MyTask("c"),
+            "done": MyTask("done", status="COMPLETED"),
+        }
+        log = []
+        api = make_api(tasks, log)
+
+        # call the function
+        events = list(
+            schedule_tasks(
+                api, ["slow", "a", "b", "missing", "done", "c"], 2, min_wait=0, max_wait=0
+            )
+        )
+
+        # check the results
+        finished = [(i, s) for i, s, info in events if s not in ["RUNNING", "QUEUED"]]
+        self.assertEqual(finished[0], ("a", "COMPLETED"))
+        self.assertIn(("missing", "NOT_FOUND"), finished)
+        self.assertIn(("done", "NOT_LAUNCHED"), finished)
+        self.assertEqual(finished[-1], ("slow", "COMPLETED"))
+        self.assertEqual({t.status for t in tasks.values()}, {"COMPLETED"})
+        # drafts are only fetched when there's room and only running tasks are checked
+        for ids in log:
+            self.assertLessEqual(len(ids), 2)
+
+    def test_restart(self):
+        """Test that launched tasks are checked first and never run again"""
+
+        tasks = {
+            "finished": MyTask("finished", status="COMPLETED"),
+            "running": MyTask("running", checks=2, status="RUNNING"),
+            "unlaunched": MyTask("unlaunched"),
+            "new": MyTask("new"),
+        }
+        tasks["running"].run = MagicMock()
+        api = make_api(tasks, [])
+        journal = io.StringIO()
+
+        # call the function
+        events = list(
+            schedule_tasks(
+                api,
+                ["new"],
+                2,
+                min_wait=0,
+                max_wait=0,
+                running=["finished", "running", "unlaunched"],
+                journal=journal,
+            )
+        )
+
+        # check the results
+        self.assertEqual(events[0][:2], ("finished", "COMPLETED"))
+        tasks["running"].run.assert_not_called()
+        self.assertEqual({t.status for t in tasks.values()}, {"COMPLETED"})
+        lines = journal.getvalue().splitlines()
+        self.assertEqual(sum('"state": "LAUNCHING"' in line for line in lines), 2)
+        self.assertEqual(sum('"state": "COMPLETED"' in line for line in lines), 4)
+
+    def test_max_checks(self):
+        """Test that scheduling stops after max_checks checks with nothing finishing"""
+
+        tasks = {"stuck": MyTask("stuck", checks=10), "next": MyTask("next")}
+        log = []
+        api = make_api(tasks, log)
+
+        # call the function
+        events = list(
+            schedule_tasks(
+                api, ["stuck", "next"], 1, min_wait=0, max_wait=0, max_checks=3
+            )
+        )
+
+        # check the results
+        self.assertEqual([s for i, s, info in events], ["RUNNING"])
+        self.assertEqual(tasks["next"].status, "DRAFT")
+        self.assertEqual(len(log), 1 + 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
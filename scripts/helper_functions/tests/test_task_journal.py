@@ -0,0 +1,39 @@
+import tempfile
+import unittest
+from pathlib import Path
+import task_journal
+
+
+class TestTaskJournal(unittest.TestCase):
+    def test_restart_split(self):
+        """Test that the last state of each task decides what is launched again"""
+
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / "state.jsonl"
+            with open(path, "a") as journal:
+                for task_id in ["done", "launching", "running", "failed", "pending"]:
+                    task_journal.write(journal, task_id, "PENDING")
+                task_journal.write(journal, "done", "LAUNCHING")
+                task_journal.write(journal, "done", "QUEUED")
+                task_journal.write(journal, "done", "COMPLETED")
+                task_journal.write(journal, "launching", "LAUNCHING")
+                task_journal.write(journal, "running", "RUNNING")
+                task_journal.write(journal, "failed", "NOT_LAUNCHED", "bad input")
+                # line cut off by a crash
+                journal.write('{"task": "pending", "sta')
+            records = task_journal.load(path)
+
+        # call the function
+        done, running, pending = task_journal.split_tasks(
+            records, ["done", "launching", "running", "failed", "pending", "new"]
+        )
+
+        # check the results
+        self.assertEqual(done, ["done", "failed"])
+        self.assertEqual(running, ["launching", "running"])
+        self.assertEqual(pending, ["pending", "new"])
+        self.assertEqual(records["failed"]["info"], "bad input")
+
+
+if __name__ == "__main__":
+    unittest.main()
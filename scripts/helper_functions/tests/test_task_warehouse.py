@@ -0,0 +1,100 @@
+import os
+import tempfile
+import unittest
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+import task_warehouse
+from helper_functions import sync_task_warehouse
+from .fakes import make_task_api
+
+
+def make_task(task_id, project, created, status="COMPLETED", price=1.0):
+    """Make a task with the fields saved to the warehouse"""
+
+    return SimpleNamespace(
+        id=task_id,
+        name=f"task {task_id}",
+        project=project,
+        app="u/p/align/2",
+        status=status,
+        price=SimpleNamespace(amount=price) if status == "COMPLETED" else None,
+        created_by="user",
+        created_time=created,
+        start_time=created,
+        end_time=created + timedelta(hours=1) if status == "COMPLETED" else None,
+        execution_settings={},
+        parent=None,
+        inputs={"reads": SimpleNamespace(id="file1"), "threads": 4},
+    )
+
+
+class TestTaskWarehouse(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp_dir.name, "warehouse.sqlite")
+        start = datetime(2025, 1, 1)
+        self.tasks = {
+            "a1": make_task("a1", "u/a", start),
+            "a2": make_task("a2", "u/a", start + timedelta(days=1), status="RUNNING"),
+            "b1": make_task("b1", "u/b", start + timedelta(days=2)),
+        }
+        self.api = make_task_api(self.tasks)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_first_sync(self):
+        """Test that every task is saved with its inputs and a watermark"""
+
+        counts = sync_task_warehouse(self.api, ["u/a", "u/b"], self.path)
+
+        self.assertEqual(counts, {"u/a": 2, "u/b": 1})
+        conn = task_warehouse.connect(self.path)
+        self.assertEqual(
+            task_warehouse.get_watermark(conn, "u/a"), "2025-01-02T00:00:00"
+        )
+        row = conn.execute("SELECT * FROM tasks WHERE id = 'a1'").fetchone()
+        self.assertEqual(row["revision"], "2")
+        self.assertEqual(row["duration"], 3600)
+        self.assertEqual(row["inputs"], '{"reads": "file1", "threads": 4}')
+        conn.close()
+
+    def test_incremental_sync(self):
+        """Test that later syncs only fetch new tasks and ones that were running"""
+
+        sync_task_warehouse(self.api, ["u/a"], self.path)
+        self.tasks["a2"] = make_task(
+            "a2", "u/a", datetime(2025, 1, 2), status="COMPLETED", price=3.0
+        )
+        self.tasks["a3"] = make_task("a3", "u/a", datetime(2025, 1, 5))
+        self.api.tasks.query.reset_mock()
+
+        counts = sync_task_warehouse(self.api, ["u/a"], self.path)
+
+        # a2 is at the watermark, a3 is new
+        self.assertEqual(counts, {"u/a": 2})
+        self.assertEqual(
+            self.api.tasks.query.call_args.kwargs["created_from"], "2025-01-02T00:00:00"
+        )
+        conn = task_warehouse.connect(self.path)
+        df = task_warehouse.read_tasks(conn, statuses=["COMPLETED"])
+        conn.close()
+        self.assertEqual(sorted(df["id"]), ["a1", "a2", "a3"])
+        self.assertEqual(df.set_index("id").loc["a2", "price"], 3.0)
+
+    def test_deleted_task_removed(self):
+        """Test that a running task that was deleted is removed"""
+
+        sync_task_warehouse(self.api, ["u/a"], self.path)
+        del self.tasks["a2"]
+
+        sync_task_warehouse(self.api, ["u/a"], self.path)
+
+        conn = task_warehouse.connect(self.path)
+        df = task_warehouse.read_tasks(conn, projects=["u/a"])
+        conn.close()
+        self.assertEqual(list(df["id"]), ["a1"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,38 @@
+"""Build or refresh the local file index for a project"""
+
+import click
+from helper_functions import helper_functions as hf
+
+CONTEXT_SETTINGS = dict(help_option_names=["-h", "--help"])
+
+
+@click.command(context_settings=CONTEXT_SETTINGS, no_args_is_help=True)
+@click.option("--project", help="Project ID", required=True)
+@click.option(
+    "--profile",
+    help="Profile to use from credentials file",
+    default="cavatica",
+    show_default=True,
+)
+@click.option(
+    "--refresh",
+    help="Only list folders modified since the project was last indexed",
+    is_flag=True,
+    default=False,
+)
+def index_project_files(project, profile, refresh):
+    """
+    List all files in a project and save them to the local file index
+    used by the file name lookups.
+    """
+    # read config file
+    api = hf.parse_config(profile)
+
+    project = hf.parse_project(project)
+
+    file_count = hf.update_file_index(api, project, refresh=refresh)
+    print(f"Indexed {file_count} files in project {project}")
+
+
+if __name__ == "__main__":
+    index_project_files()
@@ -1,28 +1,14 @@
 """Use REST API to get task json file"""
 
 import click
-import requests
 import gzip
 import json
-import configparser
-from pathlib import Path
 from tqdm import tqdm
+from helper_functions import helper_functions as hf
 
 CONTEXT_SETTINGS = dict(help_option_names=["-h", "--help"])
 
 
-def parse_config(profile):
-    """
-    Parse the config file and return the api object.
-    """
-    home = Path.home()
-    config = configparser.ConfigParser()
-    config.read(home / ".sevenbridges/credentials")
-    url = config[profile]["api_endpoint"]
-    token = config[profile]["auth_token"]
-    return [url, token]
-
-
 def remove_metadata(obj):
     """
     Recursively remove the 'metadata' key from a dictionary or list of dictionaries.
@@ -57,16 +43,12 @@ def get_task_json(profile, task, file):
     """Get the task json file for a given task.
     Or use the bulk action, but idk if that will work."""
 
-    url, token = parse_config(profile)
+    # one session is reused for every chunk
+    url, session = hf.rest_session(profile)
 
     tasks = []
 
     # just try the bulk one and see what happens
-    header = {
-        "X-SBG-Auth-Token": f"{token}",
-        "accept": "application/json",
-        "Content-Type": "application/json",
-    }
     task_url = f"{url}/bulk/tasks/get"
 
     if task:
@@ -82,16 +64,15 @@ def get_task_json(profile, task, file):
     chunk_size = 100 # maximum set by SBG API
     chunks = [tasks[i : i + chunk_size] for i in range(0, len(tasks), chunk_size)]
 
-    for chunk in tqdm(chunks, desc="Processing bulk tasks"):
+    for chunk_number, chunk in enumerate(tqdm(chunks, desc="Processing bulk tasks")):
 
         data = {"task_ids": chunk}
         data = json.dumps(data)
 
         # store chunk_number has 4 digits
-        for chunk_number, chunk in enumerate(chunks):
-            chunk_number = str(chunk_number).zfill(4)
+        chunk_number = str(chunk_number).zfill(4)
 
-        response = requests.post(task_url, headers=header, data=data)
+        response = session.post(task_url, data=data)
         if response.status_code == 200:
             # convert response to jsonl and save to file
             task_jsons = response.json()
@@ -51,10 +51,9 @@ def report_tasks(profile):
 
     all_tasks = hf.query_tasks(api, ended_from=ended_from_iso)
 
-    for task in all_tasks:
-        task = api.tasks.get(task.id)
-
-        if task.end_time is None:
+    # get full task details in bulk
+    for task_id, task in hf.bulk_get_tasks(api, [task.id for task in all_tasks]):
+        if task is None or task.end_time is None:
             continue
 
         #check time again since I don't think API is working as expected
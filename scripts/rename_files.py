@@ -3,7 +3,6 @@
 import click
 from pathlib import Path
 from sevenbridges import Api
-from sevenbridges.errors import NotFound
 from helper_functions import helper_functions as hf
 
 CONTEXT_SETTINGS = dict(help_option_names=["-h", "--help"])
@@ -34,9 +33,7 @@ def delete_failed_output_files(profile, project, files, run):
 
     project = hf.parse_project(project)
 
-    # get failed tasks in project
-    all_tasks = hf.get_all_tasks(api, project)
-
+    renames = []
     with open(files, "r") as f:
         line_num = 0
         rename_cols = []
@@ -53,42 +50,53 @@ def delete_failed_output_files(profile, project, files, run):
                 line_split = line.strip().split("\t")
                 cur_name = line_split[rename_cols.index("Current Name")]
                 new_name = line_split[rename_cols.index("New Name")]
-
-                # get file obj for cur_name
-                try:
-                    cur_obj = hf.get_file_obj(api, project, cur_name)
-                except FileNotFoundError as e:
-                    print(f"{cur_name} does not exist, has it already been renamed?")
-                    exit(1)
-
-                # check if new_name exists
-                try:
-                    new_obj = hf.get_file_obj(api, project, new_name)
-                except FileNotFoundError as e:
-                    print(f"{new_name} not found in {project} proceeding")
-
-                    # rename the file to the new name since it doesn't exist
-                    if run:
-                        print(f"Renaming {cur_obj.name}")
-                        cur_obj.name = new_name
-                        cur_obj.save()
-                        print(f"File name is now {cur_obj.name}")
-                    else:
-                        print(
-                            f"DRY RUN {cur_obj.name} not renamed to {new_name} but it can be renamed"
-                        )
-
-                else:
-                    print(f"{new_name} already exists in {project}, skipping")
+                renames.append((cur_name, new_name))
 
             line_num += 1
 
-            """
-            file_obj = hf.get_file_obj(api, project, file_name)
-            print(f"Deleting file {file_obj.name}: {file_obj.id}")
-            if run:
-                file_obj.delete()
-            """
+    # look up the current and new names all at once
+    found, missing, ambiguous = hf.resolve_file_names(
+        api, project, [name for pair in renames for name in pair]
+    )
+
+    # names given to files and names freed up by earlier rows of this run,
+    # so a row can use a name another row renamed away or renamed into
+    renamed = {}
+    freed = set()
+
+    for cur_name, new_name in renames:
+        # get file obj for cur_name
+        if cur_name in renamed:
+            cur_obj = renamed[cur_name]
+        elif cur_name in freed or cur_name in missing:
+            print(f"{cur_name} does not exist, has it already been renamed?")
+            exit(1)
+        elif cur_name in ambiguous:
+            print(f"ERROR: Multiple files found with name {cur_name} in project {project}")
+            exit(1)
+        else:
+            cur_obj = found[cur_name]
+
+        # check if new_name exists
+        if new_name in renamed or (new_name not in missing and new_name not in freed):
+            print(f"{new_name} already exists in {project}, skipping")
+            continue
+
+        print(f"{new_name} not found in {project} proceeding")
+
+        # rename the file to the new name since it doesn't exist
+        if run:
+            print(f"Renaming {cur_obj.name}")
+            cur_obj.name = new_name
+            cur_obj.save()
+            print(f"File name is now {cur_obj.name}")
+        else:
+            print(f"DRY RUN {cur_name} not renamed to {new_name} but it can be renamed")
+
+        renamed.pop(cur_name, None)
+        freed.add(cur_name)
+        freed.discard(new_name)
+        renamed[new_name] = cur_obj
 
     print("Done!")
 
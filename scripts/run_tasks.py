@@ -2,10 +2,10 @@
 
 import click
 import configparser
-import time
 from pathlib import Path
 from sevenbridges import Api
 from helper_functions import helper_functions as hf
+from helper_functions import task_journal
 
 CONTEXT_SETTINGS = dict(help_option_names=["-h", "--help"])
 
@@ -33,9 +33,15 @@ CONTEXT_SETTINGS = dict(help_option_names=["-h", "--help"])
     type=int,
     show_default=True,
 )
+@click.option(
+    "--min_wait",
+    help="Check task status sooner, starting at this many minutes and doubling "
+    "up to --wait while no tasks finish",
+    type=int,
+)
 @click.option(
     "--max_checks",
-    help="Maximum number of status checks to perform",
+    help="Maximum number of status checks in a row without a task finishing",
     default=12,
     type=int,
     show_default=True,
@@ -46,12 +52,31 @@ CONTEXT_SETTINGS = dict(help_option_names=["-h", "--help"])
     default="task_status",
     show_default=True,
 )
-def launch_task(task_file, task_id, profile, limit, wait, max_checks, output_basename):
+@click.option(
+    "--state_file",
+    help="File recording the state of every task, defaults to {output_basename}_state.jsonl. "
+    "If it exists, tasks that were already launched are checked instead of run again",
+)
+def launch_task(
+    task_file,
+    task_id,
+    profile,
+    limit,
+    wait,
+    min_wait,
+    max_checks,
+    output_basename,
+    state_file,
+):
     """
     Launch a single task using the task id or
     launch multiple tasks getting the task ids from input file.
     Task file is a file with task ids one per line.
     This will only launch draft tasks and cannot create tasks.
+    Up to limit tasks are kept running, a new task is launched as soon as
+    a running task finishes.
+    Every change in task state is recorded in the state file, so running the
+    same command again after an interruption picks up where it left off.
     """
     # read config file
     api = hf.parse_config(profile)
@@ -69,79 +94,70 @@ def launch_task(task_file, task_id, profile, limit, wait, max_checks, output_bas
     elif task_file:
         print(f"Launching tasks from file: {task_file}")
         with open(task_file, "r") as f:
-            all_tasks = [line.strip() for line in f]
+            all_tasks = [line.strip() for line in f if line.strip()]
     else:
         print("ERROR: Please provide either a task file or a task id")
         exit(1)
 
-    # start running tasks and keeping track of completed and failed tasks
-    run_tasks = True
-    completed_tasks = []
-    failed_tasks = []
-    print(f"Running up to {limit} tasks at once")
-    while run_tasks:
-        # figure out how many tasks we're running this round
-        running_tasks = 0
-        if limit == -1:
-            tasks_to_run = all_tasks
-            # is this message correct?
-            print("Launching all tasks, status must be monitored manually")
-        else:
-            # this makes tasks_to_run the next 'limit' (ie 50) tasks from all_tasks
-            tasks_to_run = all_tasks[:limit]
-
-        running_tasks = []
-        failed_tasks = []
-        completed_tasks = []
+    # pick up the state of tasks from an earlier run
+    state_file = state_file or f"{output_basename}_state.jsonl"
+    records = task_journal.load(state_file)
+    done, running, all_tasks = task_journal.split_tasks(records, all_tasks)
+    if records:
+        print(
+            f"Restarting from {state_file}: {len(done)} tasks finished, "
+            f"{len(running)} tasks launched, {len(all_tasks)} tasks to launch"
+        )
 
-        # run tasks
-        print(f"Launching a batch of {limit} tasks")
-        for task_id in tasks_to_run:
-            task = api.tasks.get(id=task_id)
-            if task.status == "DRAFT" and len(running_tasks) < limit:
-                try:
-                    task.run()
-                    running_tasks.append(task_id)
-                    if task.status not in ["RUNNING", "QUEUED"]:
-                        print(f"Task {task_id} failed to start, status: {task.status}")
-                        failed_tasks.append(task_id)
-                except Exception as e:
-                    print(f"An error occurred launching this task: {e}")
-                    failed_tasks.append(task_id)
-
-        # check if the tasks are still running
-        checks = 0
-        while running_tasks and checks < max_checks:
-            checks += 1
-            print(f"Waiting {wait} minutes before checking task status...")
-            time.sleep(wait * 60)
-            for task_id in running_tasks[:]:
-                task = api.tasks.get(id=task_id)
-                if task.status == "COMPLETED":
-                    completed_tasks.append(task_id)
-                    running_tasks.remove(task_id)
-                elif task.status == "FAILED":
-                    failed_tasks.append(task_id)
-                    running_tasks.remove(task_id)
-
-        # write tasks to files based on status
-        with open(f"{output_basename}_completed.txt", "a") as comp_f:
-            for task_id in completed_tasks:
+    # run tasks and write them to files as they finish
+    completed_tasks = 0
+    failed_tasks = 0
+    if limit == -1:
+        print("Running all tasks at once")
+    else:
+        print(f"Running up to {limit} tasks at once")
+    with open(f"{output_basename}_completed.txt", "a") as comp_f, open(
+        f"{output_basename}_failed.txt", "a"
+    ) as fail_f, open(state_file, "a") as journal:
+        for task_id in all_tasks:
+            if task_id not in records:
+                task_journal.write(journal, task_id, "PENDING")
+        for task_id, status, info in hf.schedule_tasks(
+            api,
+            all_tasks,
+            limit,
+            min_wait=(min_wait or wait) * 60,
+            max_wait=wait * 60,
+            max_checks=max_checks,
+            running=running,
+            journal=journal,
+        ):
+            if status in ["RUNNING", "QUEUED"]:
+                print(f"Task {task_id} launched, status: {status}")
+            elif status == "COMPLETED":
+                completed_tasks += 1
                 comp_f.write(f"{task_id}\n")
-        with open(f"{output_basename}_failed.txt", "a") as fail_f:
-            for task_id in failed_tasks:
+                comp_f.flush()
+            else:
+                if status == "NOT_FOUND":
+                    print(f"Task {task_id} not found")
+                elif status == "NOT_LAUNCHED":
+                    print(f"Task {task_id} failed to start: {info}")
+                else:
+                    print(f"Task {task_id} {status.lower()}")
+                failed_tasks += 1
                 fail_f.write(f"{task_id}\n")
+                fail_f.flush()
 
-        if checks == max_checks:
-            print("Maximum number of checks reached, tasks may be stalled. Consider cancelling.")
-            exit(1)
-
-        # remove these tasks and repeat
-        all_tasks = all_tasks[limit:]
-        if not all_tasks:
-            run_tasks = False
+    # every task finishes unless the scheduler stopped after max_checks
+    if completed_tasks + failed_tasks < len(running) + len(all_tasks):
+        print(
+            "Maximum number of checks reached, tasks may be stalled. "
+            "Consider cancelling, or run the same command again to keep checking."
+        )
+        exit(1)
 
-    print("All tasks processed")
+    print(f"All tasks processed: {completed_tasks} completed, {failed_tasks} failed")
 
 
 if __name__ == "__main__":
@@ -1,88 +1,14 @@
 """Start exporting files from Cavatica to AWS"""
 
 import click
-import time
+from pathlib import Path
 from sevenbridges import Api
 from helper_functions import helper_functions as hf
+from helper_functions import export_journal
 
 CONTEXT_SETTINGS = dict(help_option_names=["-h", "--help"])
 
 
-def bulk_export_files(api, files, volume, location, overwrite=True, copy_only=False):
-    """
-    Exports list of files to volume in bulk
-    """
-
-    chunk_size = 100  # Max legal bulk size for export is 100 items.
-    final_responses = []
-
-    def is_finished(response):
-        return response in ["COMPLETED", "FAILED", "ABORTED"]
-
-    def error_handling_after_completion(responses):
-        errors = [
-            s.resource.error.message for s in responses if s.resource.state == "FAILED"
-        ]
-        if errors:
-            data = [
-                s.resource.error if s.resource.state == "FAILED" else s.resource.result
-                for s in responses
-            ]
-            raise Exception(
-                "There were errors with bulk exporting.\n"
-                + "\n".join([str(d) for d in data])
-            )
-
-    def error_handling_after_submission(responses):
-        errors = [s.error.message for s in responses if not s.valid]
-        if errors:
-            data = [s for s in responses if not s.valid]
-
-            raise Exception(
-                "There were errors with bulk submission.\n"
-                + "\n".join(
-                    [
-                        f"<Error: status={s.error.status}, code={s.error.code}>; "
-                        f"{s.error.message}"
-                        for s in data
-                    ]
-                )
-            )
-
-    # export files in batches of 100 files each
-    for i in range(0, len(files), chunk_size):
-
-        # setup list of dictionary with export requests
-        exports = [
-            {
-                "file": f,
-                "volume": volume,
-                "location": location + "/" + f.name,
-                "overwrite": overwrite,
-            }
-            for f in files[i : i + chunk_size]
-        ]
-
-        # initiate bulk export of batch and wait until finished
-        responses = api.exports.bulk_submit(exports, copy_only=copy_only)
-
-        # check for errors in bulk submission
-        error_handling_after_submission(responses)
-
-        # wait for bulk job to finish
-        while not all(is_finished(s.resource.state) for s in responses):
-            time.sleep(10)
-            responses = api.exports.bulk_get([s.resource for s in responses])
-
-        # check if each job finished successfully
-        error_handling_after_completion(responses)
-
-        final_responses.extend(responses)
-
-    return final_responses
-
-
-# this function won't really work because of the rate limit
 @click.command(context_settings=CONTEXT_SETTINGS, no_args_is_help=True)
 @click.option("--file_name", help="File name")
 @click.option("--volume", help="username/volume_name of volume to export to.")
@@ -98,12 +24,24 @@ def bulk_export_files(api, files, volume, location, overwrite=True, copy_only=Fa
     default="cavatica",
     show_default=True,
 )
-def launch_export(profile, file_name, volume, location):
+@click.option(
+    "--journal",
+    help="Export journal file, defaults to the manifest with a .export.jsonl suffix",
+)
+@click.option(
+    "--resume",
+    help="Skip files the journal has as exported, re-check running exports, and retry the rest",
+    is_flag=True,
+    default=False,
+)
+def launch_export(profile, file_name, volume, location, journal, resume):
     """
     Export a list of files from a manifest from Cavatica to AWS
     """
     # read config file
     api = hf.parse_config(profile)
+    journal = journal or str(Path(file_name).with_suffix(".export.jsonl"))
+    records = export_journal.load(journal) if resume else {}
 
     # open file and read it
     line_num = 0
@@ -111,6 +49,8 @@ def launch_export(profile, file_name, volume, location):
     file_name_col = None
     project_col = None
     files_to_export = []
+    ids_to_find = []
+    names_to_find = {}
     with open(file_name, "r") as f:
         for line in f:
 
@@ -133,32 +73,68 @@ def launch_export(profile, file_name, volume, location):
                         exit(1)
 
             else:
-                file_obj = None
                 cols = line.strip().split(",")
                 if id_col is not None:
-                    file_obj = api.files.get(cols[id_col])
+                    # get the file objects in bulk after reading the manifest
+                    ids_to_find.append(cols[id_col])
                 else:
-                    # look up file id based on name
-                    file_obj = hf.get_file_obj(
-                        api, cols[project_col], cols[file_name_col]
+                    # look up file ids based on name after reading the manifest
+                    names_to_find.setdefault(cols[project_col], []).append(
+                        cols[file_name_col]
                     )
-                files_to_export.append(file_obj)
 
             line_num += 1
-    
-    print(f"Exporting {len(files_to_export)} files to {volume}/{location}")
+
+    # don't fetch files that were already exported
+    if resume:
+        ids_to_find = [
+            file_id
+            for file_id in ids_to_find
+            if records.get((file_id, location), {}).get("state") != "COMPLETED"
+        ]
+
+    # files listed more than once in the manifest are only exported once
+    ids_to_find = list(dict.fromkeys(ids_to_find))
+    for file_id, file_obj in hf.bulk_get_files(api, ids_to_find):
+        if file_obj is None:
+            print(f"ERROR: File {file_id} not found")
+            exit(1)
+        files_to_export.append(file_obj)
+
+    for project, names in names_to_find.items():
+        names = list(dict.fromkeys(names))
+        found, missing, ambiguous = hf.resolve_file_names(api, project, names)
+        if missing or ambiguous:
+            for name in missing:
+                print(f"ERROR: File {name} not found in project {project}")
+            for name in ambiguous:
+                print(f"ERROR: Multiple files found with name {name} in project {project}")
+            exit(1)
+        files_to_export.extend(found[name] for name in names)
+
+    completed, running, exports = export_journal.split_exports(
+        records, [(file, location) for file in files_to_export]
+    )
+    if resume:
+        print(
+            f"Resuming export: {len(completed)} files already exported, "
+            f"{len(running)} exports running"
+        )
+
+    print(f"Exporting {len(exports)} files to {volume}/{location}")
     print("Files to export:")
-    for file in files_to_export:
+    for file, loc in exports:
         print(file.name)
-    responses = bulk_export_files(
-        api=api,
-        files=files_to_export,
-        volume=volume,
-        location=location,
-        copy_only=False,
-    )
-    for response in responses:
-        print(response)
+    with open(journal, "a") as journal_file:
+        for file, state, result in hf.export_files(
+            api=api,
+            exports=exports,
+            volume=volume,
+            copy_only=False,
+            running=running,
+            journal=journal_file,
+        ):
+            print(f"{file.name}\t{file.id}\t{state}\t{result}")
     print("Export complete")
 
 
@@ -0,0 +1,41 @@
+"""Save the tasks of projects to the local task warehouse"""
+
+import click
+from helper_functions import helper_functions as hf
+
+CONTEXT_SETTINGS = dict(help_option_names=["-h", "--help"])
+
+
+@click.command(context_settings=CONTEXT_SETTINGS)
+@click.option(
+    "--project",
+    help="Project ID, can be given more than once, defaults to every project",
+    multiple=True,
+)
+@click.option(
+    "--profile",
+    help="Profile to use from credentials file",
+    default="cavatica",
+    show_default=True,
+)
+@click.option("--warehouse_file", help="Warehouse file to use instead of the default")
+def sync_task_warehouse(project, profile, warehouse_file):
+    """
+    Save new and changed tasks to the local task warehouse used by
+    calculate_cost_stats.py --warehouse. Only tasks created since the last
+    sync, and tasks that hadn't finished then, are fetched.
+    """
+    # read config file
+    api = hf.parse_config(profile)
+
+    projects = [hf.parse_project(p) for p in project] if project else None
+
+    counts = hf.sync_task_warehouse(api, projects, warehouse_path=warehouse_file)
+    for synced_project, count in counts.items():
+        if count:
+            print(f"{synced_project}: {count} tasks added or updated")
+    print(f"Synced {len(counts)} projects, {sum(counts.values())} tasks")
+
+
+if __name__ == "__main__":
+    sync_task_warehouse()
@@ -0,0 +1,128 @@
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+import pandas as pd
+import add_metadata
+from add_metadata import (
+    add_sample_ids,
+    apply_metadata,
+    join_manifest,
+    metadata_changes,
+    read_manifest,
+)
+
+MANIFEST = (
+    "Bioassay_ID\tParticipant_ID\tfile_name\tsample_type\n"
+    "BS_AAAAAAAA\tPT_1\ta.bam\tTumor\n"
+    "BS_AAAAAAAA\tPT_1\tb.bam\tTumor\n"
+    "BS_BBBBBBBB\tPT_2\tc.bam\t\n"
+)
+
+
+class TestAddMetadata(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.manifest = os.path.join(self.tmp_dir.name, "manifest.tsv")
+        with open(self.manifest, "w") as f:
+            f.write(MANIFEST)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_read_manifest(self):
+        """Test that file columns are dropped and rows made unique"""
+
+        man_df = read_manifest(self.manifest)
+
+        self.assertEqual(
+            list(man_df.columns), ["Bioassay_ID", "Participant_ID", "sample_type"]
+        )
+        self.assertEqual(len(man_df), 2)
+        self.assertEqual(man_df["Bioassay_ID"].dtype, "category")
+        self.assertEqual(man_df["sample_type"].iloc[1], "")
+
+    def test_add_sample_ids(self):
+        """Test that task sample names are used before names parsed from files"""
+
+        file_df = pd.DataFrame(
+            {
+                "id": ["1", "2", "3"],
+                "name": ["BS_AAAAAAAA.bam", "BS_BBBBBBBB.vcf", "no_sample.txt"],
+                "project": ["p", "p", "p"],
+                "task_sample_name": [None, "BS_AAAAAAAA", None],
+            }
+        )
+
+        out_df = add_sample_ids(file_df)
+
+        self.assertEqual(list(out_df["id"]), ["1", "2"])
+        self.assertEqual(list(out_df["Bioassay_ID"]), ["BS_AAAAAAAA", "BS_AAAAAAAA"])
+        self.assertNotIn("task_sample_name", out_df.columns)
+
+    def test_join_manifest(self):
+        """Test that files get their sample's metadata , unknown samples are dropped"""
+
+        man_df = read_manifest(self.manifest)
+        file_df = pd.DataFrame(
+            {
+                "id": ["1", "2"],
+                "name": ["a", "b"],
+                "project": ["p", "p"],
+                "Bioassay_ID": ["BS_BBBBBBBB", "BS_CCCCCCCC"],
+            }
+        )
+
+        out_df = join_manifest(file_df, man_df)
+
+        self.assertEqual(list(out_df["id"]), ["1"])
+        self.assertEqual(out_df["Participant_ID"].iloc[0], "PT_2")
+
+    def test_metadata_changes(self):
+        """Test that only new or different non empty values are changes"""
+
+        current = {"sample_id": "S1", "age": 5, "sex": "Male"}
+        new = {"sample_id": "S1", "age": "5", "sex": "Female", "race": "", "case": "C"}
+
+        self.assertEqual(metadata_changes(current, new), {"sex": "Female", "case": "C"})
+
+    def test_apply_metadata(self):
+        """Test that only changed files are edited and every file is reported"""
+
+        out_df = pd.DataFrame(
+            {
+                "id": ["1", "2", "3"],
+                "name": ["a", "b", "c"],
+                "project": ["p", "p", "p"],
+                "Bioassay_ID": ["BS_1", "BS_2", "BS_3"],
+            }
+        )
+        current = {"1": {"Bioassay_ID": "BS_1"}, "2": {}, "3": {}}
+        report_file = os.path.join(self.tmp_dir.name, "report.tsv")
+
+        def edit(api, items):
+            for item in items:
+                error = "Not found" if item["id"] == "3" else None
+                yield item, None, error
+
+        with patch.object(
+            add_metadata.hf, "bulk_edit_files", side_effect=edit
+        ) as bulk_edit:
+            apply_metadata(None, out_df, current, report_file)
+
+        items = bulk_edit.call_args.args[1]
+        self.assertEqual(
+            items,
+            [
+                {"id": "2", "metadata": {"Bioassay_ID": "BS_2"}},
+                {"id": "3", "metadata": {"Bioassay_ID": "BS_3"}},
+            ],
+        )
+        report = pd.read_csv(report_file, sep="\t", dtype=str)
+        self.assertEqual(
+            list(report["result"]), ["UNCHANGED", "UPDATED", "FAILED: Not found"]
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
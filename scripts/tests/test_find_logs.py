@@ -0,0 +1,22 @@
+import unittest
+from unittest.mock import patch
+from click.testing import CliRunner
+from find_logs import find_logs
+
+
+class TestFindLogs(unittest.TestCase):
+    @patch("find_logs.hf.parse_config")
+    def test_invalid_grep_pattern(self, mock_api):
+        """Test that an invalid regex is rejected before any api calls"""
+
+        result = CliRunner().invoke(
+            find_logs, ["--project", "u/p", "--grep", "ok", "--grep", "(unclosed"]
+        )
+
+        self.assertEqual(result.exit_code, 2, result.output)
+        self.assertIn("Invalid value for --grep: invalid regex", result.output)
+        mock_api.assert_not_called()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,30 @@
+import unittest
+from types import SimpleNamespace
+from get_files_by_task import get_regular_files
+from helper_functions.tests.fakes import MyFile, make_file_api, walk
+
+
+class TestGetRegularFiles(unittest.TestCase):
+    def test_nested_output_folder(self):
+        """Test that files in an output folder below the root get the full path"""
+
+        out_dir = MyFile("out_dir", [MyFile("a.vcf")])
+        root = MyFile("project_root", [MyFile("results", [out_dir])])
+        api = make_file_api([root])
+        api.files.get.side_effect = lambda id: next(
+            f for f in walk([root]) if f.id == id
+        )
+        task = SimpleNamespace(
+            id="t1", name="task", status="COMPLETED", outputs={"out": out_dir}
+        )
+
+        # call the function
+        found = list(get_regular_files(api, [task]))
+
+        self.assertEqual([f.name for f in found], ["results/out_dir/a.vcf"])
+        # each ancestor folder is fetched once
+        self.assertEqual(api.files.get.call_count, 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,46 @@
+import os
+import tempfile
+import unittest
+from unittest.mock import patch, MagicMock
+from click.testing import CliRunner
+from rename_files import delete_failed_output_files
+
+
+class TestRenameFiles(unittest.TestCase):
+    @patch("rename_files.hf.parse_config")
+    @patch("rename_files.hf.resolve_file_names")
+    def test_names_renamed_during_run(self, mock_resolve, mock_api):
+        """Test that rows see the names earlier rows renamed away or into"""
+        files = {name: MagicMock() for name in ["a.txt", "b.txt", "c.txt"]}
+        for name, file in files.items():
+            file.name = name
+        # the first row frees b.txt and takes new.txt
+        mock_resolve.return_value = (files, ["new.txt", "d.txt"], [])
+        rows = [
+            ("b.txt", "new.txt"),
+            ("a.txt", "b.txt"),
+            ("c.txt", "new.txt"),
+            ("new.txt", "d.txt"),
+        ]
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, "renames.tsv")
+            with open(path, "w") as f:
+                f.write("Current Name\tNew Name\n")
+                f.writelines(f"{cur}\t{new}\n" for cur, new in rows)
+
+            result = CliRunner().invoke(
+                delete_failed_output_files,
+                ["--project", "u/p", "--files", path, "--run"],
+            )
+
+        self.assertEqual(result.exit_code, 0, result.output)
+        self.assertIn("new.txt already exists in u/p, skipping", result.output)
+        self.assertEqual(files["a.txt"].name, "b.txt")
+        self.assertEqual(files["b.txt"].name, "d.txt")
+        self.assertEqual(files["c.txt"].name, "c.txt")
+        files["c.txt"].save.assert_not_called()
+
+
+if __name__ == "__main__":
+    unittest.main()